@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the myro protocol code, run against the simulated robot in
+myro.robots.simulator so no hardware is needed. Run them from src/ with
+
+    python -m benchmarks.echo
+
+or all of them, saving the results as JSON, with python -m benchmarks.
+"""
+
+import contextlib
+import io
+
+from myro.robots.scribbler import Scribbler
+from myro.robots.simulator import ScribblerFirmware
+from myro.robots.simulator import SimulatedTransport
+
+
+def simulatedRobot(baudrate=38400, latency=0.0, **firmware):
+    """
+    Returns (robot, transport, firmware) for a Scribbler connected to a
+    simulated robot over a link of the given speed and latency.
+    """
+    fw = ScribblerFirmware(**firmware)
+    transport = SimulatedTransport(fw, baudrate=baudrate, latency=latency)
+    with contextlib.redirect_stdout(io.StringIO()):
+        robot = Scribbler(transport=transport)
+    return robot, transport, fw
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Runs the benchmarks and writes what each one's main() returned to a JSON
+file, so that runs can be compared. From src/:
+
+    python -m benchmarks                      # everything
+    python -m benchmarks protocol images      # just these
+    python -m benchmarks -o before.json
+    python -m benchmarks --compare before.json after.json
+"""
+
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import subprocess
+import sys
+import time
+import traceback
+
+# cheapest first; every module here has a main() returning a dict
+SUITE = [
+    "packet",
+    "protocol",
+    "echo",
+    "snapshot",
+    "alloc",
+    "stats",
+    "images",
+    "blobstats",
+    "imports",
+    "startup",
+    "motors",
+    "fleet",
+    "stoplatency",
+    "discovery",
+    "replay",
+    "reconnect",
+]
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names):
+    """Runs the named benchmarks; returns the results document."""
+    document = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seconds": {},
+        "results": {},
+        "errors": {},
+    }
+    for name in names:
+        print("== %s" % name)
+        start = time.perf_counter()
+        try:
+            module = importlib.import_module("benchmarks." + name)
+            document["results"][name] = module.main()
+        except Exception:
+            traceback.print_exc()
+            document["errors"][name] = traceback.format_exc()
+        document["seconds"][name] = time.perf_counter() - start
+    return document
+
+
+def numbers(value, path=()):
+    """Yields (path, number) for every number in a results document."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from numbers(item, path + (str(key),))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield path, value
+
+
+def compare(before, after):
+    """Prints every number the two results documents share, and the change."""
+    old = dict(numbers(before["results"]))
+    for path, new in numbers(after["results"]):
+        if path not in old:
+            continue
+        change = "%+8.1f%%" % ((new - old[path]) / old[path] * 100) if old[path] else ""
+        print("%-60s %12.4g %12.4g %s" % ("/".join(path), old[path], new, change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default all)")
+    parser.add_argument(
+        "-o", "--output", default="benchmarks.json", help="JSON file to write"
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BEFORE", "AFTER"),
+        help="compare two result files instead of running anything",
+    )
+    args = parser.parse_args(argv)
+    if args.compare:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        compare(before, after)
+        return 0
+    for name in args.names:
+        if name not in SUITE:
+            parser.error(
+                "no benchmark named '%s' (have: %s)" % (name, ", ".join(SUITE))
+            )
+    document = run(args.names or SUITE)
+    with open(args.output, "w") as f:
+        json.dump(document, f, indent=1, sort_keys=True, default=repr)
+    print("results written to %s" % args.output)
+    return 1 if document["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
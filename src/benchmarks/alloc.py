@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Memory allocated per Scribbler._get, comparing the old decode path (read,
+decode to str, list(map(ord, ...))) with the readinto receive buffer.
+
+CPython has no per call allocation counter, so tracemalloc is used: the
+peak traced memory during a call, above what was traced before it, is the
+memory the call had to allocate, and the number of live blocks after it
+shows whether anything leaked into the steady state. The transport here
+replays canned replies from memory so the figures are the robot code's own.
+"""
+
+import time
+import tracemalloc
+import types
+
+from benchmarks import simulatedRobot
+from myro.robots.transport import Transport
+
+LIGHT = bytes((0x04, 0xB0, 0x05, 0x14, 0x05, 0x78))
+
+if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+    resetPeak = tracemalloc.reset_peak
+else:
+    # forgets the blocks traced so far too, which the peak doesn't need
+    resetPeak = tracemalloc.clear_traces
+
+
+class LoopbackTransport(Transport):
+    """Answers every packet with its echo followed by a fixed payload."""
+
+    portstr = "loopback"
+
+    def __init__(self, payload):
+        Transport.__init__(self)
+        self.payload = payload
+        self._buffer = bytearray(4096)
+        self._start = 0
+        self._end = 0
+
+    @property
+    def timeout(self):
+        return 0
+
+    @timeout.setter
+    def timeout(self, value):
+        pass
+
+    def write(self, data):
+        end = self._end + len(data) + len(self.payload)
+        self._buffer[self._end : end] = data + self.payload
+        self._end = end
+        return len(data)
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self._end - self._start)
+        buffer[:count] = self._buffer[self._start : self._start + count]
+        self._advance(count)
+        return count
+
+    def read(self, size=1):
+        count = min(size, self._end - self._start)
+        data = bytes(self._buffer[self._start : self._start + count])
+        self._advance(count)
+        return data
+
+    def _advance(self, count):
+        self._start += count
+        if self._start == self._end:
+            self._start = self._end = 0
+
+
+def _legacyRead(self, bytes_=1):
+    c = self.ser.read(bytes_).decode("ISO-8859-1")
+    while bytes_ > 1 and len(c) < bytes_:
+        more = self.ser.read(bytes_ - len(c)).decode("ISO-8859-1")
+        if not more:
+            break
+        c = c + more
+    if bytes_ == 1:
+        return ord(c) if c else -1
+    return list(map(ord, c))
+
+
+def _legacyReadEcho(self):
+    return self._read(self.PACKET_LENGTH)
+
+
+def _legacyReadReply(self, bytes=1, mode="byte"):
+    retvalBytes = self._read(bytes)
+    if mode == "byte":
+        return retvalBytes
+    retval = []
+    for p in range(0, len(retvalBytes), 2):
+        retval.append(retvalBytes[p] << 8 | retvalBytes[p + 1])
+    return retval
+
+
+def measure(robot, count):
+    get = robot._get
+    value = robot.GET_LIGHT_ALL
+    for i in range(100):
+        get(value, 6, "word")
+    start = time.perf_counter()
+    for i in range(count):
+        get(value, 6, "word")
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    peak = 0
+    for i in range(count):
+        resetPeak()
+        current = tracemalloc.get_traced_memory()[0]
+        get(value, 6, "word")
+        peak += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    blocks = tracemalloc.take_snapshot()
+    for i in range(count):
+        get(value, 6, "word")
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    leaked = sum(
+        stat.count_diff
+        for stat in after.compare_to(blocks, "filename")
+        if "tracemalloc" not in stat.traceback[0].filename
+    )
+    return {
+        "gets/s": count / elapsed,
+        "peak bytes/get": peak / float(count),
+        "blocks kept": leaked,
+    }
+
+
+def main(count=10000):
+    robot, transport, fw = simulatedRobot()
+    robot.ser = LoopbackTransport(LIGHT)
+    robot._pacer.learned(0.0)
+    results = {}
+    results["readinto"] = measure(robot, count)
+    robot._read = types.MethodType(_legacyRead, robot)
+    robot._readEcho = types.MethodType(_legacyReadEcho, robot)
+    robot._readReply = types.MethodType(_legacyReadReply, robot)
+    results["legacy"] = measure(robot, count)
+    for mode in ("legacy", "readinto"):
+        print(
+            "%-8s %9.0f gets/s %7.0f peak bytes/get %4d blocks kept"
+            % (
+                mode,
+                results[mode]["gets/s"],
+                results[mode]["peak bytes/get"],
+                results[mode]["blocks kept"],
+            )
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Time and peak memory of image.blobStats, which measures the blob straight
+from the GET_RLE runs, against decoding the whole picture with decodeRLE
+and scanning it with numpy, at 256 x 192 and 1280 x 800. Two blobs: the
+simulated firmware's rectangle, and a speckled disc with many more runs.
+"""
+
+import random
+import time
+import tracemalloc
+
+import numpy
+
+from myro.robots import image
+from myro.robots.simulator import ScribblerFirmware
+
+SIZES = {
+    "256x192": "2.9.1",
+    "1280x800": "3.0.0",
+}
+
+
+def encodeRLE(cells, counterBytes):
+    """GET_RLE runs for a sequence of 0/1 cells, starting outside the blob."""
+    runs = []
+    inside = 0
+    count = 0
+    for cell in cells:
+        if cell != inside:
+            runs.append(count)
+            inside = cell
+            count = 0
+        count += 1
+    runs.append(count)
+    return b"".join(run.to_bytes(counterBytes, "big") for run in runs)
+
+
+def disc(width, height, counterBytes, noise=0.05):
+    random.seed(1)
+    perRow = width // 4
+    cx, cy, r = perRow / 2.0, height / 2.0, height / 3.0
+    cells = []
+    for y in range(height):
+        for x in range(perRow):
+            inside = ((x * 4 - cx * 4) / 4.0) ** 2 + (y - cy) ** 2 < r * r
+            if random.random() < noise:
+                inside = not inside
+            cells.append(int(inside))
+    return encodeRLE(cells, counterBytes)
+
+
+def decodeAndScan(data, width, height, counterBytes):
+    """The same statistics from the decoded picture."""
+    blob = numpy.frombuffer(
+        image.decodeRLE(data, width, height, counterBytes), numpy.uint8
+    )
+    blob = blob.reshape(height, width) == 255
+    ys, xs = numpy.nonzero(blob)
+    if not len(xs):
+        return {"area": 0, "centroid": None, "box": None, "rows": []}
+    rows = []
+    for y in numpy.unique(ys):
+        line = numpy.nonzero(blob[y])[0]
+        rows.append((int(y), int(line[0]), int(line[-1]) + 1))
+    return {
+        "area": len(xs),
+        "centroid": (xs.mean(), ys.mean()),
+        "box": (int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1),
+        "rows": rows,
+    }
+
+
+def measure(function, *args):
+    """(best seconds of a few calls, peak bytes allocated by one, result)."""
+    best = float("inf")
+    for i in range(5):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    results = {}
+    for size, fluke in SIZES.items():
+        fw = ScribblerFirmware(fluke=fluke)
+        width, height = fw.cameraSize()
+        if list(map(int, fluke.split("."))) >= [3, 0, 0]:
+            counterBytes = 3
+        else:
+            counterBytes = 2
+        blobs = {
+            "rectangle": fw.rle()[2:],
+            "speckled disc": disc(width, height, counterBytes),
+        }
+        for name, data in blobs.items():
+            args = (data, width, height, counterBytes)
+            fast, fastPeak, stats = measure(image.blobStats, *args)
+            slow, slowPeak, expected = measure(decodeAndScan, *args)
+            if any(stats[key] != expected[key] for key in ("area", "box", "rows")):
+                raise RuntimeError("%s %s: blobStats disagrees" % (size, name))
+            key = "%s %s" % (size, name)
+            results[key] = {
+                "runs": len(data) // counterBytes,
+                "streaming ms": fast * 1000,
+                "streaming peak KiB": fastPeak / 1024.0,
+                "decode+scan ms": slow * 1000,
+                "decode+scan peak KiB": slowPeak / 1024.0,
+            }
+            print(
+                "%-23s %6d runs  streaming %7.2f ms %8.1f KiB   decode+scan %7.2f ms %8.1f KiB"
+                % (
+                    key,
+                    results[key]["runs"],
+                    fast * 1000,
+                    fastPeak / 1024.0,
+                    slow * 1000,
+                    slowPeak / 1024.0,
+                )
+            )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Time to find a robot by name among a dozen serial ports, probing them one
+after another (as search() used to) and all at once, and to look it up in
+the port cache afterwards. The robot is on the last port and its reset
+broadcast arrives a little after the port is opened.
+"""
+
+import os
+import tempfile
+import time
+
+import serial
+
+from myro.robots import discovery
+from myro.robots.simulator import ScribblerFirmware
+from myro.robots.simulator import SimulatedTransport
+
+PORTS = ["/dev/rfcomm%d" % x for x in range(4)] + [
+    "/dev/ttyUSB%d" % x for x in range(8)
+]
+
+
+def opener(robotPort, name, delay):
+    def open(port, baudrate, timeout=10):
+        if port == robotPort:
+            ser = SimulatedTransport(ScribblerFirmware(name=name), timeout=timeout)
+            ser.announce(delay)
+            return ser
+        if port.startswith("/dev/rfcomm"):
+            # paired but switched off: opens, then stays quiet
+            return SimulatedTransport(ScribblerFirmware(), timeout=timeout)
+        raise serial.SerialException("could not open port %s" % port)
+
+    return open
+
+
+def main(deadline=0.5, delay=0.2, name="Scribby"):
+    open = opener(PORTS[-1], name, delay)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["MYROPORTS"] = os.path.join(directory, "ports.json")
+        try:
+            for mode, workers in (("sequential", 1), ("parallel", len(PORTS))):
+                discovery.forget(name)
+                start = time.perf_counter()
+                port = discovery.search(
+                    name, ports=PORTS, deadline=deadline, workers=workers, opener=open
+                )
+                results[mode + " ms"] = (time.perf_counter() - start) * 1000
+                if port != PORTS[-1]:
+                    raise RuntimeError("found %s on the wrong port" % name)
+            start = time.perf_counter()
+            if discovery.cachedPort(name) != PORTS[-1]:
+                raise RuntimeError("%s was not cached" % name)
+            results["cached ms"] = (time.perf_counter() - start) * 1000
+        finally:
+            del os.environ["MYROPORTS"]
+    print(
+        "%d ports: sequential %.0f ms  parallel %.0f ms  cached %.2f ms"
+        % (
+            len(PORTS),
+            results["sequential ms"],
+            results["parallel ms"],
+            results["cached ms"],
+        )
+    )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Bytes on the wire and sensor polls per second with and without the packet
+echo (Scribbler.setFastProtocol).
+"""
+
+import time
+
+from benchmarks import simulatedRobot
+
+
+def poll(robot, transport, count):
+    written = transport.bytesWritten
+    read = transport.bytesRead
+    start = time.perf_counter()
+    for i in range(count):
+        robot.get("all")
+    elapsed = time.perf_counter() - start
+    return {
+        "polls/s": count / elapsed,
+        "bytes in/poll": (transport.bytesRead - read) / float(count),
+        "bytes out/poll": (transport.bytesWritten - written) / float(count),
+    }
+
+
+def main(count=100, baudrate=38400):
+    results = {}
+    robot, transport, fw = simulatedRobot(baudrate=baudrate, quietEcho=True)
+    results["echo"] = poll(robot, transport, count)
+    if not robot.setFastProtocol(True):
+        raise RuntimeError("simulated firmware did not turn the echo off")
+    results["fast"] = poll(robot, transport, count)
+    saved = 1.0 - results["fast"]["bytes in/poll"] / results["echo"]["bytes in/poll"]
+    results["bytes in saved"] = saved
+    for mode in ("echo", "fast"):
+        print(
+            "%-5s %8.1f polls/s %6.1f bytes in/poll %6.1f bytes out/poll"
+            % (
+                mode,
+                results[mode]["polls/s"],
+                results[mode]["bytes in/poll"],
+                results[mode]["bytes out/poll"],
+            )
+        )
+    print("robot to host bandwidth saved: %.0f%%" % (saved * 100))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+A classroom's worth of simulated robots on Bluetooth-like links: how long
+get("all") and move() take looping over the robots one at a time, and
+through a Fleet that talks to all of them at once, plus the start and
+finish skew the Fleet reports.
+"""
+
+import time
+
+from benchmarks import simulatedRobot
+from myro.robots.fleet import Fleet
+
+
+def measure(function, count):
+    times = []
+    for i in range(count):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+
+def main(robots=24, count=10, baudrate=38400, latency=0.02):
+    fleet = Fleet(
+        [
+            simulatedRobot(baudrate, latency, name="Robot%d" % i)[0]
+            for i in range(robots)
+        ]
+    )
+    results = {}
+    for name, one, together in (
+        (
+            'get("all")',
+            lambda: [robot.get("all") for robot in fleet],
+            lambda: fleet.get("all"),
+        ),
+        (
+            "move",
+            lambda: [robot.move(0.5, 0) for robot in fleet],
+            lambda: fleet.move(0.5, 0),
+        ),
+    ):
+        results[name] = {
+            "sequential ms": measure(one, count),
+            "fleet ms": measure(together, count),
+            "start skew ms": fleet.skew["start"] * 1000,
+            "finish skew ms": fleet.skew["finish"] * 1000,
+        }
+        result = results[name]
+        print(
+            "%-10s %d robots: %7.1f -> %5.1f ms  skew start %.2f ms finish %.2f ms"
+            % (
+                name,
+                robots,
+                result["sequential ms"],
+                result["fleet ms"],
+                result["start skew ms"],
+                result["finish skew ms"],
+            )
+        )
+    fleet.close()
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Decode throughput of every picture mode (myro.robots.image) at the Fluke's
+256 x 192 and the Fluke 2's 1280 x 800, on the simulated firmware's test
+pattern and blob. "blob" is the GET_RLE run-length decode. Modes that
+have a pure Python fallback (used when numpy isn't installed) are also
+timed with it, and its output is checked against theirs, and so are the
+per cell loops they replaced.
+"""
+
+import array
+import time
+
+from myro.robots import image
+from myro.robots.simulator import ScribblerFirmware
+
+SIZES = {
+    "256x192": "2.9.1",
+    "1280x800": "3.0.0",
+}
+
+
+def frames(fluke):
+    """(width, height, GET_IMAGE payload, GET_RLE payload, counter bytes)."""
+    fw = ScribblerFirmware(fluke=fluke)
+    width, height = fw.cameraSize()
+    if list(map(int, fluke.split("."))) >= [3, 0, 0]:
+        counterBytes = 3
+    else:
+        counterBytes = 2
+    return width, height, fw.picture(), fw.rle()[2:], counterBytes
+
+
+def decoders(width, height, picture, rle, counterBytes):
+    """{mode: function decoding one frame in that mode}."""
+    modes = {
+        mode: (lambda decode=decode: decode(picture, width, height))
+        for mode, decode in image.COLOR_MODES.items()
+    }
+    modes["blob"] = lambda: image.decodeRLE(rle, width, height, counterBytes)
+    return modes
+
+
+def legacyDecodeRLE(data, width, height, counterBytes=2):
+    """decodeRLE() as it was: a Python loop over every 4 pixel cell."""
+    blobs = array.array("B", bytes(width * height))
+    px = 0
+    counter = 0
+    val = 128
+    inside = True
+    for i in range(height):
+        for j in range(0, width, 4):
+            if counter < 1 and px < len(data):
+                counter = 0
+                for k in range(counterBytes):
+                    counter = (counter << 8) | data[px]
+                    px += 1
+                if inside:
+                    val = 0
+                    inside = False
+                else:
+                    val = 255
+                    inside = True
+            for z in range(0, 4):
+                blobs[i * width + j + z] = val
+            counter -= 1
+    return blobs
+
+
+def legacy(width, height, picture, rle, counterBytes):
+    """{mode: function decoding one frame the way it used to be done}."""
+    return {
+        "blob": lambda: legacyDecodeRLE(rle, width, height, counterBytes),
+    }
+
+
+def fallbacks(width, height, picture, rle, counterBytes):
+    """{mode: function decoding one frame the way it is done without numpy}."""
+    return {
+        "blob": lambda: image._decodeRLESlices(rle, width * height // 4, counterBytes),
+        "color": lambda: image._yuyvToRGBLoop(picture, width, height),
+        "color-bilinear-h": lambda: image._interpolateLoop(
+            picture, width, height, image._interpolationColumns(width, False), False
+        ),
+        "color-bilinear-v": lambda: image._interpolateLoop(
+            picture, width, height, image._interpolationColumns(width, True), True
+        ),
+    }
+
+
+def timeDecode(decode, seconds):
+    """Decodes repeatedly for about seconds; returns the best time."""
+    best = float("inf")
+    spent = 0.0
+    runs = 0
+    while spent < seconds or runs < 1:
+        start = time.perf_counter()
+        decode()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        runs += 1
+    return best
+
+
+def main(seconds=1.0):
+    results = {}
+    for size, fluke in SIZES.items():
+        width, height, picture, rle, counterBytes = frames(fluke)
+        results[size] = {}
+        slow = fallbacks(width, height, picture, rle, counterBytes)
+        old = legacy(width, height, picture, rle, counterBytes)
+        for mode, decode in decoders(width, height, picture, rle, counterBytes).items():
+            best = timeDecode(decode, seconds)
+            results[size][mode] = {
+                "ms/frame": best * 1000,
+                "frames/s": 1 / best,
+                "Mpixel/s": width * height / best / 1e6,
+            }
+            if mode in slow:
+                if slow[mode]() != decode():
+                    raise RuntimeError("%s %s differs from its fallback" % (size, mode))
+                fallback = timeDecode(slow[mode], seconds)
+                results[size][mode]["fallback ms/frame"] = fallback * 1000
+                results[size][mode]["speedup"] = fallback / best
+            if mode in old:
+                if old[mode]() != decode():
+                    raise RuntimeError("%s %s differs from the old loop" % (size, mode))
+                loop = timeDecode(old[mode], seconds)
+                results[size][mode]["old loop ms/frame"] = loop * 1000
+            print(
+                "%-9s %-18s %9.2f ms/frame %8.2f frames/s %7.2f Mpixel/s"
+                % (
+                    size,
+                    mode,
+                    best * 1000,
+                    1 / best,
+                    results[size][mode]["Mpixel/s"],
+                )
+            )
+            if mode in slow:
+                print(
+                    "%-9s %-18s %9.2f ms/frame without numpy, same output (%.0fx)"
+                    % (
+                        size,
+                        "",
+                        results[size][mode]["fallback ms/frame"],
+                        results[size][mode]["speedup"],
+                    )
+                )
+            if mode in old:
+                print(
+                    "%-9s %-18s %9.2f ms/frame with the old loop, same output (%.0fx)"
+                    % (
+                        size,
+                        "",
+                        results[size][mode]["old loop ms/frame"],
+                        results[size][mode]["old loop ms/frame"] / (best * 1000),
+                    )
+                )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Time to "import myro" in a fresh interpreter, less the time the interpreter
+takes to start and do nothing.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+
+def spawn(code, runs):
+    env = dict(os.environ)
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        [here] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    times = []
+    for i in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main(runs=7):
+    bare = spawn("pass", runs)
+    myro = spawn("import myro", runs)
+    results = {
+        "interpreter ms": bare * 1000,
+        "import myro ms": (myro - bare) * 1000,
+    }
+    print(
+        "import myro %.1f ms (interpreter start %.1f ms)"
+        % (results["import myro ms"], results["interpreter ms"])
+    )
+    return results
+
+
+if __name__ == "__main__":
+    main()
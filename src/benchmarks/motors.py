@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+A teleop loop calling move() every 5 ms for two seconds over a
+Bluetooth-like link, ramping the speed from -1 to 1, with blocking moves
+and with the MotorChannel. Shows how often the loop actually ran, how
+many packets went out, and how far behind the ramp the robot's motors
+were on average.
+"""
+
+import threading
+import time
+
+from benchmarks import simulatedRobot
+
+
+def target(elapsed):
+    """The speed the driver wants elapsed seconds in: a ramp from -1 to 1."""
+    return min(elapsed - 1.0, 1.0)
+
+
+def teleop(channel, seconds, period, baudrate, latency):
+    robot, transport, fw = simulatedRobot(baudrate, latency, fluke="2.9.1")
+    if channel:
+        robot.startMotorChannel()
+    begin = time.perf_counter()
+    lag = []
+    done = threading.Event()
+
+    def watch():
+        while not done.is_set():
+            time.sleep(0.002)
+            elapsed = time.perf_counter() - begin
+            # the power the robot has was wanted power / 100 s in
+            lag.append(elapsed - fw.motors[0] / 100.0)
+
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    packets = len(fw.commands)
+    steps = 0
+    while time.perf_counter() - begin < seconds:
+        robot.move(target(time.perf_counter() - begin), 0)
+        steps += 1
+        time.sleep(period)
+    result = {}
+    if channel:
+        robot.motorChannel.flush()
+        result.update(robot.getMotorChannelStats())
+        robot.stopMotorChannel()
+    done.set()
+    watcher.join()
+    result.update(
+        {
+            "loop hz": steps / seconds,
+            "packets": len(fw.commands) - packets,
+            "mean lag ms": sum(lag) / len(lag) * 1000,
+        }
+    )
+    return result
+
+
+def main(seconds=2.0, period=0.005, baudrate=38400, latency=0.02):
+    results = {}
+    for name, channel in (("blocking", False), ("channel", True)):
+        results[name] = teleop(channel, seconds, period, baudrate, latency)
+        print(
+            "%-9s loop %5.1f Hz  %4d packets  motors %5.1f ms behind"
+            % (
+                name,
+                results[name]["loop hz"],
+                results[name]["packets"],
+                results[name]["mean lag ms"],
+            )
+        )
+    channel = results["channel"]
+    print(
+        "channel: %d sent, %d coalesced, %d suppressed"
+        % (channel["sent"], channel["coalesced"], channel["suppressed"])
+    )
+    return results
+
+
+if __name__ == "__main__":
+    main()
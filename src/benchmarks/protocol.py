@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Commands per second through Scribbler._set and Scribbler._get, and the
+latency of get("all"), on an infinitely fast simulated link (what the
+protocol code itself costs) and on a Bluetooth-like one (what a program
+actually sees).
+"""
+
+import time
+
+from benchmarks import simulatedRobot
+
+LINKS = {
+    "ideal": (None, 0.0),
+    "bluetooth": (38400, 0.02),
+}
+
+
+def rate(call, count):
+    start = time.perf_counter()
+    for i in range(count):
+        call(i)
+    return count / (time.perf_counter() - start)
+
+
+def latencies(robot, count):
+    times = []
+    for i in range(count):
+        start = time.perf_counter()
+        robot.get("all")
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "median ms": times[len(times) // 2] * 1000,
+        "p90 ms": times[int(len(times) * 0.9)] * 1000,
+        "max ms": times[-1] * 1000,
+    }
+
+
+def measure(baudrate, latency, count):
+    robot, transport, fw = simulatedRobot(baudrate, latency, fluke="2.9.1")
+    leds = (robot.SET_LED_LEFT_OFF, robot.SET_LED_LEFT_ON)
+    result = {
+        "_set/s": rate(lambda i: robot._set(leds[i % 2]), count),
+        "_get/s": rate(lambda i: robot._get(robot.GET_LIGHT_ALL, 6, "word"), count),
+    }
+    result["get all"] = latencies(robot, count)
+    robot.close()
+    return result
+
+
+def main(count=200, slowCount=20):
+    results = {}
+    for name, (baudrate, latency) in LINKS.items():
+        results[name] = measure(baudrate, latency, slowCount if latency else count)
+        print(
+            "%-9s %8.1f _set/s %8.1f _get/s  get('all') %6.2f ms median %6.2f ms max"
+            % (
+                name,
+                results[name]["_set/s"],
+                results[name]["_get/s"],
+                results[name]["get all"]["median ms"],
+                results[name]["get all"]["max ms"],
+            )
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
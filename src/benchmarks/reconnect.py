@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Time to recover from a dropped link: the link to a simulated robot goes
+down (and the robot resets) for a while, and a getLight() loop measures how
+long after the drop the robot answers again and whether its LEDs, volume
+and IR power came back.
+"""
+
+import time
+
+from benchmarks import simulatedRobot
+from myro.robots.reconnect import ConnectionLost
+
+
+def outage(seconds, latency):
+    robot, transport, fw = simulatedRobot(latency=latency, fluke="2.9.1")
+    robot.setLED("left", 1)
+    robot.setLED("right", 1)
+    robot.setVolume(0)
+    robot.setIRPower(135)
+    before = (list(fw.leds), fw.loud, dict(fw.fluke_state))
+    transport.drop(seconds)
+    start = time.perf_counter()
+    errors = 0
+    while True:
+        try:
+            robot.getLight()
+            break
+        except ConnectionLost as e:
+            if not e.recovered:
+                raise
+            errors += 1
+    elapsed = time.perf_counter() - start
+    after = (list(fw.leds), fw.loud, dict(fw.fluke_state))
+    return {
+        "outage s": seconds,
+        "recovered after s": elapsed,
+        "errors": errors,
+        "state restored": before == after,
+    }
+
+
+def main(outages=(0.2, 1.0, 3.0), latency=0.02):
+    results = []
+    for seconds in outages:
+        result = outage(seconds, latency)
+        results.append(result)
+        print(
+            "%.1f s outage: answering again after %.2f s (%d error, state %s)"
+            % (
+                seconds,
+                result["recovered after s"],
+                result["errors"],
+                "restored" if result["state restored"] else "LOST",
+            )
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Records a short robot program (connect, then a loop of sensor reads, moves
+and LED changes) over a simulated Bluetooth-speed link with a
+CaptureTransport, then runs it again from the capture with a
+ReplayTransport. Shows how long each run took, that the program saw the
+same values both times, and how big the capture is.
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from myro.robots.capture import ReplayTransport
+from myro.robots.capture import readCapture
+from myro.robots.scribbler import Scribbler
+from myro.robots.simulator import ScribblerFirmware
+from myro.robots.simulator import SimulatedTransport
+
+
+def program(robot, steps):
+    """What the robot does; returns everything it read."""
+    seen = [robot.getName()]
+    for i in range(steps):
+        seen.append(robot.get("light"))
+        seen.append(robot.get("ir"))
+        robot.move(i / float(steps), 0)
+        robot.setLED("left", i % 2)
+    seen.append(robot.get("all"))
+    robot.stop()
+    return seen
+
+
+def run(transport, steps, capture=None):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        robot = Scribbler(transport=transport, capture=capture)
+    connected = time.perf_counter()
+    seen = program(robot, steps)
+    finished = time.perf_counter()
+    robot.close()
+    return seen, connected - start, finished - connected
+
+
+def main(steps=50, baudrate=38400, latency=0.005):
+    fd, path = tempfile.mkstemp(suffix=".myrocap")
+    os.close(fd)
+    try:
+        live = SimulatedTransport(
+            ScribblerFirmware(fluke="2.9.1"), baudrate=baudrate, latency=latency
+        )
+        recorded, connect, loop = run(live, steps, capture=path)
+        size = os.path.getsize(path)
+        port, records = readCapture(path)
+        replay = ReplayTransport(path)
+        replayed, replayConnect, replayLoop = run(replay, steps)
+        if replayed != recorded:
+            raise RuntimeError("the replay saw different values")
+        results = {
+            "recorded connect s": connect,
+            "recorded loop s": loop,
+            "replayed connect s": replayConnect,
+            "replayed loop s": replayLoop,
+            "loop speedup": loop / replayLoop,
+            "capture bytes": size,
+            "records": len(records),
+            "left unplayed": replay.remaining(),
+        }
+    finally:
+        os.remove(path)
+    print(
+        "recorded  connect %6.3f s  loop %6.3f s"
+        % (results["recorded connect s"], results["recorded loop s"])
+    )
+    print(
+        "replayed  connect %6.3f s  loop %6.3f s  (%.0fx, same values)"
+        % (
+            results["replayed connect s"],
+            results["replayed loop s"],
+            results["loop speedup"],
+        )
+    )
+    print(
+        "capture: %d records, %d bytes, %d reads/writes left unplayed"
+        % (results["records"], results["capture bytes"], results["left unplayed"])
+    )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end latency of get("all") on a robot with a fluke: the nine
+transactions one after the other (what get("all") used to do) against the
+single burst it sends now, over a Bluetooth-like link.
+"""
+
+import time
+
+from benchmarks import simulatedRobot
+
+
+def sequential(robot):
+    retval = robot._get(robot.GET_ALL, 11)
+    return {
+        "light": [
+            retval[2] << 8 | retval[3],
+            retval[4] << 8 | retval[5],
+            retval[6] << 8 | retval[7],
+        ],
+        "ir": [retval[0], retval[1]],
+        "line": [retval[8], retval[9]],
+        "stall": retval[10],
+        "obstacle": [
+            robot.getObstacle("left"),
+            robot.getObstacle("center"),
+            robot.getObstacle("right"),
+        ],
+        "bright": [
+            robot.getBright("left"),
+            robot.getBright("middle"),
+            robot.getBright("right"),
+        ],
+        "blob": robot.getBlob(),
+        "battery": robot.getBattery(),
+    }
+
+
+def measure(function, robot, count):
+    times = []
+    for i in range(count):
+        start = time.perf_counter()
+        function(robot)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "median ms": times[len(times) // 2] * 1000,
+        "max ms": times[-1] * 1000,
+    }
+
+
+def main(count=20, baudrate=38400, latency=0.02):
+    robot, transport, fw = simulatedRobot(
+        baudrate=baudrate, latency=latency, fluke="2.9.1"
+    )
+    if sequential(robot) != robot.get("all"):
+        raise RuntimeError("burst and sequential snapshots differ")
+    results = {
+        "sequential": measure(sequential, robot, count),
+        "burst": measure(lambda robot: robot.get("all"), robot, count),
+    }
+    for mode in ("sequential", "burst"):
+        print(
+            "%-10s %7.1f ms median %7.1f ms max"
+            % (mode, results[mode]["median ms"], results[mode]["max ms"])
+        )
+    print(
+        "speedup: %.1fx"
+        % (results["sequential"]["median ms"] / results["burst"]["median ms"])
+    )
+    return results
+
+
+if __name__ == "__main__":
+    main()
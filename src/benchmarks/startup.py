@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Time taken by each phase of connecting to a robot (Scribbler.connectTimes),
+with and without fastConnect, with and without a fluke, over a
+Bluetooth-like link.
+"""
+
+import contextlib
+import io
+import time
+
+from myro.robots.scribbler import Scribbler
+from myro.robots.simulator import ScribblerFirmware
+from myro.robots.simulator import SimulatedTransport
+
+
+def connect(fastConnect, baudrate, latency, **firmware):
+    transport = SimulatedTransport(
+        ScribblerFirmware(**firmware), baudrate=baudrate, latency=latency
+    )
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        robot = Scribbler(transport=transport, fastConnect=fastConnect)
+    phases = dict(robot.connectTimes)
+    phases["total"] = time.perf_counter() - start
+    return phases
+
+
+def main(baudrate=38400, latency=0.02):
+    results = {}
+    for fluke in (None, "2.9.1"):
+        for fastConnect in (False, True):
+            name = "%s %s" % (
+                "fluke" if fluke else "direct",
+                "fast" if fastConnect else "full",
+            )
+            results[name] = connect(fastConnect, baudrate, latency, fluke=fluke)
+            print(
+                "%-13s %s"
+                % (
+                    name,
+                    "  ".join(
+                        "%s %.0f ms" % (phase, seconds * 1000)
+                        for phase, seconds in results[name].items()
+                    ),
+                )
+            )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+What the per command statistics (Scribbler.stats) cost: sensor polls per
+second over a very fast simulated link with the statistics kept and with
+them switched off, the time a begin()/end() pair takes on its own, and the
+statistics a short mixed session produces.
+"""
+
+import time
+
+from benchmarks import simulatedRobot
+from myro.robots.stats import ProtocolStats
+
+
+class NoStats(object):
+    """Stands in for ProtocolStats with nothing kept."""
+
+    def begin(self, opcode, transport):
+        pass
+
+    def batch(self, name, transport):
+        pass
+
+    def end(self):
+        pass
+
+
+def poll(robot, count):
+    start = time.perf_counter()
+    for i in range(count):
+        robot.get("light")
+    return (time.perf_counter() - start) / count
+
+
+def transactions(transport, count):
+    stats = ProtocolStats()
+    start = time.perf_counter()
+    for i in range(count):
+        stats.begin(70, transport)
+        stats.end()
+    return (time.perf_counter() - start) / count
+
+
+def main(count=2000, rounds=5, baudrate=10000000):
+    robot, transport, fw = simulatedRobot(baudrate, fluke="2.9.1")
+    on = off = float("inf")
+    kept = robot._stats
+    for i in range(rounds):
+        robot._stats = kept
+        on = min(on, poll(robot, count))
+        robot._stats = NoStats()
+        off = min(off, poll(robot, count))
+    robot._stats = kept
+    pair = transactions(transport, count * 10)
+    results = {
+        "polls/s on": 1 / on,
+        "polls/s off": 1 / off,
+        "overhead us/poll": (on - off) * 1e6,
+        "begin+end us": pair * 1e6,
+    }
+    print(
+        "stats on  %8.0f polls/s\nstats off %8.0f polls/s"
+        % (results["polls/s on"], results["polls/s off"])
+    )
+    print(
+        "overhead %.2f us/poll; begin+end alone %.2f us"
+        % (results["overhead us/poll"], results["begin+end us"])
+    )
+
+    # a mixed session at Bluetooth speed
+    robot, transport, fw = simulatedRobot(38400, 0.005, fluke="2.9.1")
+    for i in range(20):
+        robot.get("light")
+        robot.get("ir")
+        robot.setLED("left", i % 2)
+    robot.get("all")
+    robot.getBattery()
+    summary = robot.stats()
+    results["session"] = summary
+    print(
+        "%-20s %5s %6s %6s %4s %8s %8s %8s"
+        % ("command", "count", "out", "in", "t/o", "mean ms", "p99 ms", "max ms")
+    )
+    for name, entry in sorted(summary.items(), key=lambda item: str(item[0])):
+        print(
+            "%-20s %5d %6d %6d %4d %8.2f %8.2f %8.2f"
+            % (
+                name,
+                entry["count"],
+                entry["bytes out"],
+                entry["bytes in"],
+                entry["timeouts"],
+                entry["mean ms"],
+                entry["p99 ms"],
+                entry["max ms"],
+            )
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+How long stop() takes to get its packet answered while other threads keep
+the link busy with pipelined batches, get("all") and beeps, with the
+robot's PriorityLock and with a lock that treats stop() like any other
+command (what the threading.Lock it replaced did).
+"""
+
+import random
+import threading
+import time
+
+from benchmarks import simulatedRobot
+from myro.robots.locking import PriorityLock
+
+
+class PlainLock(object):
+    """The threading.Lock the robots used before, with the new interface."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owner = None
+
+    def acquire(self, blocking=True, timeout=-1, urgent=False):
+        if self._lock.acquire(blocking, timeout):
+            self._owner = threading.get_ident()
+            return True
+        return False
+
+    def release(self):
+        self._owner = None
+        self._lock.release()
+
+    def heldByMe(self):
+        return self._owner == threading.get_ident()
+
+    def urgentWaiting(self):
+        return False
+
+
+def batch(robot):
+    with robot.pipeline(depth=8) as pipeline:
+        for i in range(40):
+            pipeline.get(robot.GET_ALL, 11)
+
+
+def load(robot, stopping):
+    workers = [
+        lambda: batch(robot),
+        lambda: robot.get("all"),
+        lambda: robot.get("all"),
+        lambda: robot.beep(0.1, 440),
+    ]
+
+    def run(work):
+        while not stopping.is_set():
+            work()
+
+    threads = [threading.Thread(target=run, args=(work,)) for work in workers]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def measure(lock, stops, baudrate, latency):
+    robot, transport, fw = simulatedRobot(baudrate, latency, fluke="2.9.1")
+    robot.lock = lock
+    stopping = threading.Event()
+    threads = load(robot, stopping)
+    random.seed(1)
+    times = []
+    try:
+        for i in range(stops):
+            time.sleep(random.uniform(0.02, 0.1))
+            start = time.perf_counter()
+            robot.stop()
+            times.append(time.perf_counter() - start)
+    finally:
+        stopping.set()
+        for thread in threads:
+            thread.join()
+    times.sort()
+    return {
+        "median ms": times[len(times) // 2] * 1000,
+        "max ms": times[-1] * 1000,
+    }
+
+
+def main(stops=20, baudrate=38400, latency=0.02):
+    results = {
+        "plain": measure(PlainLock(), stops, baudrate, latency),
+        "priority": measure(PriorityLock(), stops, baudrate, latency),
+    }
+    for name in ("plain", "priority"):
+        print(
+            "%-8s stop latency %7.1f ms median %7.1f ms worst"
+            % (name, results[name]["median ms"], results[name]["max ms"])
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ import traceback
 from .globalvars import makeEnvironment
 from .globalvars import robot
 from .globalvars import setup
+from .robots.fleet import Fleet
 from .robots.scribbler import Scribbler
 
 __AUTHOR__ = "Joshua Arulsamy"
@@ -119,11 +120,11 @@ def ctrlc_handler(signum, frame):
     if robot:
         # robot.open()
         # print "done opening"
-        robot.manual_flush()
-        if "robot" in robot.robotinfo:
-            robot.hardStop()
+        if robot.robotinfo:  # the robot's name, once it has answered
+            robot.hardStop()  # throws away what it interrupted itself
     # raise KeyboardInterrupt
-    orig_ctrl_handler()
+    if callable(orig_ctrl_handler):
+        orig_ctrl_handler(signum, frame)
 
 
 orig_ctrl_handler = signal.getsignal(signal.SIGINT)
@@ -147,9 +148,9 @@ def requestStop():
         robot.requestStop = 1
 
 
-def initialize(port):
+def initialize(port, fastConnect=False):
     global robot
-    robot = Scribbler(port)
+    robot = Scribbler(port, fastConnect=fastConnect)
     __builtins__["robot"] = robot
 
 
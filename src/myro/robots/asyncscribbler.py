@@ -0,0 +1,550 @@
+# -*- coding: utf-8 -*-
+"""
+Scribbler for asyncio programs.
+
+AsyncScribbler speaks the same protocol as myro.robots.scribbler.Scribbler
+but over an asyncio (reader, writer) stream pair, and every method that
+talks to the robot is a coroutine. Nothing blocks the event loop, so one
+loop can drive several robots alongside its other I/O:
+
+    >>> left = await AsyncScribbler.open("/dev/rfcomm0")
+    >>> right = await AsyncScribbler.open("/dev/rfcomm1")
+    >>> await asyncio.gather(left.forward(1, 2), right.getLight())
+
+Opening a serial port needs pyserial-asyncio; myro.robots.simulator's
+openSimulatedConnection() gives a stream pair that needs nothing.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import asyncio
+from struct import Struct
+
+from myro.robots import image
+from myro.robots.scribbler import isTrue
+from myro.robots.scribbler import Scribbler
+
+try:
+    import serial_asyncio
+except ImportError:
+    serial_asyncio = None
+
+_LEDS = {
+    0: (Scribbler.SET_LED_LEFT_ON, Scribbler.SET_LED_LEFT_OFF),
+    "left": (Scribbler.SET_LED_LEFT_ON, Scribbler.SET_LED_LEFT_OFF),
+    1: (Scribbler.SET_LED_CENTER_ON, Scribbler.SET_LED_CENTER_OFF),
+    "center": (Scribbler.SET_LED_CENTER_ON, Scribbler.SET_LED_CENTER_OFF),
+    2: (Scribbler.SET_LED_RIGHT_ON, Scribbler.SET_LED_RIGHT_OFF),
+    "right": (Scribbler.SET_LED_RIGHT_ON, Scribbler.SET_LED_RIGHT_OFF),
+    "all": (Scribbler.SET_LED_ALL_ON, Scribbler.SET_LED_ALL_OFF),
+}
+
+_OBSTACLE = {
+    0: Scribbler.GET_DONGLE_L_IR,
+    "left": Scribbler.GET_DONGLE_L_IR,
+    1: Scribbler.GET_DONGLE_C_IR,
+    "center": Scribbler.GET_DONGLE_C_IR,
+    "middle": Scribbler.GET_DONGLE_C_IR,
+    2: Scribbler.GET_DONGLE_R_IR,
+    "right": Scribbler.GET_DONGLE_R_IR,
+}
+
+_WINDOWS = {"left": 0, "middle": 1, "center": 1, "right": 2}
+
+# the positions get(sensor, *position) accepts for the light sensors, and
+# for the pairs of ir and line sensors
+_LIGHTS = {0: 0, "left": 0, 1: 1, "middle": 1, "center": 1, 2: 2, "right": 2}
+_PAIR = {0: 0, "left": 0, 1: 1, "right": 1}
+
+
+def _sensors(retval):
+    """Decodes the 11 byte GET_ALL reply / sensor trailer."""
+    return {
+        "light": [
+            retval[2] << 8 | retval[3],
+            retval[4] << 8 | retval[5],
+            retval[6] << 8 | retval[7],
+        ],
+        "ir": [retval[0], retval[1]],
+        "line": [retval[8], retval[9]],
+        "stall": retval[10],
+    }
+
+
+def _retrieve(task):
+    """
+    Marks the exception of an exchange whose caller was cancelled as seen,
+    so asyncio doesn't log it as never retrieved.
+    """
+    if not task.cancelled():
+        task.exception()
+
+
+class AsyncScribbler(object):
+    """
+    A Scribbler (with or without a Fluke) on an asyncio stream.
+
+    Requests from different tasks are queued on an asyncio.Lock, so a
+    command and its reply are never interleaved with another task's.
+    Cancelling a call (task.cancel(), asyncio.wait_for()) is safe: a
+    command that has gone out still has its whole reply read, and one
+    still waiting for its turn is never sent.
+    """
+
+    def __init__(self, reader, writer, timeout=10):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.lock = asyncio.Lock()
+        self.dongle = None
+        self.dongle_version = 0
+        self.imagewidth = 0
+        self.imageheight = 0
+        self._echo = True
+        self._lastTranslate = 0
+        self._lastRotate = 0
+        self._volume = 0
+        self._lastSensors = None
+        self._structs = {}
+
+    @classmethod
+    async def open(cls, port, baudrate=38400, timeout=10):
+        """Opens a serial port and connects to the robot on it."""
+        if serial_asyncio is None:
+            raise ImportError("pyserial-asyncio not loaded: can't open %s" % port)
+        reader, writer = await serial_asyncio.open_serial_connection(
+            url=port, baudrate=baudrate
+        )
+        robot = cls(reader, writer, timeout)
+        await robot.connect()
+        return robot
+
+    async def connect(self):
+        """Finds out what is connected; call once before anything else."""
+        info = await self.getInfo()
+        if "fluke" in info:
+            self.dongle = info["fluke"]
+        elif "dongle" in info:
+            self.dongle = info["dongle"]
+        if self.dongle is not None:
+            self.dongle_version = list(map(int, self.dongle.split(".")))
+            if self.dongle_version >= [3, 0, 0]:
+                self.imagewidth = 1280
+                self.imageheight = 800
+            else:
+                self.imagewidth = 256
+                self.imageheight = 192
+        return info
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    # Protocol
+
+    async def _read(self, bytes_):
+        """
+        Reads exactly bytes_ bytes. The timeout limits how long the robot
+        may go quiet, not the whole read, so large images still arrive.
+        """
+        data = bytearray()
+        while len(data) < bytes_:
+            try:
+                chunk = await asyncio.wait_for(
+                    self.reader.read(bytes_ - len(data)), self.timeout
+                )
+            except asyncio.TimeoutError:
+                chunk = b""
+            if not chunk:
+                raise IOError("timeout waiting for %d bytes" % bytes_)
+            data += chunk
+        return data
+
+    async def _readline(self):
+        try:
+            return await asyncio.wait_for(self.reader.readline(), self.timeout)
+        except asyncio.TimeoutError:
+            raise IOError("timeout waiting for a line")
+
+    async def _send(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def _exchange(self, request):
+        """
+        Runs request(), a coroutine function that writes one command and
+        reads its whole reply, with the lock held, and returns its result.
+        It runs in a task of its own, so a caller cancelled part way
+        through doesn't leave the reply in the stream for the next command.
+        """
+        started = False
+
+        async def locked():
+            nonlocal started
+            async with self.lock:
+                started = True
+                return await request()
+
+        task = asyncio.ensure_future(locked())
+        task.add_done_callback(_retrieve)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not started:
+                task.cancel()
+            raise
+
+    def _struct(self, format):
+        try:
+            return self._structs[format]
+        except KeyError:
+            self._structs[format] = Struct(format)
+            return self._structs[format]
+
+    async def _get(self, value, bytes=1, mode="byte", setByte=0xFF):
+        if setByte != 0xFF:
+            packet = Scribbler._packet([value, setByte])
+        else:
+            packet = Scribbler._packet([value])
+
+        async def request():
+            await self._send(packet)
+            if self._echo:
+                await self._read(Scribbler.PACKET_LENGTH)
+            if mode == "line":
+                return await self._readline()
+            return await self._read(bytes)
+
+        data = await self._exchange(request)
+        if mode == "line":
+            return data
+        elif mode == "word":
+            return list(self._struct(">%dH" % (bytes // 2)).unpack(data))
+        elif mode == "long":
+            return list(self._struct(">%di" % (bytes // 4)).unpack(data))
+        return list(data)
+
+    async def _set(self, *values, wait=0):
+        """Sends a set packet; wait is how long the robot is busy with it."""
+        packet = Scribbler._packet(values)
+
+        async def request():
+            await self._send(packet)
+            if self._echo:
+                await self._read(Scribbler.PACKET_LENGTH)
+            if wait:
+                try:
+                    return await asyncio.wait_for(
+                        self.reader.readexactly(11), wait + self.timeout
+                    )
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    raise IOError("timeout waiting for 11 bytes")
+            return await self._read(11)
+
+        sensors = await self._exchange(request)
+        self._lastSensors = list(sensors)
+        return self._lastSensors
+
+    async def _fluke(self, command, bytes_=0):
+        """Sends a fluke command and reads bytes_ bytes of reply."""
+
+        async def request():
+            await self._send(bytes(command))
+            if bytes_:
+                return await self._read(bytes_)
+
+        return await self._exchange(request)
+
+    # Sensors
+
+    async def getInfo(self, *item):
+
+        async def request():
+            await self._send(Scribbler._packet([Scribbler.GET_INFO]))
+            return await self._readline()
+
+        line = (await self._exchange(request)).decode("ISO-8859-1")
+        # skip the echo (if any) in front of the info
+        start = line.find("fluke")
+        if start < 0:
+            start = line.find("Robot")
+        line = line[max(start, 0) :]
+        retDict = {}
+        for pair in line.split(","):
+            if ":" in pair:
+                it, value = pair.split(":")
+                retDict[it.lower().strip()] = value.strip()
+        if len(item) == 0:
+            return retDict
+        retval = [retDict[it.lower().strip()] for it in item]
+        if len(retval) == 1:
+            return retval[0]
+        return retval
+
+    async def get(self, sensor="all", *position):
+        sensor = sensor.lower()
+        if sensor == "all":
+            retval = await self._get(Scribbler.GET_ALL, 11)
+            self._lastSensors = retval
+            retDict = _sensors(retval)
+            if self.dongle is not None:
+                retDict["obstacle"] = await self.getObstacle()
+                retDict["bright"] = await self.getBright()
+                retDict["battery"] = await self.getBattery()
+            return retDict
+        elif sensor == "stall":
+            retval = await self._get(Scribbler.GET_ALL, 11)
+            self._lastSensors = retval
+            return retval[10]
+        elif sensor == "name":
+            c = await self._get(Scribbler.GET_NAME1, 8)
+            c += await self._get(Scribbler.GET_NAME2, 8)
+            return "".join([chr(x) for x in c if "0" <= chr(x) <= "z"]).strip()
+        elif sensor == "data":
+            return await self.getData(*position)
+        elif sensor == "info":
+            return await self.getInfo(*position)
+        elif sensor == "volume":
+            return self._volume
+        elif sensor == "battery":
+            return await self.getBattery()
+        elif sensor == "obstacle":
+            return await self.getObstacle(*position)
+        elif sensor == "bright":
+            return await self.getBright(*position)
+        elif sensor == "picture":
+            return await self.takePicture(*position)
+        elif sensor == "light":
+            values = await self._get(Scribbler.GET_LIGHT_ALL, 6, "word")
+            positions = _LIGHTS
+        elif sensor == "ir":
+            values = await self._get(Scribbler.GET_IR_ALL, 2)
+            positions = _PAIR
+        elif sensor == "line":
+            values = await self._get(Scribbler.GET_LINE_ALL, 2)
+            positions = _PAIR
+        else:
+            raise AttributeError("invalid sensor name: '%s'" % sensor)
+        if len(position) == 0:
+            return values
+        retvals = []
+        for pos in position:
+            if pos is None or pos == "all":
+                retvals.append(values)
+            else:
+                retvals.append(values[positions[pos]])
+        if len(retvals) == 1:
+            return retvals[0]
+        return retvals
+
+    async def getLight(self, *position):
+        return await self.get("light", *position)
+
+    async def getIR(self, *position):
+        return await self.get("ir", *position)
+
+    async def getLine(self, *position):
+        return await self.get("line", *position)
+
+    async def getStall(self):
+        return await self.get("stall")
+
+    async def getName(self):
+        return await self.get("name")
+
+    async def getAll(self):
+        return await self.get("all")
+
+    async def getData(self, *position):
+        data = await self._get(Scribbler.GET_DATA, 8)
+        if len(position) == 0:
+            return data
+        retval = [data[p] for p in position]
+        if len(retval) == 1:
+            return retval[0]
+        return retval
+
+    def getLastSensors(self):
+        """The sensors that came back with the last set; no I/O."""
+        if self._lastSensors is None:
+            return None
+        return _sensors(self._lastSensors)
+
+    async def getBattery(self):
+        data = await self._fluke([Scribbler.GET_BATTERY], 2)
+        return (data[0] << 8 | data[1]) / 20.9813
+
+    async def getObstacle(self, value=None):
+        if value is None or value == "all":
+            return [
+                await self.getObstacle("left"),
+                await self.getObstacle("center"),
+                await self.getObstacle("right"),
+            ]
+        data = await self._fluke([_OBSTACLE[value]], 2)
+        return data[0] << 8 | data[1]
+
+    async def getBright(self, window=None):
+        if window is None or window == "all":
+            return [
+                await self.getBright("left"),
+                await self.getBright("middle"),
+                await self.getBright("right"),
+            ]
+        window = _WINDOWS.get(window, window)
+        data = await self._fluke([Scribbler.GET_WINDOW_LIGHT, window], 3)
+        return data[0] << 16 | data[1] << 8 | data[2]
+
+    async def getEncoders(self, zeroEncoders=False):
+        """
+        Gets the left and right wheel encoder counts (Scribbler 2 only),
+        zeroing them afterwards if zeroEncoders is True.
+        """
+        if zeroEncoders:
+            return await self._get(Scribbler.GET_ENCODERS, 8, "long", 0x00)
+        return await self._get(Scribbler.GET_ENCODERS, 8, "long", 0x01)
+
+    async def getPosition(self):
+        return await self._get(Scribbler.GET_POSN, 8, "long")
+
+    async def getAngle(self):
+        return (await self._get(Scribbler.GET_ANGLE, 4, "long"))[0]
+
+    async def takePicture(self, mode="color"):
+        """
+        Returns the camera image as an array.array of bytes, row by row,
+        imagewidth x imageheight: 3 bytes (RGB) per pixel for "color",
+        "color-bilinear-h" and "color-bilinear-v" (colour averaged with the
+        pixels to the right or above, see myro.robots.image), one (255
+        inside the blob, 0 outside) for "blob".
+        """
+        if self.dongle is None:
+            raise AttributeError("taking pictures needs a fluke")
+        width = self.imagewidth
+        height = self.imageheight
+        if mode in image.COLOR_MODES:
+            data = await self._fluke([Scribbler.GET_IMAGE], width * height)
+            return image.COLOR_MODES[mode](data, width, height)
+        elif mode == "blob":
+            data, counterBytes = await self._grabRLE()
+            return image.decodeRLE(data, width, height, counterBytes)
+        raise AttributeError("unsupported picture mode: '%s'" % mode)
+
+    async def getBlobStats(self):
+        """
+        Returns the area, centroid, bounding box and per row extents of the
+        blob, worked out from the run-length encoded picture without
+        decoding it; see myro.robots.image.blobStats.
+        """
+        if self.dongle is None:
+            raise AttributeError("blob statistics need a fluke")
+        data, counterBytes = await self._grabRLE()
+        return image.blobStats(data, self.imagewidth, self.imageheight, counterBytes)
+
+    async def _grabRLE(self):
+        """Returns the GET_RLE runs and the size of their counters."""
+
+        async def request():
+            await self._send(bytes((Scribbler.GET_RLE,)))
+            size = await self._read(2)
+            return await self._read(size[0] << 8 | size[1])
+
+        data = await self._exchange(request)
+        if self.dongle_version >= [3, 0, 0]:
+            return data, 3
+        return data, 2
+
+    # Actuators
+
+    async def setLED(self, position, value):
+        if isinstance(position, str):
+            position = position.lower()
+        if position not in _LEDS:
+            raise AttributeError("no such LED: '%s'" % position)
+        on, off = _LEDS[position]
+        if isTrue(value):
+            return await self._set(on)
+        return await self._set(off)
+
+    async def setVolume(self, value):
+        if isTrue(value):
+            self._volume = 1
+            return await self._set(Scribbler.SET_LOUD)
+        self._volume = 0
+        return await self._set(Scribbler.SET_QUIET)
+
+    async def beep(self, duration, frequency, frequency2=None):
+        """Plays a tone; returns once the robot has finished playing it."""
+        duration = int(duration * 1000)
+        if frequency2 is None:
+            frequency = int(frequency)
+            await self._set(
+                Scribbler.SET_SPEAKER,
+                duration >> 8,
+                duration % 256,
+                frequency >> 8,
+                frequency % 256,
+                wait=duration / 1000.0,
+            )
+        else:
+            frequency = int(frequency)
+            frequency2 = int(frequency2)
+            await self._set(
+                Scribbler.SET_SPEAKER_2,
+                duration >> 8,
+                duration % 256,
+                frequency >> 8,
+                frequency % 256,
+                frequency2 >> 8,
+                frequency2 % 256,
+                wait=duration / 1000.0,
+            )
+
+    async def _adjustSpeed(self):
+        left = min(max(self._lastTranslate - self._lastRotate, -1), 1)
+        right = min(max(self._lastTranslate + self._lastRotate, -1), 1)
+        leftPower = int((left + 1.0) * 100.0)
+        rightPower = int((right + 1.0) * 100.0)
+        return await self._set(Scribbler.SET_MOTORS, rightPower, leftPower)
+
+    async def move(self, translate, rotate):
+        self._lastTranslate = translate
+        self._lastRotate = rotate
+        return await self._adjustSpeed()
+
+    async def translate(self, amount):
+        self._lastTranslate = amount
+        return await self._adjustSpeed()
+
+    async def rotate(self, amount):
+        self._lastRotate = amount
+        return await self._adjustSpeed()
+
+    async def motors(self, left, right):
+        trans = (right + left) / 2.0
+        rotate = (right - left) / 2.0
+        return await self.move(trans, rotate)
+
+    async def stop(self):
+        self._lastTranslate = 0
+        self._lastRotate = 0
+        return await self._set(Scribbler.SET_MOTORS_OFF)
+
+    async def _moveFor(self, translate, rotate, interval):
+        retval = await self.move(translate, rotate)
+        if interval is not None:
+            await asyncio.sleep(interval)
+            retval = await self.stop()
+        return retval
+
+    async def forward(self, speed=1, interval=None):
+        return await self._moveFor(speed, 0, interval)
+
+    async def backward(self, speed=1, interval=None):
+        return await self._moveFor(-speed, 0, interval)
+
+    async def turnLeft(self, speed=1, interval=None):
+        return await self._moveFor(0, speed, interval)
+
+    async def turnRight(self, speed=1, interval=None):
+        return await self._moveFor(0, -speed, interval)
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+Recording a robot's serial traffic and playing it back.
+
+A CaptureTransport wraps the transport a robot talks through and logs
+every byte written and read, with the time it happened and a mark at the
+start of every command, to a compact binary file. A ReplayTransport reads
+that file back and answers the robot's reads with exactly what was
+recorded, so the same program reruns the same way, as fast as the host
+allows, without a robot. Writes are checked against the recording, and the
+first one that differs raises ReplayDiverged saying where the two went
+apart; errors the link had while recording are raised again as IOErrors,
+so reconnects replay too.
+
+Set MYROCAPTURE to a file name to capture every Scribbler a program opens,
+and MYROREPLAY to the same name to run the program again from the file.
+
+The file is a header (MAGIC, then the port name as a 2-byte length and
+UTF-8) followed by records of kind, microseconds since the record before,
+an argument and a payload length (RECORD), then the payload.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import struct
+import threading
+import time
+
+from myro.robots.transport import Transport
+from myro.robots.transport import _asbytes
+
+MAGIC = b"MYROCAP\x01"
+RECORD = struct.Struct("<BIII")  # kind, microseconds, argument, length
+
+# record kinds, and what their argument and payload hold
+WRITE = 1  # -, the bytes written
+READ = 2  # bytes asked for, the bytes read
+LINE = 3  # -, the line read by readline()
+WAITING = 4  # in_waiting when it was not 0, -
+MARK = 5  # the opcode of the command starting, -
+ERROR = 6  # the kind of operation that failed, the error message
+CLOSE = 7  # -, -
+REOPEN = 8  # -, -
+
+NAMES = {
+    WRITE: "write",
+    READ: "read",
+    LINE: "line",
+    WAITING: "waiting",
+    MARK: "mark",
+    ERROR: "error",
+    CLOSE: "close",
+    REOPEN: "reopen",
+}
+
+
+class ReplayDiverged(ValueError):
+    """
+    The program being replayed did something other than what was recorded.
+    It is not an IOError, so the robot doesn't take it for a dropped link.
+    """
+
+
+class CaptureTransport(Transport):
+    """
+    Passes everything through to transport and logs it to path.
+    """
+
+    def __init__(self, transport, path):
+        Transport.__init__(self)
+        self.transport = transport
+        self.portstr = transport.portstr
+        self.path = path
+        self.records = 0
+        self._log = open(path, "wb")
+        self._logLock = threading.Lock()
+        self._last = time.perf_counter()
+        port = (self.portstr or "").encode("utf-8")
+        self._log.write(MAGIC + struct.pack("<H", len(port)) + port)
+
+    def _record(self, kind, arg=0, data=b""):
+        with self._logLock:
+            now = time.perf_counter()
+            micros = min(int((now - self._last) * 1e6), 0xFFFFFFFF)
+            self._last = now
+            self._log.write(RECORD.pack(kind, micros, arg, len(data)))
+            if data:
+                self._log.write(data)
+            self.records += 1
+
+    def _failed(self, kind, error):
+        self._record(ERROR, kind, str(error).encode("utf-8", "replace"))
+
+    @property
+    def timeout(self):
+        return self.transport.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self.transport.timeout = value
+
+    @property
+    def baudrate(self):
+        return self.transport.baudrate
+
+    @baudrate.setter
+    def baudrate(self, value):
+        self.transport.baudrate = value
+
+    @property
+    def in_waiting(self):
+        try:
+            count = self.transport.in_waiting
+        except (IOError, OSError) as e:
+            self._failed(WAITING, e)
+            raise
+        if count:
+            self._record(WAITING, count)
+        return count
+
+    def mark(self, opcode):
+        self._record(MARK, opcode)
+
+    def write(self, data):
+        data = _asbytes(data)
+        try:
+            count = self.transport.write(data)
+        except (IOError, OSError) as e:
+            self._failed(WRITE, e)
+            raise
+        self.bytesWritten += len(data)
+        self._record(WRITE, 0, data)
+        return count
+
+    def read(self, size=1):
+        try:
+            data = self.transport.read(size)
+        except (IOError, OSError) as e:
+            self._failed(READ, e)
+            raise
+        self._readDone(len(data), size)
+        self._record(READ, size, data)
+        return data
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast("B")
+        try:
+            count = self.transport.readinto(view)
+        except (IOError, OSError) as e:
+            self._failed(READ, e)
+            raise
+        self._readDone(count, len(view))
+        self._record(READ, len(view), view[:count])
+        return count
+
+    def readline(self):
+        try:
+            data = self.transport.readline()
+        except (IOError, OSError) as e:
+            self._failed(LINE, e)
+            raise
+        self._readDone(len(data), len(data) + (not data.endswith(b"\n")))
+        self._record(LINE, 0, data)
+        return data
+
+    def reset_input_buffer(self):
+        self.transport.reset_input_buffer()
+
+    def reset_output_buffer(self):
+        self.transport.reset_output_buffer()
+
+    def setDTR(self, value=1):
+        self.transport.setDTR(value)
+
+    def reopen(self, transport=None):
+        """
+        Carries on capturing through transport, or through what the wrapped
+        transport's own reopen() returns.
+        """
+        try:
+            if transport is None:
+                transport = self.transport.reopen()
+        except (IOError, OSError) as e:
+            self._failed(REOPEN, e)
+            raise
+        self.transport = transport
+        self._record(REOPEN)
+        return self
+
+    def close(self):
+        """Closes the wrapped transport; the log stays open for reopen()."""
+        self._record(CLOSE)
+        with self._logLock:
+            self._log.flush()
+        self.transport.close()
+
+    def finish(self):
+        """Stops capturing and closes the log (but not the transport)."""
+        with self._logLock:
+            if not self._log.closed:
+                self._log.close()
+
+
+def readCapture(path):
+    """
+    Returns (port name, records) for a capture file, where records is a
+    list of (kind, seconds since the record before, argument, payload).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[: len(MAGIC)] != MAGIC:
+        raise IOError("%s is not a myro capture" % path)
+    offset = len(MAGIC)
+    (length,) = struct.unpack_from("<H", data, offset)
+    offset += 2
+    port = data[offset : offset + length].decode("utf-8")
+    offset += length
+    records = []
+    size = RECORD.size
+    while offset + size <= len(data):
+        kind, micros, arg, length = RECORD.unpack_from(data, offset)
+        offset += size
+        records.append((kind, micros / 1e6, arg, data[offset : offset + length]))
+        offset += length
+    return port, records
+
+
+class ReplayTransport(Transport):
+    """
+    Plays a capture file back to a robot.
+
+    strict - raise ReplayDiverged when the robot writes something other than what
+             was recorded, or asks for a different number of bytes
+    speed  - None to answer reads at once, or how many times faster than
+             the recording to go (1.0 is the recorded timing)
+    """
+
+    def __init__(self, path, strict=True, speed=None):
+        Transport.__init__(self)
+        self.portstr, self._records = readCapture(path)
+        self.path = path
+        self.strict = strict
+        self.speed = speed
+        self.position = 0  # index of the next record to play
+        self.divergences = 0
+        self._timeout = 10
+        self.baudrate = None
+        self._start = time.perf_counter()
+        self._elapsed = 0.0  # recorded time of the record last played
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._timeout = value
+
+    def remaining(self):
+        """The number of reads and writes not played back yet."""
+        return sum(
+            1
+            for record in self._records[self.position :]
+            if record[0] in (WRITE, READ, LINE)
+        )
+
+    def _peek(self):
+        """The next record that is not a mark or close, or None at the end."""
+        records = self._records
+        while self.position < len(records):
+            record = records[self.position]
+            if record[0] not in (MARK, CLOSE):
+                return record
+            self._elapsed += record[1]
+            self.position += 1
+        return None
+
+    def _take(self, kind, what):
+        record = self._peek()
+        if record is None:
+            self._diverged("%s past the end of the recording" % what)
+            return None
+        if record[0] == ERROR and record[2] == kind:
+            self._advance(record)
+            raise IOError(record[3].decode("utf-8", "replace"))
+        if record[0] != kind:
+            self._diverged(
+                "%s where the recording has %s"
+                % (what, NAMES.get(record[0], record[0]))
+            )
+            if not self.strict:
+                return None
+        self._advance(record)
+        return record
+
+    def _advance(self, record):
+        self.position += 1
+        self._elapsed += record[1]
+        if self.speed:
+            delay = self._start + self._elapsed / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _diverged(self, message):
+        self.divergences += 1
+        if self.strict:
+            raise ReplayDiverged(
+                "replay diverged at record %d: %s" % (self.position, message)
+            )
+
+    @property
+    def in_waiting(self):
+        record = self._peek()
+        if record is not None and record[0] == WAITING:
+            self._advance(record)
+            return record[2]
+        if record is not None and record[0] == ERROR and record[2] == WAITING:
+            self._advance(record)
+            raise IOError(record[3].decode("utf-8", "replace"))
+        return 0
+
+    def write(self, data):
+        data = _asbytes(data)
+        record = self._take(WRITE, "wrote %r" % data[:16])
+        if record is not None and record[3] != data:
+            self._diverged("wrote %r, recorded %r" % (data[:16], record[3][:16]))
+        self.bytesWritten += len(data)
+        return len(data)
+
+    def read(self, size=1):
+        record = self._take(READ, "read of %d" % size)
+        if record is None:
+            data = b""
+        else:
+            if record[2] != size:
+                self._diverged("read of %d, recorded %d" % (size, record[2]))
+            data = record[3][:size]
+        self._readDone(len(data), size)
+        return data
+
+    def readline(self):
+        record = self._take(LINE, "readline")
+        data = b"" if record is None else record[3]
+        self._readDone(len(data), len(data) + (not data.endswith(b"\n")))
+        return data
+
+    def reopen(self):
+        self._take(REOPEN, "reopen")
+        return self
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Finding a robot by name.
+
+A Scribbler that has just been reset (or turned on) broadcasts "IPRE"
+followed by its 9 byte name until something talks to it. search() listens
+for that on every candidate serial port at once, each with a short
+deadline, and remembers the port each robot was found on in a small JSON
+file so that the next Scribbler("Scribby") can go straight to it.
+
+The cache lives in ~/.myro/ports.json, or wherever the MYROPORTS
+environment variable points.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import concurrent.futures
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+from myro.robots.transport import SerialTransport
+
+try:
+    from serial.tools import list_ports
+except ImportError:
+    list_ports = None
+
+MAGIC = b"IPRE"
+NAME_LENGTH = 9
+# device name patterns robots show up as, most likely first
+LINUX_PATTERNS = ("/dev/rfcomm*", "/dev/ttyUSB*", "/dev/ttyACM*")
+MAC_PATTERNS = ("/dev/tty.*", "/dev/cu.*")
+
+_cacheLock = threading.Lock()
+
+
+def cachePath():
+    """Returns the path of the name -> port cache file."""
+    if "MYROPORTS" in os.environ:
+        return os.environ["MYROPORTS"]
+    return os.path.join(os.path.expanduser("~"), ".myro", "ports.json")
+
+
+def loadCache():
+    """Returns the cached {name: port} dict; empty if there is none."""
+    try:
+        with open(cachePath()) as f:
+            cache = json.load(f)
+    except (IOError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return cache
+
+
+def _saveCache(cache):
+    path = cachePath()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # write a copy and swap it in, so a reader never sees half a file
+    temp = "%s.%d" % (path, os.getpid())
+    with open(temp, "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(temp, path)
+
+
+def cachedPort(name):
+    """Returns the port robot name was last found on, or None."""
+    return loadCache().get(name)
+
+
+def remember(name, port):
+    """Records that robot name is on port."""
+    with _cacheLock:
+        cache = loadCache()
+        if cache.get(name) == port:
+            return
+        cache[name] = port
+        try:
+            _saveCache(cache)
+        except (IOError, OSError):
+            pass  # not being able to cache is no reason to fail a connect
+
+
+def forget(name):
+    """Drops robot name from the cache."""
+    with _cacheLock:
+        cache = loadCache()
+        if cache.pop(name, None) is None:
+            return
+        try:
+            _saveCache(cache)
+        except (IOError, OSError):
+            pass
+
+
+def candidatePorts():
+    """
+    Returns the serial ports a robot might be on: Bluetooth, USB serial
+    and ACM devices on Linux, whatever pyserial can list elsewhere, and
+    COM1 to COM20 on Windows if it can't.
+    """
+    ports = []
+    if sys.platform.startswith("linux"):
+        patterns = LINUX_PATTERNS
+    elif sys.platform == "darwin":
+        patterns = MAC_PATTERNS
+    else:
+        patterns = ()
+    for pattern in patterns:
+        ports.extend(sorted(glob.glob(pattern)))
+    if list_ports is not None:
+        for info in list_ports.comports():
+            if info.device not in ports:
+                ports.append(info.device)
+    elif sys.platform.startswith("win"):
+        ports.extend(["COM%d" % x for x in range(1, 10)])
+        ports.extend([r"\\.\COM%d" % x for x in range(10, 21)])
+    return ports
+
+
+def parseBroadcast(data):
+    """Returns the robot name in broadcast bytes, or None if there isn't one."""
+    position = data.find(MAGIC)
+    if position < 0 or len(data) < position + len(MAGIC) + NAME_LENGTH:
+        return None
+    name = data[position + len(MAGIC) : position + len(MAGIC) + NAME_LENGTH]
+    return name.replace(b"\x00", b"").decode("ISO-8859-1").strip()
+
+
+def probe(port, baudrate=38400, deadline=2.0, opener=SerialTransport):
+    """
+    Listens on port for up to deadline seconds for a robot's broadcast and
+    returns its name, or None if the port can't be opened or stays quiet.
+    opener(port, baudrate, timeout=...) opens the port.
+    """
+    try:
+        ser = opener(port, baudrate, timeout=0.05)
+    except Exception:
+        return None
+    try:
+        end = time.monotonic() + deadline
+        data = bytearray()
+        while time.monotonic() < end:
+            data += ser.read(max(ser.in_waiting, 1))
+            name = parseBroadcast(data)
+            if name is not None:
+                return name
+            # keep enough to catch a broadcast split across reads
+            del data[: -(len(MAGIC) + NAME_LENGTH)]
+        return None
+    except Exception:
+        return None
+    finally:
+        try:
+            ser.close()
+        except Exception:
+            pass
+
+
+def search(
+    name=None, baudrate=38400, ports=None, deadline=2.0, workers=16, opener=None
+):
+    """
+    Probes ports (candidatePorts() by default) in parallel, workers at a
+    time, and caches every robot it hears. Returns the port robot name is
+    on as soon as it turns up, or raises ValueError if it doesn't. With
+    name None, waits for every port and returns the {name: port} found.
+    """
+    if ports is None:
+        ports = candidatePorts()
+    if opener is None:
+        opener = SerialTransport
+    found = {}
+    pool = concurrent.futures.ThreadPoolExecutor(max(1, min(workers, len(ports))))
+    try:
+        futures = {
+            pool.submit(probe, port, baudrate, deadline, opener): port for port in ports
+        }
+        for future in concurrent.futures.as_completed(futures):
+            robot = future.result()
+            if robot is None:
+                continue
+            port = futures[future]
+            found[robot] = port
+            remember(robot, port)
+            if robot == name:
+                for other in futures:
+                    other.cancel()
+                return port
+    finally:
+        # probes already running finish within their deadline on their own
+        pool.shutdown(wait=False)
+    if name is None:
+        return found
+    raise ValueError("Couldn't find robot named '%s'" % name)
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Driving many robots at once.
+
+A Fleet owns a set of Scribbler connections and gives every robot its own
+worker thread, so a command sent to the whole fleet goes out on all the
+serial links at the same time instead of one robot after another. Each
+link still has its own lock, so robots never wait on each other.
+
+Every robot's commands run in order on its own worker, and fleet commands
+are queued on all the workers at once, so fleet commands sent from several
+threads run one after another on each robot instead of deadlocking. stop()
+and hardStop() skip those queues and go straight to the robots.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import concurrent.futures
+import threading
+import time
+
+from myro.robots.scribbler import Scribbler
+
+
+class FleetError(IOError):
+    """
+    One or more robots failed a fleet command.
+
+    errors  - {index: exception} for the robots that failed
+    results - the per robot results, with None for the ones that failed
+    """
+
+    def __init__(self, method, errors, results):
+        IOError.__init__(
+            self,
+            "%s failed on %d of %d robots: %s"
+            % (
+                method,
+                len(errors),
+                len(results),
+                ", ".join("%d: %s" % (i, e) for i, e in sorted(errors.items())),
+            ),
+        )
+        self.errors = errors
+        self.results = results
+
+
+class Fleet(object):
+    """
+    A group of robots commanded together.
+
+    Fleet(robots) takes already connected robots; Fleet.connect(ports)
+    connects to all of them concurrently. gather("method", ...) calls a
+    robot method on every robot at once and returns the results in robot
+    order; move(), stop(), get() and the rest are shorthands for it.
+
+    The robots are released together from a barrier, and skew holds how
+    far apart (in seconds) they started and finished the last command. A
+    robot waits at most syncTimeout seconds there for the others (which may
+    still be busy with an earlier command), then goes ahead on its own.
+    """
+
+    syncTimeout = 10.0
+
+    def __init__(self, robots=()):
+        self.robots = list(robots)
+        self.skew = {"start": 0.0, "finish": 0.0}
+        self._pools = None
+        self._stopPool = None
+        self._submitLock = threading.Lock()
+
+    @classmethod
+    def connect(cls, ports, baudrate=38400, fastConnect=True, **kwargs):
+        """
+        Connects to every port (or robot name) in ports at once and returns
+        the Fleet. Raises FleetError, after closing the robots that did
+        connect, if any of them couldn't be reached.
+        """
+        ports = list(ports)
+        results = [None] * len(ports)
+        errors = {}
+        with concurrent.futures.ThreadPoolExecutor(max(1, len(ports))) as pool:
+            futures = {
+                pool.submit(
+                    Scribbler, port, baudrate, fastConnect=fastConnect, **kwargs
+                ): i
+                for i, port in enumerate(ports)
+            }
+            for future in concurrent.futures.as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    errors[i] = e
+        if errors:
+            for robot in results:
+                if robot is not None:
+                    robot.close()
+            raise FleetError("connect", errors, results)
+        return cls(results)
+
+    def __len__(self):
+        return len(self.robots)
+
+    def __iter__(self):
+        return iter(self.robots)
+
+    def __getitem__(self, index):
+        return self.robots[index]
+
+    def add(self, robot):
+        """Adds a connected robot to the fleet."""
+        with self._submitLock:
+            self.robots.append(robot)
+            self._shutdown()
+
+    def remove(self, robot):
+        """Takes a robot out of the fleet (without closing it)."""
+        with self._submitLock:
+            self.robots.remove(robot)
+            self._shutdown()
+
+    def _resize(self):
+        with self._submitLock:
+            self._shutdown()
+
+    def _shutdown(self):
+        """Lets the worker threads go; _submitLock must be held."""
+        if self._pools is not None:
+            for pool in self._pools:
+                pool.shutdown(wait=False)
+            self._pools = None
+        if self._stopPool is not None:
+            self._stopPool.shutdown(wait=False)
+            self._stopPool = None
+
+    def _workers(self):
+        """One single thread executor per robot, in robot order."""
+        if self._pools is None:
+            self._pools = [
+                concurrent.futures.ThreadPoolExecutor(
+                    1, thread_name_prefix="MyroFleet%d" % i
+                )
+                for i in range(len(self.robots))
+            ]
+        return self._pools
+
+    def gather(self, method, *args, **kwargs):
+        """
+        Calls robot.method(*args, **kwargs) on every robot concurrently and
+        returns the list of results. If any robot fails, the others still
+        finish and FleetError is raised with what each one did.
+        """
+
+        def call(i, robot):
+            try:
+                function = getattr(robot, method)
+            except BaseException:
+                # don't leave the other robots waiting for this one
+                barrier.abort()
+                raise
+            try:
+                barrier.wait(self.syncTimeout)
+            except threading.BrokenBarrierError:
+                pass
+            starts[i] = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                finishes[i] = time.perf_counter()
+
+        # queue on every worker at once, so that all of them run
+        # overlapping fleet commands in the same order
+        with self._submitLock:
+            count = len(self.robots)
+            if count == 0:
+                return []
+            barrier = threading.Barrier(count)
+            starts = [0.0] * count
+            finishes = [0.0] * count
+            futures = [
+                pool.submit(call, i, robot)
+                for i, (pool, robot) in enumerate(zip(self._workers(), self.robots))
+            ]
+        try:
+            return self._results(method, futures)
+        finally:
+            self.skew = {
+                "start": max(starts) - min(starts),
+                "finish": max(finishes) - min(finishes),
+            }
+
+    def _results(self, method, futures):
+        """Waits for futures; returns their results or raises FleetError."""
+        results = [None] * len(futures)
+        errors = {}
+        for i, future in enumerate(futures):
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                errors[i] = e
+        if errors:
+            raise FleetError(method, errors, results)
+        return results
+
+    def _now(self, method):
+        """
+        Calls robot.method() on every robot at once from threads of its own,
+        not behind the fleet commands queued on the workers, so that a stop
+        reaches each robot's lock (where it goes ahead of other waiters)
+        while those are still running.
+        """
+        with self._submitLock:
+            if self._stopPool is None:
+                self._stopPool = concurrent.futures.ThreadPoolExecutor(
+                    max(1, len(self.robots)), thread_name_prefix="MyroFleetStop"
+                )
+            futures = [
+                self._stopPool.submit(lambda robot=robot: getattr(robot, method)())
+                for robot in self.robots
+            ]
+        return self._results(method, futures)
+
+    broadcast = gather
+
+    def get(self, sensor="all", *position):
+        return self.gather("get", sensor, *position)
+
+    def getName(self):
+        return self.gather("getName")
+
+    def move(self, translate, rotate):
+        return self.gather("move", translate, rotate)
+
+    def translate(self, amount):
+        return self.gather("translate", amount)
+
+    def rotate(self, amount):
+        return self.gather("rotate", amount)
+
+    def motors(self, left, right):
+        return self.gather("motors", left, right)
+
+    def forward(self, speed=1, interval=None):
+        return self.gather("forward", speed, interval)
+
+    def backward(self, speed=1, interval=None):
+        return self.gather("backward", speed, interval)
+
+    def turnLeft(self, speed=1, interval=None):
+        return self.gather("turnLeft", speed, interval)
+
+    def turnRight(self, speed=1, interval=None):
+        return self.gather("turnRight", speed, interval)
+
+    def stop(self):
+        return self._now("stop")
+
+    def hardStop(self):
+        return self._now("hardStop")
+
+    def beep(self, duration, frequency, frequency2=None):
+        return self.gather("beep", duration, frequency, frequency2)
+
+    def setLED(self, position, value):
+        return self.gather("setLED", position, value)
+
+    def close(self):
+        """Closes every robot and stops the worker threads."""
+        try:
+            self.gather("close")
+        finally:
+            self._resize()
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+Decoders for the images the Fluke sends.
+
+These only turn the bytes read from the robot into pixels, so that every
+robot class (blocking or asyncio) can share them.
+
+GET_IMAGE sends one byte per pixel, row by row, with every four bytes
+holding the chroma and luma of two pixel pairs as V Y U Y. GET_RLE sends a
+segmented image as a run-length list of 4 pixel wide cells, alternating
+between "not blob" and "blob" runs and starting with "not blob".
+
+With numpy installed the decoders work on whole arrays at once; without it
+they fall back to plain Python loops that give the same output.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_COLUMNS = {}  # (width, mode) -> where each column takes its Y, U and V
+
+
+def yuyvToRGB(data, width, height):
+    """
+    Converts a GET_IMAGE buffer to an array of RGB bytes (3 per pixel, row
+    by row), giving every pixel the chroma of the group of four it is in
+    (or, for the first three pixels of a row, of the group after).
+    """
+    if numpy is None:
+        return _yuyvToRGBLoop(data, width, height)
+    frame = numpy.frombuffer(data, numpy.uint8, width * height)
+    frame = frame.reshape(height, width)
+    ys, us, vs = (numpy.array(c, numpy.intp) for c in _nearestColumns(width))
+    Y = frame[:, ys].astype(numpy.float64)
+    U = frame[:, us] - 128.0
+    V = frame[:, vs] - 128.0
+    return _toRGB(Y, U, V)
+
+
+def yuyvToRGBHorizontal(data, width, height):
+    """
+    yuyvToRGB() with every value a pixel doesn't have itself averaged from
+    the group it is in and the group to its right, which blurs the colour
+    edges less. The last group of a row and the first pixels have nothing
+    to average with and are converted as by yuyvToRGB().
+    """
+    return _interpolate(data, width, height, False)
+
+
+def yuyvToRGBVertical(data, width, height):
+    """
+    yuyvToRGB() with every value a pixel doesn't have itself averaged from
+    its own row and the one above (the first row only has itself).
+    """
+    return _interpolate(data, width, height, True)
+
+
+# takePicture() modes decoded from a GET_IMAGE frame
+COLOR_MODES = {
+    "color": yuyvToRGB,
+    "color-bilinear-h": yuyvToRGBHorizontal,
+    "color-bilinear-v": yuyvToRGBVertical,
+}
+
+
+def _toRGB(Y, U, V):
+    """RGB bytes from float Y, U - 128 and V - 128 planes."""
+    height, width = Y.shape
+    rgb = numpy.empty((height, width, 3), numpy.uint8)
+    # same arithmetic, in the same order, as the loops, so the same bytes
+    rgb[:, :, 0] = numpy.clip(Y + 1.13983 * V, 0, 255)
+    rgb[:, :, 1] = numpy.clip(Y - 0.39466 * U - 0.58060 * V, 0, 255)
+    rgb[:, :, 2] = numpy.clip(Y + 2.03211 * U, 0, 255)
+    return array.array("B", rgb.tobytes())
+
+
+def _nearestColumns(width):
+    """
+    The columns of a V Y U Y row each pixel takes its Y, U and V from, as
+    three lists: the pixel's own group of four, or for the Y and U of the
+    first few pixels the one to the right.
+    """
+    key = (width, "nearest")
+    columns = _COLUMNS.get(key)
+    if columns is None:
+        ys = []
+        us = []
+        vs = []
+        for j in range(width):
+            which = j % 4
+            left = j >= 3
+            if which == 0:
+                ys.append(j - 1 if left else j + 1)
+                us.append(j - 2 if left else j + 2)
+                vs.append(j)
+            elif which == 1:
+                ys.append(j)
+                us.append(j - 3 if left else j + 1)
+                vs.append(j - 1 if left else j + 3)
+            elif which == 2:
+                ys.append(j - 1 if left else j + 1)
+                us.append(j)
+                vs.append(j - 2 if left else j + 2)
+            else:
+                ys.append(j)
+                us.append(j - 1)
+                vs.append(j - 3)
+        columns = (ys, us, vs)
+        _COLUMNS[key] = columns
+    return columns
+
+
+def _interpolationColumns(width, vertical):
+    """
+    ((Y first, Y second), (U ...), (V ...)) source columns for the two
+    samples every value is averaged from. Vertically both come from the
+    same column (of this row and the one above); a pixel's own value has
+    the same first and second column either way.
+    """
+    key = (width, "vertical" if vertical else "horizontal")
+    columns = _COLUMNS.get(key)
+    if columns is not None:
+        return columns
+    ys, us, vs = (list(c) for c in _nearestColumns(width))
+    if vertical:
+        for j in range(3, width):
+            which = j % 4
+            if which == 1:
+                us[j] = j + 1
+            elif which == 3 and j < width - 2:
+                vs[j] = j + 1
+        columns = ((ys, ys), (us, us), (vs, vs))
+    else:
+        ys2 = list(ys)
+        us2 = list(us)
+        vs2 = list(vs)
+        for j in range(3, width - 4):
+            which = j % 4
+            if which == 0:
+                ys2[j] = j + 3
+                us2[j] = j + 2
+            elif which == 1:
+                vs2[j] = j + 3
+                us2[j] = j + 1
+            elif which == 2:
+                ys2[j] = j + 3
+                vs2[j] = j + 2
+            else:
+                us2[j] = j + 3
+                vs2[j] = j + 1
+        columns = ((ys, ys2), (us, us2), (vs, vs2))
+    _COLUMNS[key] = columns
+    return columns
+
+
+def _interpolate(data, width, height, vertical):
+    columns = _interpolationColumns(width, vertical)
+    if numpy is None:
+        return _interpolateLoop(data, width, height, columns, vertical)
+    frame = numpy.frombuffer(data, numpy.uint8, width * height)
+    frame = frame.reshape(height, width)
+    if vertical:
+        above = numpy.concatenate((frame[:1], frame[:-1]))
+    own = numpy.arange(width)
+    planes = []
+    for first, second in columns:
+        first = numpy.array(first, numpy.intp)
+        second = numpy.array(second, numpy.intp)
+        samples = frame[:, first].astype(numpy.float64)
+        if vertical:
+            others = above[:, second]
+            # a pixel's own value is not averaged with the row above
+            mine = first == own
+            others[:, mine] = frame[:, own[mine]]
+            samples += others
+        else:
+            samples += frame[:, second]
+        samples *= 0.5
+        planes.append(samples)
+    Y, U, V = planes
+    U -= 128.0
+    V -= 128.0
+    return _toRGB(Y, U, V)
+
+
+def _interpolateLoop(data, width, height, columns, vertical):
+    """_interpolate() a pixel at a time, for when numpy isn't there."""
+    (ys, ys2), (us, us2), (vs, vs2) = columns
+    buffer = array.array("B", bytes(width * height * 3))
+    for i in range(height):
+        row = i * width
+        if vertical and i > 0:
+            above = row - width
+        else:
+            above = row
+        for j in range(width):
+            if vertical:
+                Y = data[row + ys[j]] + (
+                    data[row + j] if ys[j] == j else data[above + ys2[j]]
+                )
+                U = data[row + us[j]] + (
+                    data[row + j] if us[j] == j else data[above + us2[j]]
+                )
+                V = data[row + vs[j]] + (
+                    data[row + j] if vs[j] == j else data[above + vs2[j]]
+                )
+            else:
+                Y = data[row + ys[j]] + data[row + ys2[j]]
+                U = data[row + us[j]] + data[row + us2[j]]
+                V = data[row + vs[j]] + data[row + vs2[j]]
+            Y = Y * 0.5
+            U = U * 0.5 - 128.0
+            V = V * 0.5 - 128.0
+            pos = (row + j) * 3
+            buffer[pos + 0] = int(max(min(Y + 1.13983 * V, 255), 0))
+            buffer[pos + 1] = int(max(min(Y - 0.39466 * U - 0.58060 * V, 255), 0))
+            buffer[pos + 2] = int(max(min(Y + 2.03211 * U, 255), 0))
+    return buffer
+
+
+def _yuyvToRGBLoop(data, width, height):
+    """yuyvToRGB() a pixel at a time, for when numpy isn't there."""
+    buffer = array.array("B", bytes(width * height * 3))
+    for i in range(height):
+        for j in range(width):
+            if j >= 3:
+                # go to the left for other values
+                vy = -1
+                vu = -2
+                y1v = -1
+                y1u = -3
+                uy = -1
+                uv = -2
+                y2u = -1
+                y2v = -3
+            else:
+                # go to the right for other values
+                vy = 1
+                vu = 2
+                y1v = 3
+                y1u = 1
+                uy = 1
+                uv = 2
+                y2u = 3
+                y2v = 1
+
+            #   0123 0123 0123
+            pos = i * width + j
+            if (j % 4) == 0:  # VYUY VYUY VYUY
+                V = data[pos]
+                Y = data[pos + vy]
+                U = data[pos + vu]
+            elif (j % 4) == 1:
+                Y = data[pos]
+                V = data[pos + y1v]
+                U = data[pos + y1u]
+            elif (j % 4) == 2:
+                U = data[pos]
+                Y = data[pos + uy]
+                V = data[pos + uv]
+            else:
+                Y = data[pos]
+                U = data[pos + y2u]
+                V = data[pos + y2v]
+            U = U - 128
+            V = V - 128
+            buffer[pos * 3 + 0] = int(max(min(Y + 1.13983 * V, 255), 0))
+            buffer[pos * 3 + 1] = int(max(min(Y - 0.39466 * U - 0.58060 * V, 255), 0))
+            buffer[pos * 3 + 2] = int(max(min(Y + 2.03211 * U, 255), 0))
+    return buffer
+
+
+def decodeRLE(data, width, height, counterBytes=2):
+    """
+    Converts a GET_RLE buffer (without its size prefix) to an array with
+    one byte per pixel, 255 inside the blob and 0 outside. The Fluke 2 sends
+    3 byte counters for its large image, older flukes 2 byte ones.
+
+    A run counted as 0 still takes one cell, and once the runs are used up
+    the rest of the image keeps the value of the last one (128 if there
+    were none), which is how the firmware's own decoder reads them.
+    """
+    cells = width * height // 4
+    if numpy is None:
+        return _decodeRLESlices(data, cells, counterBytes)
+    runs = len(data) // counterBytes
+    raw = numpy.frombuffer(data, numpy.uint8, runs * counterBytes)
+    raw = raw.reshape(runs, counterBytes)
+    lengths = raw[:, 0].astype(numpy.int64)
+    for k in range(1, counterBytes):
+        lengths = (lengths << 8) | raw[:, k]
+    numpy.maximum(lengths, 1, out=lengths)
+    # only the runs that fit in the image, the last one cut to fit
+    ends = numpy.cumsum(lengths)
+    used = min(int(numpy.searchsorted(ends, cells)) + 1, runs)
+    lengths = lengths[:used]
+    if used and ends[used - 1] > cells:
+        lengths[-1] -= ends[used - 1] - cells
+    values = numpy.zeros(used, numpy.uint8)
+    values[1::2] = 255
+    blobs = numpy.empty(cells, numpy.uint8)
+    filled = min(int(ends[used - 1]), cells) if used else 0
+    blobs[:filled] = numpy.repeat(values, lengths)
+    blobs[filled:] = values[-1] if used else 128
+    return array.array("B", numpy.repeat(blobs, 4).tobytes())
+
+
+def _decodeRLESlices(data, cells, counterBytes):
+    """decodeRLE() a run at a time, for when numpy isn't there."""
+    blobs = bytearray(cells * 4)
+    filled = 0
+    val = 128
+    for px in range(0, len(data) - counterBytes + 1, counterBytes):
+        counter = int.from_bytes(data[px : px + counterBytes], "big")
+        val = 0 if px // counterBytes % 2 == 0 else 255
+        count = min(max(counter, 1), cells - filled) * 4
+        blobs[filled * 4 : filled * 4 + count] = bytes((val,)) * count
+        filled += count // 4
+        if filled == cells:
+            break
+    blobs[filled * 4 :] = bytes((val,)) * ((cells - filled) * 4)
+    return array.array("B", blobs)
+
+
+def blobStats(data, width, height, counterBytes=2):
+    """
+    Measures the blob in a GET_RLE buffer (without its size prefix) straight
+    from its runs, without decoding the image. Returns a dictionary with
+
+    area     - the number of blob pixels
+    centroid - (x, y) mean position of the blob pixels, or None
+    box      - (x0, y0, x1, y1) bounding box, ends excluded, or None
+    rows     - (y, x0, x1) for every row the blob is in: where it starts
+               and (excluded) where it ends on that row
+
+    The runs are read the way decodeRLE() reads them, so these agree with
+    the pixels takePicture("blob") returns.
+    """
+    perRow = width // 4
+    cells = perRow * height
+    area = sumX = sumY = 0
+    left, right = width, 0
+    rows = []
+    start = 0  # first cell of the next run
+    inside = False  # the first run is outside the blob
+    runs = [
+        max(int.from_bytes(data[px : px + counterBytes], "big"), 1)
+        for px in range(0, len(data) - counterBytes + 1, counterBytes)
+    ]
+    if runs and not len(runs) % 2 and sum(runs) < cells:
+        # the rest of the image keeps the value of the last run, the blob
+        runs[-1] = cells
+    for count in runs:
+        if start >= cells:
+            break
+        end = min(start + count, cells)
+        if inside:
+            # split the run into the rows it covers
+            while start < end:
+                row = start // perRow
+                rowStart = row * perRow
+                rowEnd = min(end, rowStart + perRow)
+                x0 = (start - rowStart) * 4
+                x1 = (rowEnd - rowStart) * 4
+                pixels = x1 - x0
+                area += pixels
+                sumX += (x0 + x1 - 1) * pixels // 2
+                sumY += row * pixels
+                if x0 < left:
+                    left = x0
+                if x1 > right:
+                    right = x1
+                if rows and rows[-1][0] == row:
+                    rows[-1] = (row, rows[-1][1], x1)
+                else:
+                    rows.append((row, x0, x1))
+                start = rowEnd
+        start = end
+        inside = not inside
+    if not area:
+        return {"area": 0, "centroid": None, "box": None, "rows": []}
+    return {
+        "area": area,
+        "centroid": (sumX / area, sumY / area),
+        "box": (left, rows[0][0], right, rows[-1][0] + 1),
+        "rows": rows,
+    }
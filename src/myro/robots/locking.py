@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+The lock that serialises access to a robot's serial link.
+
+A plain threading.Lock hands the link to whichever waiting thread happens
+to wake first, so a stop() could sit behind any number of sensor reads,
+pipelined batches and beeps. A PriorityLock lets urgent acquirers (stop
+and hardStop) in ahead of every normal waiter, and lets long holders ask
+whether someone urgent is waiting so they can step aside at the next
+packet boundary. Normal waiters are served in the order they arrived, so
+a thread that releases the lock and takes it straight back (a loop of
+get() calls) can't starve the others.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import itertools
+import threading
+from collections import deque
+
+
+class PriorityLock(object):
+    """
+    A non-reentrant lock, used like threading.Lock, whose acquire() takes
+    urgent=True to be served before all normal waiters.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._owner = None
+        self._urgent = 0  # urgent acquirers waiting
+        self._tickets = itertools.count()
+        self._queue = deque()  # tickets of the normal waiters, oldest first
+        self.urgentAcquires = 0
+
+    def _free(self, urgent, ticket):
+        if self._owner is not None:
+            return False
+        if urgent:
+            return True
+        return not self._urgent and self._queue[0] == ticket
+
+    def acquire(self, blocking=True, timeout=-1, urgent=False):
+        # the uncontended case, without the allocations of a with block
+        self._cond.acquire()
+        try:
+            if self._owner is None and not self._urgent and not self._queue:
+                self._owner = threading.get_ident()
+                if urgent:
+                    self.urgentAcquires += 1
+                return True
+        finally:
+            self._cond.release()
+        return self._wait(blocking, timeout, urgent)
+
+    def _wait(self, blocking, timeout, urgent):
+        """acquire() when the lock is held or others are waiting for it."""
+        with self._cond:
+            if urgent:
+                self._urgent += 1
+                ticket = None
+            else:
+                ticket = next(self._tickets)
+                self._queue.append(ticket)
+            ok = False
+            try:
+                if not blocking:
+                    ok = self._free(urgent, ticket)
+                elif timeout < 0:
+                    ok = self._cond.wait_for(lambda: self._free(urgent, ticket))
+                else:
+                    ok = self._cond.wait_for(
+                        lambda: self._free(urgent, ticket), timeout
+                    )
+                if ok:
+                    self._owner = threading.get_ident()
+                    if urgent:
+                        self.urgentAcquires += 1
+                return ok
+            finally:
+                if urgent:
+                    self._urgent -= 1
+                    if not self._urgent:
+                        # normal waiters were held back for this one
+                        self._cond.notify_all()
+                else:
+                    self._queue.remove(ticket)
+                    if not ok:
+                        # the next in line may be free to go now
+                        self._cond.notify_all()
+
+    def release(self):
+        self._cond.acquire()
+        try:
+            if self._owner is None:
+                raise RuntimeError("release unlocked lock")
+            self._owner = None
+            if self._urgent or self._queue:
+                self._cond.notify_all()
+        finally:
+            self._cond.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, etype, value, tb):
+        self.release()
+
+    def locked(self):
+        return self._owner is not None
+
+    def heldByMe(self):
+        """True if the calling thread holds the lock."""
+        return self._owner == threading.get_ident()
+
+    def urgentWaiting(self):
+        """True if an urgent acquirer is waiting for the lock."""
+        return self._urgent > 0
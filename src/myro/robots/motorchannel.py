@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Coalesced motor commands.
+
+A control loop that calls move() faster than the link can carry the
+packets ends up waiting a round trip per call, steering with setpoints
+that are older the longer it runs. A MotorChannel takes the setpoints
+instead and sends them from its own thread whenever the link is free.
+Only the newest one pending is ever sent, and one equal to the last sent
+is not sent again.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import threading
+
+from myro.robots.reconnect import ConnectionLost
+
+STOPPED = (100, 100)  # SET_MOTORS powers of a robot at rest
+
+
+class MotorChannel(threading.Thread):
+    """
+    Sends the newest submitted (right, left) SET_MOTORS powers.
+
+    sent       - setpoints written to the robot
+    coalesced  - setpoints dropped because a newer one came before the
+                 link was free
+    suppressed - setpoints dropped because they were the same as the one
+                 before
+    error      - what stopped the channel, if anything did
+
+    A stop requested on the robot (requestStop) leaves the motors stopped
+    and the channel running; the next submit() raises the KeyboardInterrupt
+    a blocking move() would have.
+    """
+
+    def __init__(self, robot):
+        self.robot = robot
+        self.sent = 0
+        self.coalesced = 0
+        self.suppressed = 0
+        self.error = None
+        self.last = None  # the powers last sent; None if not known
+        self._pending = None
+        self._busy = False
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._finished = False
+        self._generation = 0  # bumped by cancel()
+        self._interrupt = None
+        threading.Thread.__init__(self, name="MyroMotors", daemon=True)
+
+    def submit(self, right, left):
+        """Queues powers to go out next, replacing any still pending."""
+        powers = (right, left)
+        with self._cond:
+            if self.error is not None:
+                raise self.error
+            if self._finished:
+                raise IOError("the motor channel has been stopped")
+            if self._interrupt is not None:
+                interrupt, self._interrupt = self._interrupt, None
+                raise interrupt
+            if self._pending is not None:
+                if self._pending == powers:
+                    self.suppressed += 1
+                    return
+                self.coalesced += 1
+                self._pending = None
+            if powers == self.last:
+                self.suppressed += 1
+                return
+            self._pending = powers
+            self._cond.notify_all()
+
+    def cancel(self, powers=STOPPED):
+        """
+        Drops anything pending; the robot's motors are being set to powers
+        some other way (stop() does this before its own packet).
+        """
+        with self._cond:
+            if self._pending is not None:
+                self.coalesced += 1
+                self._pending = None
+            self.last = powers
+            # a setpoint already taken by run() must not go out after this
+            self._generation += 1
+
+    def flush(self, timeout=None):
+        """
+        Waits until everything submitted has gone out, or the channel has
+        stopped. Returns False if something submitted was not sent.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: (self._pending is None and not self._busy)
+                or self.error is not None
+                or self._finished,
+                timeout,
+            )
+            return self._pending is None and not self._busy and self.error is None
+
+    def run(self):
+        robot = self.robot
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._stopping)
+                if self._stopping:
+                    break
+                powers = self._pending
+                self._pending = None
+                self.last = powers
+                self._busy = True
+                generation = self._generation
+            try:
+                robot.lock.acquire()
+                try:
+                    with self._cond:
+                        stale = generation != self._generation
+                    if stale:
+                        # cancelled (stop()) since it was taken
+                        self.coalesced += 1
+                    else:
+                        robot._setLocked(robot.SET_MOTORS, powers[0], powers[1])
+                        self.sent += 1
+                finally:
+                    robot.lock.release()
+            except KeyboardInterrupt as e:
+                # a requested stop: _setLocked() has stopped the motors and
+                # cancelled what was pending; keep going from there
+                with self._cond:
+                    self._interrupt = e
+            except ConnectionLost as e:
+                # the reconnect stopped the motors; anything but a recovery
+                # ends the channel
+                with self._cond:
+                    self.last = STOPPED if e.recovered else None
+                    if not e.recovered:
+                        self.error = e
+                if not e.recovered:
+                    break
+            except BaseException as e:
+                with self._cond:
+                    self.error = e
+                break
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+        with self._cond:
+            self._busy = False
+            self._finished = True
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """Sends what is pending, then stops the channel."""
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        threading.Thread.join(self, timeout)
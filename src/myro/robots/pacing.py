@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Inter-packet pacing for robots that cannot buffer serial input.
+
+A Scribbler connected without a Fluke only listens for the next packet once
+it has finished answering the last one, so a packet that follows a reply
+too closely is lost. This used to be handled by sleeping 10 ms before every
+write and after every read. The Pacer instead enforces a gap that is
+learned when the robot connects, widens it when a reply goes missing and
+slowly narrows it back while the link behaves.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import time
+
+
+class Pacer(object):
+    """
+    Enforces a minimum gap (in seconds) between serial transactions.
+
+    gap     - the gap currently enforced
+    minimum - the smallest gap known to be safe; the gap never decays below
+    maximum - the largest gap an overrun can widen it to
+    """
+
+    RECOVER_AFTER = 100  # clean transactions before the gap is narrowed again
+
+    def __init__(self, gap=0.01, minimum=0.0, maximum=0.05):
+        self.gap = gap
+        self.minimum = minimum
+        self.maximum = maximum
+        self.overruns = 0
+        self._last = 0.0
+        self._clean = 0
+
+    def wait(self):
+        """Call before writing; sleeps until the gap has passed."""
+        if self.gap:
+            remaining = self._last + self.gap - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def done(self):
+        """Call after a complete write or read."""
+        self._last = time.perf_counter()
+        if self.gap > self.minimum:
+            self._clean += 1
+            if self._clean >= Pacer.RECOVER_AFTER:
+                self._clean = 0
+                self.gap = max(self.minimum, self.gap / 2.0)
+
+    def overrun(self):
+        """Call when a reply went missing; widens the gap."""
+        self.overruns += 1
+        self._clean = 0
+        self._last = time.perf_counter()
+        self.gap = min(max(self.gap * 2.0, 0.001), self.maximum)
+
+    def learned(self, gap):
+        """Sets the gap found safe by probing the link."""
+        self.gap = gap
+        self.minimum = gap
+        self._clean = 0
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Pipelined packet queue for the Scribbler protocol.
+
+Every _get/_set normally writes one packet and then waits for its echo and
+reply before the next packet can go out, so each call costs a full round
+trip. The robot answers packets strictly in order, which means several
+packets can be written back to back and the replies matched up afterwards
+in FIFO order. Over a high latency link (Bluetooth) this turns the command
+rate from one per round trip into one per packet's worth of bandwidth.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+from collections import deque
+from concurrent.futures import Future
+
+
+class _Command(object):
+    def __init__(self, values, bytes, mode):
+        self.values = values
+        self.bytes = bytes
+        self.mode = mode  # None for a set, which is answered by the sensors
+        self.future = Future()
+
+
+class CommandPipeline(object):
+    """
+    Queue of packets for one robot, sent with up to depth in flight.
+
+    get() and set() queue a packet and return a concurrent.futures.Future;
+    nothing is written until flush() (or the end of a with block). flush()
+    holds the robot's lock for the whole exchange and keeps the window full:
+    every time a reply has been read, the next queued packet goes out.
+    When a stop() is waiting, no more packets go out until the ones in
+    flight have been answered and the stop has had its turn.
+
+    A robot without a fluke misses packets that arrive while it is still
+    answering the last one (see myro.robots.pacing), so for it only one
+    packet is ever in flight. If anything fails, every command not yet
+    answered fails with the same exception.
+    """
+
+    def __init__(self, robot, depth=8):
+        if depth < 1:
+            raise ValueError("pipeline depth must be at least 1")
+        self.robot = robot
+        self.depth = depth
+        self._queue = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, etype, value, tb):
+        if etype is None:
+            self.flush()
+        else:
+            self.cancel()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def get(self, value, bytes=1, mode="byte", setByte=0xFF):
+        """Queue a get; the future's result is what _get() would return."""
+        if setByte != 0xFF:
+            values = [value, setByte]
+        else:
+            values = [value]
+        return self._add(_Command(values, bytes, mode))
+
+    def set(self, *values):
+        """Queue a set; the future's result is the sensor trailer."""
+        return self._add(_Command(values, 11, None))
+
+    def _add(self, command):
+        self._queue.append(command)
+        return command.future
+
+    def cancel(self):
+        while self._queue:
+            self._queue.popleft().future.cancel()
+
+    def flush(self):
+        """
+        Send everything queued and wait for all of the replies. Returns the
+        list of results in the order the commands were queued.
+        """
+        robot = self.robot
+        if robot.dongle is None:
+            depth = 1
+        else:
+            depth = self.depth
+        results = []
+        inflight = deque()
+        robot.lock.acquire()
+        try:
+            robot._stats.batch("pipeline", robot.ser)
+            while self._queue or inflight:
+                if not inflight and robot.lock.urgentWaiting():
+                    # let a stop() go between packets
+                    robot._stats.end()
+                    robot.lock.release()
+                    robot.lock.acquire()
+                    robot._stats.batch("pipeline", robot.ser)
+                while (
+                    self._queue
+                    and len(inflight) < depth
+                    and not robot.lock.urgentWaiting()
+                ):
+                    command = self._queue.popleft()
+                    inflight.append(command)
+                    robot._write(command.values)
+                if not inflight:
+                    continue
+                command = inflight[0]
+                echo = robot._readEcho()
+                if echo is not None and len(echo) < robot.PACKET_LENGTH:
+                    raise IOError("timeout waiting for echo of %d" % command.values[0])
+                if command.mode is None:
+                    retval = robot._read(command.bytes)
+                    robot._lastSensors = retval
+                else:
+                    retval = robot._readReply(command.bytes, command.mode)
+                inflight.popleft()
+                command.future.set_result(retval)
+                results.append(retval)
+        except BaseException as e:
+            # the replies can no longer be matched up, fail them all
+            while inflight:
+                inflight.popleft().future.set_exception(e)
+            while self._queue:
+                self._queue.popleft().future.set_exception(e)
+            raise
+        finally:
+            # not if interrupted while taking it back after a stop()
+            if robot.lock.heldByMe():
+                robot._stats.end()
+                robot.lock.release()
+        return results
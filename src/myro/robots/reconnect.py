@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Recovering from a dropped link.
+
+A Bluetooth link to a robot can go away at any time (the robot is switched
+off, wanders out of range, its batteries sag). Rather than hanging, the
+robot classes reopen the port a bounded number of times, backing off
+exponentially between tries, put back the state the robot lost, and then
+raise ConnectionLost from the command that was cut off so the caller can
+decide whether to send it again.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+
+class ConnectionLost(IOError):
+    """
+    The link dropped in the middle of a command, whose result is lost.
+
+    recovered - True if the connection was reopened and the robot's state
+                replayed, so the command can simply be tried again
+    seconds   - how long the recovery took (or how long was spent failing)
+    attempts  - how many times the port was opened
+    """
+
+    def __init__(self, error, recovered, seconds=0.0, attempts=0):
+        if recovered:
+            message = "link dropped (%s); reconnected after %.2f s, try again" % (
+                error,
+                seconds,
+            )
+        else:
+            message = "link dropped (%s); gave up after %d attempts" % (
+                error,
+                attempts,
+            )
+        IOError.__init__(self, message)
+        self.error = error
+        self.recovered = recovered
+        self.seconds = seconds
+        self.attempts = attempts
+
+
+class Backoff(object):
+    """
+    Delays between reconnect attempts: initial seconds, multiplied by
+    factor after every failure up to maximum, for at most retries tries.
+    """
+
+    def __init__(self, initial=0.25, factor=2.0, maximum=4.0, retries=6):
+        if initial < 0 or factor < 1 or retries < 0:
+            raise ValueError("bad backoff: %s, %s, %s" % (initial, factor, retries))
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.retries = retries
+
+    def delays(self):
+        """Yields the delay to wait before each retry."""
+        delay = self.initial
+        for i in range(self.retries):
+            yield delay
+            delay = min(delay * self.factor, self.maximum)
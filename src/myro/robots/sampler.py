@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Background sensor sampling.
+
+A SensorSampler polls a robot at a fixed rate from its own thread and keeps
+the last size samples in a ring buffer, so a control loop can look at the
+latest readings (or the last second of them) without waiting on the serial
+link itself.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import array
+import threading
+import time
+
+from myro.robots.reconnect import ConnectionLost
+
+# sensor -> (first column, number of columns) in a sample
+COLUMNS = {
+    "ir": (0, 2),
+    "light": (2, 3),
+    "line": (5, 2),
+    "stall": (7, 1),
+    "obstacle": (8, 3),
+    "bright": (11, 3),
+    "battery": (14, 1),
+}
+WIDTH = 15
+EXTRAS = ("obstacle", "bright", "battery")
+
+
+class SensorSampler(threading.Thread):
+    """
+    Polls GET_ALL (and any of the fluke sensors named in extras) rate times
+    a second into a ring buffer of size samples.
+
+    Samples are stamped with time.monotonic() when the reading came back.
+    Sensors that are not sampled read as 0. The sampler holds the robot's
+    lock only for the reads themselves, so other commands go out between
+    samples; missed counts the periods that were skipped because a sample
+    (or another command) took longer than the period, or was cut off by a
+    link drop the robot recovered from.
+    """
+
+    def __init__(self, robot, rate=20, size=256, extras=()):
+        for extra in extras:
+            if extra not in EXTRAS:
+                raise AttributeError("can't sample '%s'" % extra)
+        if rate <= 0 or size < 1:
+            raise ValueError("rate and size must be positive")
+        self.robot = robot
+        self.period = 1.0 / rate
+        self.size = size
+        self.extras = tuple(extras)
+        self.samples = 0  # total taken; the newest is at (samples - 1) % size
+        self.missed = 0
+        self.error = None  # what stopped the sampler, if anything did
+        self._times = array.array("d", bytes(8 * size))
+        self._values = array.array("d", bytes(8 * size * WIDTH))
+        self._lock = threading.Lock()
+        self._stopevent = threading.Event()
+        threading.Thread.__init__(self, name="MyroSampler", daemon=True)
+
+    def run(self):
+        deadline = time.monotonic()
+        while not self._stopevent.is_set():
+            try:
+                self.sample()
+            except ConnectionLost as e:
+                if not e.recovered:
+                    self.error = e
+                    break
+                self.missed += 1  # the link is back; carry on
+            except Exception as e:
+                self.error = e
+                break
+            deadline += self.period
+            now = time.monotonic()
+            if deadline < now:
+                skipped = int((now - deadline) / self.period) + 1
+                self.missed += skipped
+                deadline += skipped * self.period
+            self._stopevent.wait(deadline - now)
+
+    def join(self, timeout=None):
+        """Stops the sampler."""
+        self._stopevent.set()
+        threading.Thread.join(self, timeout)
+
+    def sample(self):
+        """Takes one sample now; run() calls this every period."""
+        robot = self.robot
+        row = [0.0] * WIDTH
+        retval = robot._get(robot.GET_ALL, 11)
+        robot._lastSensors = retval
+        row[0] = retval[0]
+        row[1] = retval[1]
+        row[2] = retval[2] << 8 | retval[3]
+        row[3] = retval[4] << 8 | retval[5]
+        row[4] = retval[6] << 8 | retval[7]
+        row[5] = retval[8]
+        row[6] = retval[9]
+        row[7] = retval[10]
+        if "obstacle" in self.extras:
+            row[8:11] = robot.getObstacle()
+        if "bright" in self.extras:
+            row[11:14] = robot.getBright()
+        if "battery" in self.extras:
+            row[14] = robot.getBattery()
+        stamp = time.monotonic()
+        with self._lock:
+            slot = self.samples % self.size
+            self._times[slot] = stamp
+            self._values[slot * WIDTH : (slot + 1) * WIDTH] = array.array("d", row)
+            self.samples += 1
+
+    def _row(self, slot, sensor):
+        start = slot * WIDTH
+        if sensor is None:
+            values = self._values
+            return {
+                "ir": [int(values[start]), int(values[start + 1])],
+                "light": [int(v) for v in values[start + 2 : start + 5]],
+                "line": [int(values[start + 5]), int(values[start + 6])],
+                "stall": int(values[start + 7]),
+                "obstacle": [int(v) for v in values[start + 8 : start + 11]],
+                "bright": [int(v) for v in values[start + 11 : start + 14]],
+                "battery": values[start + 14],
+            }
+        first, count = COLUMNS[sensor]
+        if sensor == "battery":
+            return self._values[start + first]
+        if count == 1:
+            return int(self._values[start + first])
+        return [int(v) for v in self._values[start + first : start + first + count]]
+
+    def latest(self, sensor=None):
+        """
+        Returns (time, value) for the newest sample, or None before the
+        first one. value is a dict of every sensor, or just the one named.
+        """
+        with self._lock:
+            if self.samples == 0:
+                return None
+            slot = (self.samples - 1) % self.size
+            return self._times[slot], self._row(slot, sensor)
+
+    def window(self, seconds=None, sensor=None):
+        """
+        Returns the list of (time, value) samples taken no more than seconds
+        before the newest one (all that are buffered if seconds is None),
+        oldest first.
+        """
+        with self._lock:
+            count = min(self.samples, self.size)
+            first = self.samples - count
+            last = first + count
+            if seconds is not None and count:
+                since = self._times[(last - 1) % self.size] - seconds
+                # the times only ever go up, so binary search for since
+                low, high = first, last
+                while low < high:
+                    middle = (low + high) // 2
+                    if self._times[middle % self.size] < since:
+                        low = middle + 1
+                    else:
+                        high = middle
+                first = low
+            return [
+                (self._times[n % self.size], self._row(n % self.size, sensor))
+                for n in range(first, last)
+            ]
@@ -2,13 +2,27 @@
 
 __AUTHOR__ = "Joshua Arulsamy"
 
+import struct
+from struct import Struct
 from struct import unpack
 from myro.globalvars import *
+from myro.robots import discovery
+from myro.robots import image
+from myro.robots.capture import CaptureTransport
+from myro.robots.capture import ReplayTransport
+from myro.robots.locking import PriorityLock
+from myro.robots.motorchannel import MotorChannel
+from myro.robots.pacing import Pacer
+from myro.robots.pipeline import CommandPipeline
+from myro.robots.reconnect import Backoff
+from myro.robots.reconnect import ConnectionLost
+from myro.robots.sampler import SensorSampler
+from myro.robots.stats import ProtocolStats
+from myro.robots.transport import SerialTransport
 
 import time
 import os
 import serial
-import threading
 
 
 class Robot(object):
@@ -20,7 +34,7 @@ class Robot(object):
         """
         Base robot class.
         """
-        self.lock = threading.Lock()
+        self.lock = PriorityLock()
 
     # def initializeRemoteControl(self, password):
     #     self.chat = Chat(self.getName(), password)
@@ -368,14 +382,70 @@ class Scribbler(Robot):
     GET_DISTANCE = 175  # Format 175 side
 
     PACKET_LENGTH = 9
+    # _PACKETS[n] encodes n values as a zero padded packet
+    _PACKETS = [Struct("%dB%dx" % (n, 9 - n)) for n in range(10)]
+    _TEMPLATES = {}  # opcode -> packet, for commands without arguments
+    # opcode -> the piece of robot state a set of it decides, which is
+    # replayed after a reconnect (see _remember())
+    _SLOTS = {
+        SET_LED_LEFT_ON: "led left",
+        SET_LED_LEFT_OFF: "led left",
+        SET_LED_CENTER_ON: "led center",
+        SET_LED_CENTER_OFF: "led center",
+        SET_LED_RIGHT_ON: "led right",
+        SET_LED_RIGHT_OFF: "led right",
+        SET_LED_ALL_ON: "led all",
+        SET_LED_ALL_OFF: "led all",
+        SET_LOUD: "volume",
+        SET_QUIET: "volume",
+        SET_VOLUME: "s2 volume",
+        SET_DONGLE_LED_ON: "led front",
+        SET_DONGLE_LED_OFF: "led front",
+        SET_DIMMER_LED: "led back",
+        SET_DONGLE_IR: "ir power",
+        SET_IR_EMITTERS: "emitters",
+        SET_WHITE_BALANCE: "white balance",
+        SET_NO_WHITE_BALANCE: "white balance",
+    }
+    ECHO_MODE_QUIET = 2  # SET_ECHO_MODE value asking firmware to stop echoing packets
     BEGIN_PATH = 0  # Used with SET_PATH to say beginning of a path
     END_PATH = 1  # Used with SET_PATH to say end of a path
     BY = 4  # Used in movement commands, by means how much you wish to move by
     TO = 2  # Used in movement commands, to means the heading you want to turn to
     DEG = 1  # Used in movement commands, specifies using degress instead of S2 angle units
 
-    def __init__(self, serialport=None, baudrate=38400):
+    def __init__(
+        self,
+        serialport=None,
+        baudrate=38400,
+        transport=None,
+        fastConnect=False,
+        capture=None,
+    ):
+        """
+        Connect to a Scribbler.
+
+        serialport  - port name ("COM5", "/dev/rfcomm0", 5) or robot name
+        baudrate    - serial speed
+        transport   - an already open myro.robots.transport.Transport to use
+                      instead of opening serialport (for example a
+                      myro.robots.simulator.SimulatedTransport)
+        fastConnect - skip the restart (flush, wake-up wait, beeps, name)
+                      when a short handshake shows the robot is already
+                      listening; see _fastConnect()
+        capture     - file to log all the serial traffic to, for replaying
+                      with myro.robots.capture.ReplayTransport
+
+        MYROCAPTURE in the environment does the same as capture, and
+        MYROREPLAY plays a capture back instead of opening a port.
+
+        How long each phase of connecting took is kept in connectTimes.
+        """
         Robot.__init__(self)
+        if transport is None and "MYROREPLAY" in os.environ:
+            transport = ReplayTransport(os.environ["MYROREPLAY"])
+        if capture is None:
+            capture = os.environ.get("MYROCAPTURE")
 
         # Camera Addresses
         # self.CAM_PID = 0x0A
@@ -409,27 +479,60 @@ class Scribbler(Robot):
         self._lastRotate = 0
         self._volume = 0
         self.emitters = 0x1 | 0x2 | 0x4
-        if serialport is None:
-            if "MYROROBOT" in os.environ:
-                serialport = os.environ["MYROROBOT"]
-                print("Connecting to", serialport)
-            else:
-                serialport = ask("Port", useCache=1)
-        # Deal with requirement that Windows "COM#" names where # >= 9 needs to
-        # be in the format "\\.\COM#"
-        hasPort = True
-        if type(serialport) == str and serialport.lower().startswith("com"):
-            portnum = int(serialport[3:])
-        elif isinstance(serialport, int):  # allow integer input
-            portnum = serialport
-        else:
-            hasPort = False
-        if hasPort:
-            if portnum >= 10:
-                serialport = r"\\.\COM%d" % (portnum)
-        self.serialPort = serialport
+        self._echo = True  # does the robot echo each packet back?
+        self._pacer = Pacer()  # conservative until we know what is connected
+        self.sampler = None
+        self.motorChannel = None
+        self.drainQuiet = 0.05  # seconds of silence that end drain()
+        self._lastSensors = None
+        self.cacheTTL = 0  # seconds a sensor trailer may be served from; 0 is off
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        self._rxbuf = bytearray(64)  # grown by _receive() when needed
+        self._rxviews = {}  # length -> memoryview of the start of _rxbuf
+        self._structs = {"word": {}, "long": {}}  # mode -> {bytes: Struct}
         self.baudRate = baudrate
-        self.open()
+        self.connectTimes = {}  # phase -> seconds
+        self._robotName = None  # the name asked for, if not given a port
+        self._ownTransport = transport is None  # reopened by _reopen()
+        self._backoff = Backoff()
+        self.autoReconnect = True
+        self._session = {}  # slot -> last command setting it, see _remember()
+        self._recovering = False
+        self.drops = 0
+        self.recoveryTimes = []  # seconds each successful reconnect took
+        self.failedRecoveries = 0
+        self._stats = ProtocolStats(Scribbler._opcodeNames())
+        self._portCached = False  # whether its port came from the cache
+        start = time.perf_counter()
+        if transport is not None:
+            self.ser = transport
+            self.serialPort = transport.portstr
+        else:
+            if serialport is None:
+                if "MYROROBOT" in os.environ:
+                    serialport = os.environ["MYROROBOT"]
+                    print("Connecting to", serialport)
+                else:
+                    serialport = ask("Port", useCache=1)
+            # Deal with requirement that Windows "COM#" names where # >= 9 needs
+            # to be in the format "\\.\COM#"
+            hasPort = True
+            if type(serialport) == str and serialport.lower().startswith("com"):
+                portnum = int(serialport[3:])
+            elif isinstance(serialport, int):  # allow integer input
+                portnum = serialport
+            else:
+                hasPort = False
+            if hasPort:
+                if portnum >= 10:
+                    serialport = r"\\.\COM%d" % (portnum)
+            self.serialPort = serialport
+            self.open()
+        self._capture = None
+        if capture:
+            self._capture = self.ser = CaptureTransport(self.ser, capture)
+        self.connectTimes["open"] = time.perf_counter() - start
 
         robot = self
         self._fudge = list(range(4))
@@ -438,8 +541,52 @@ class Scribbler(Robot):
         self.dongle_version = 0
         self.imagewidth = 0
         self.imageheight = 0
+        self.robotinfo = {}
 
+        if fastConnect and self._fastConnect():
+            self._checkCachedPort()
+            return
+
+        start = time.perf_counter()
         info = self.getInfo()
+        self.connectTimes["info"] = time.perf_counter() - start
+        self._useInfo(info)
+        if "robot" in list(info.keys()):
+            if "robot-version" in list(info.keys()):
+                print("You are using scribbler firmware", info["robot-version"])
+            elif "api" in list(info.keys()):
+                print("You are using scribbler firmware", info["api"])
+            start = time.perf_counter()
+            self.restart()
+            self.connectTimes["restart"] = time.perf_counter() - start
+            if self.dongle is None:
+                start = time.perf_counter()
+                self.calibratePacing()
+                self.connectTimes["calibrate"] = time.perf_counter() - start
+            start = time.perf_counter()
+            self.loadFudge()
+            self.connectTimes["fudge"] = time.perf_counter() - start
+        self._checkCachedPort()
+
+    def _checkCachedPort(self):
+        """
+        Makes sure a port taken from the discovery cache still has the robot
+        that was asked for on it; if it doesn't, the cache entry goes so
+        that the next attempt searches again.
+        """
+        if not self._portCached:
+            return
+        name = self.getName()
+        if name != Scribbler._cleanName(self._robotName):
+            discovery.forget(self._robotName)
+            self.close()
+            raise IOError(
+                "found '%s' on %s instead of '%s'; try again to search for it"
+                % (name, self.serialPort, self._robotName)
+            )
+
+    def _useInfo(self, info):
+        """Sets up for the fluke and robot that getInfo() reported."""
         if "fluke" in list(info.keys()):
             self.dongle = info["fluke"]
             print("You are using fluke firmware", info["fluke"])
@@ -447,6 +594,8 @@ class Scribbler(Robot):
             self.dongle = info["dongle"]
             print("You are using fluke firmware", info["dongle"])
         if self.dongle is not None:
+            # the fluke buffers everything, no need to space packets out
+            self._pacer.learned(0.0)
             self.dongle_version = list(map(int, self.dongle.split(".")))
             if self.dongle_version >= [3, 0, 0]:
                 self.imagewidth = 1280
@@ -475,70 +624,78 @@ class Scribbler(Robot):
             #               u_low=51, u_high=136,
             #               v_low=190, v_high=255)
 
-        self.robotinfo = {}
         if "robot" in list(info.keys()):
             self.robotinfo = info["robot"]
-            if "robot-version" in list(info.keys()):
-                print("You are using scribbler firmware", info["robot-version"])
-            elif "api" in list(info.keys()):
-                print("You are using scribbler firmware", info["api"])
-            self.restart()
+
+    def _fastConnect(self, timeout=0.1):
+        """
+        Connects with one bounded handshake instead of getInfo() and
+        restart(): a SET_ECHO_MODE 0 (which also ends broadcast mode) whose
+        echo must come back intact, a single GET_INFO, a short pacing
+        calibration if there is no fluke, and the fudge values.
+        Returns False, leaving the slow path to sort things out, if the
+        robot does not answer in sync within timeout per reply.
+        """
+        old = self.ser.timeout
+        self.ser.timeout = timeout
+        try:
+            start = time.perf_counter()
+            self.ser.reset_input_buffer()
+            packet = self._packet([Scribbler.SET_ECHO_MODE, 0])
+            try:
+                self.lock.acquire()
+                self._write([Scribbler.SET_ECHO_MODE, 0])
+                reply = self._read(Scribbler.PACKET_LENGTH + 11)
+                self._echo = True
+                if (
+                    len(reply) < Scribbler.PACKET_LENGTH + 11
+                    or bytes(reply[: Scribbler.PACKET_LENGTH]) != packet
+                ):
+                    return False
+                self._lastSensors = reply[Scribbler.PACKET_LENGTH :]
+                self._pacer.wait()
+                self._stats.begin(Scribbler.GET_INFO, self.ser)
+                self.ser.mark(Scribbler.GET_INFO)
+                self.ser.write(Scribbler._INFO_REQUEST)
+                self._pacer.done()
+                line = self.ser.readline().decode("ISO-8859-1")
+            finally:
+                self.lock.release()
+            if not line.endswith("\n"):
+                return False
+            info = self._parseInfo(self._stripInfoEcho(line))
+            if "robot" not in info:
+                return False
+            self.connectTimes["handshake"] = time.perf_counter() - start
+            self._useInfo(info)
+            if self.dongle is None:
+                # a short version of the slow path's calibration, so that the
+                # pacer has a floor to decay back to
+                start = time.perf_counter()
+                self.calibratePacing(trials=2, timeout=timeout)
+                self.connectTimes["calibrate"] = time.perf_counter() - start
+            start = time.perf_counter()
             self.loadFudge()
+            self.connectTimes["fudge"] = time.perf_counter() - start
+        finally:
+            self.ser.timeout = old
+        return True
 
     def search(self):
-        answer = _askQuestion(
-            title="Search for " + self.serialPort,
-            question="Press the red resest button on the robot\nPress OK when ready to search",
-            answers=["OK", "Cancel"],
+        """
+        Finds the robot named serialPort on any serial port, listening on
+        all of them at once (see myro.robots.discovery), and opens it.
+        """
+        print(
+            "Press the red reset button on the robot; searching for '%s'..."
+            % self.serialPort
         )
-        if answer != "OK":
-            raise KeyboardInterrupt
-        for x in range(1, 21):
-            if x >= 10:
-                port = r"\\.\COM%d" % x
-            else:
-                port = "COM" + str(x)
-            prettyPort = "COM" + str(x)
-            print(
-                "Searching on port %s for robot named '%s'..."
-                % (prettyPort, self.serialPort)
-            )
-            try:
-                self.ser = serial.Serial(port, timeout=10)
-            except KeyboardInterrupt:
-                raise
-            except serial.SerialException:
-                print(
-                    "   Serial element not found. If this continues, remove/replace serial device..."
-                )
-                continue
-            self.ser.baudrate = self.baudRate
-            # assume that it has been running for at least a second!
-            time.sleep(1)
-            lines = self.ser.readlines()
-            lines = "".join(lines)
-            if "IPRE" in lines:
-                position = lines.index("IPRE")
-                name = lines[position + 4: position + 9 + 4]
-                name = name.replace("\x00", "")
-                name = name.strip()
-                s = port.replace("\\", "")
-                s = s.replace(".", "")
-                print("   Found robot named", name, "on port", s, "!")
-                if name == self.serialPort:
-                    self.serialPort = port
-                    self.ser.timeout = 10
-                    s = self.serialPort.replace("\\", "")
-                    s = s.replace(".", "")
-                    _askQuestion(
-                        'You can use "%s" from now on, like this:\n   initialize("%s")'
-                        % (s, s),
-                        answers=["Ok"],
-                    )
-                    return
-                else:
-                    self.ser.close()
-        raise ValueError("Couldn't find robot named '%s'" % self.serialPort)
+        # the deadline only matters if the robot never shows up
+        port = discovery.search(self.serialPort, self.baudRate, deadline=10)
+        s = port.replace("\\", "").replace(".", "")
+        print("   Found robot named", self.serialPort, "on port", s, "!")
+        self.serialPort = port
+        self.ser = SerialTransport(port, self.baudRate, timeout=10)
 
     def open(self):
         try:
@@ -551,18 +708,32 @@ class Scribbler(Robot):
         except Exception:
             pass
         if not _commport(self.serialPort):
-            self.search()
+            self._robotName = self.serialPort
+            port = discovery.cachedPort(self.serialPort)
+            try:
+                if port is None:
+                    raise serial.SerialException("not cached")
+                self.ser = SerialTransport(port, self.baudRate, timeout=10)
+                self.serialPort = port
+                self._portCached = True
+            except serial.SerialException:
+                discovery.forget(self.serialPort)
+                self.search()
         else:
+            delays = self._backoff.delays()
             while 1:
                 try:
-                    self.ser = serial.Serial(self.serialPort, timeout=10)
+                    self.ser = SerialTransport(
+                        self.serialPort, self.baudRate, timeout=10
+                    )
                     # for directly connected scribler-2's
                     self.ser.setDTR(0)
 
                     break
                 except KeyboardInterrupt:
                     raise
-                except serial.SerialException:
+                except serial.SerialException as e:
+                    error = e
                     print(
                         "   Serial element not found. If this continues, remove/replace serial device..."
                     )
@@ -578,8 +749,8 @@ class Scribbler(Robot):
                         raise
                     except Exception:
                         pass
-                    time.sleep(1)
-                except Exception:
+                except Exception as e:
+                    error = e
                     print("Waiting on port...", self.serialPort)
                     try:
                         self.ser.close()
@@ -593,35 +764,232 @@ class Scribbler(Robot):
                         raise
                     except Exception:
                         pass
-                    time.sleep(1)
+                delay = next(delays, None)
+                if delay is None:
+                    self.ser = None
+                    raise IOError("couldn't open %s: %s" % (self.serialPort, error))
+                time.sleep(delay)
         self.ser.baudrate = self.baudRate
         # self.restart()
 
     def close(self):
+        self.stopSampler()
+        self.stopMotorChannel()
         self.ser.close()
+        if self._capture is not None:
+            self._capture.finish()
 
-    def manual_flush(self):
-        old = self.ser.timeout
-        # self.ser.setTimeout(.5)
-        self.ser.timeout = 0.5
-        l = "a"
+    def drain(self, quiet=None, limit=50000):
+        """
+        Throws away whatever the robot sends until it has been quiet for
+        quiet seconds (drainQuiet by default) or limit bytes have gone.
+        Reads everything that is waiting in one go rather than a byte at a
+        time. Returns the number of bytes thrown away.
+        """
+        if quiet is None:
+            quiet = self.drainQuiet
         count = 0
-        while len(l) != 0 and count < 50000:
-            l = self.ser.read(1)
-            count += len(l)
-        # self.ser.setTimeout(old)
-        self.ser.timeout = old
+        last = time.perf_counter()
+        while count < limit:
+            waiting = self.ser.in_waiting
+            if waiting:
+                count += len(self.ser.read(min(waiting, limit - count)))
+                last = time.perf_counter()
+            else:
+                remaining = last + quiet - time.perf_counter()
+                if remaining <= 0:
+                    break
+                time.sleep(min(remaining, 0.002))
+        return count
+
+    def manual_flush(self):
+        self.drain()
+
+    def setAutoReconnect(self, on=True, retries=6, delay=0.25, maximum=4.0):
+        """
+        Sets what happens when the link drops in the middle of a command.
+        With on, the port is reopened up to retries times, waiting delay
+        seconds before the first try and twice as long before each next one
+        (never more than maximum), and the robot's state is replayed. Either
+        way the command raises ConnectionLost; its recovered attribute says
+        whether it is worth trying again.
+        """
+        self._backoff = Backoff(delay, 2.0, maximum, retries)
+        self.autoReconnect = on
+
+    def getReconnectStats(self):
+        times = self.recoveryTimes
+        return {
+            "drops": self.drops,
+            "recovered": len(times),
+            "failed": self.failedRecoveries,
+            "last s": times[-1] if times else None,
+            "max s": max(times) if times else None,
+            "mean s": sum(times) / len(times) if times else None,
+        }
+
+    def startCapture(self, path):
+        """
+        Logs all the serial traffic from now on to path; see
+        myro.robots.capture.
+        """
+        try:
+            self.lock.acquire()
+            if self._capture is not None:
+                raise AttributeError("already capturing to %s" % self._capture.path)
+            self._capture = self.ser = CaptureTransport(self.ser, path)
+        finally:
+            self.lock.release()
+
+    def stopCapture(self):
+        """Stops startCapture() and returns the number of records logged."""
+        try:
+            self.lock.acquire()
+            capture = self._capture
+            if capture is None:
+                return 0
+            self.ser = capture.transport
+            self._capture = None
+            capture.finish()
+            return capture.records
+        finally:
+            self.lock.release()
+
+    def stats(self):
+        """
+        Returns per command statistics for everything sent since the robot
+        connected (or since resetStats()): how many, bytes each way, reads
+        that timed out or came back short, and latency from write to the
+        last byte read, as {command name: stats}. Pipelined batches and
+        sensor snapshots are counted as one "pipeline" or "snapshot" each.
+        """
+        # the command in flight is finished once nobody holds the link
+        if self.lock.acquire(False):
+            try:
+                self._stats.end()
+            finally:
+                self.lock.release()
+        return self._stats.summary()
+
+    def resetStats(self):
+        try:
+            self.lock.acquire()
+            self._stats.reset()
+        finally:
+            self.lock.release()
+
+    @staticmethod
+    def _opcodeNames():
+        """{opcode: command name} for labelling stats."""
+        names = {}
+        for name, value in vars(Scribbler).items():
+            if name.split("_")[0] in ("GET", "SET", "SEND") and type(value) is int:
+                names.setdefault(value, name)
+        return names
+
+    def _remember(self, command):
+        """
+        Records command (a packet's values, or the bytes of a fluke command)
+        as the latest word on the piece of state it sets, for _replay().
+        """
+        slot = Scribbler._SLOTS.get(command[0])
+        if slot is None:
+            return
+        if slot == "led all":
+            for led in ("led left", "led center", "led right"):
+                self._session.pop(led, None)
+        self._session.pop(slot, None)  # keep the replay in the order set
+        self._session[slot] = command
+
+    def _connectionLost(self, error):
+        """
+        Called, with the lock held, when the transport fails. Reopens the
+        port with backoff and replays the robot's state if autoReconnect
+        is on, then raises ConnectionLost for the interrupted command.
+        """
+        if self._recovering:
+            raise error  # let the retry loop in here deal with it
+        self.drops += 1
+        start = time.perf_counter()
+        attempts = 0
+        if self.autoReconnect and (
+            self._ownTransport or hasattr(self.ser, "reopen")
+        ):
+            self._recovering = True
+            try:
+                for delay in self._backoff.delays():
+                    time.sleep(delay)
+                    attempts += 1
+                    try:
+                        self._reopen()
+                        self._replay()
+                    except (IOError, OSError) as e:
+                        if self.debug:
+                            print("reconnect attempt", attempts, "failed:", e)
+                        continue
+                    seconds = time.perf_counter() - start
+                    self.recoveryTimes.append(seconds)
+                    raise ConnectionLost(error, True, seconds, attempts)
+            finally:
+                self._recovering = False
+        self.failedRecoveries += 1
+        raise ConnectionLost(error, False, time.perf_counter() - start, attempts)
+
+    def _reopen(self):
+        """Replaces the transport with a freshly opened one."""
+        timeout = self.ser.timeout
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+        if self._ownTransport:
+            ser = SerialTransport(self.serialPort, self.baudRate, timeout=timeout)
+            ser.setDTR(0)
+            if self._capture is not None:
+                ser = self._capture.reopen(ser)
+        else:
+            ser = self.ser.reopen()
+        ser.timeout = timeout
+        self.ser = ser
+
+    def _replay(self):
+        """
+        Brings a reconnected robot back to the state _session recorded: out
+        of broadcast mode, motors off, then the LEDs, volume, IR power,
+        emitters and so on, and the fast protocol if it was on. The fudge
+        values live here rather than on the robot, so they need nothing.
+        """
+        quiet = not self._echo
+        self._echo = True
+        # a robot that was reset broadcasts until it hears a packet
+        self._write([Scribbler.SET_ECHO_MODE, 0])
+        self.drain(0.25)
+        self._lastTranslate = 0
+        self._lastRotate = 0
+        if self.motorChannel is not None:
+            self.motorChannel.cancel()
+        self._exchange(Scribbler.SET_MOTORS_OFF)
+        for command in list(self._session.values()):
+            if isinstance(command, bytes):
+                if self.dongle is not None:
+                    self.ser.write(command)
+            else:
+                self._exchange(*command)
+        if quiet:
+            self._exchange(Scribbler.SET_ECHO_MODE, Scribbler.ECHO_MODE_QUIET)
+            self._echo = False
 
     def restart(self):
 
-        self.manual_flush()
+        self.drain()
         self.setEchoMode(0)  # send command to get out of broadcast; turn off echo
         time.sleep(0.25)  # give it some time
         while 1:
             self.ser.flushInput()  # flush "IPREScribby"...
             self.ser.flushOutput()
-            time.sleep(1.2)  # give it time to see if another IPRE show up
-            if self.ser.inWaiting() == 0:  # if none, then we are out of here!
+            # give it time to see if another IPRE shows up; if none, then we
+            # are out of here!
+            if self.drain(1.2) == 0:
                 break
             print("Waking robot from sleep...")
             self.setEchoMode(0)  # send command to get out of broadcast; turn off echo
@@ -638,25 +1006,181 @@ class Scribbler(Robot):
         name = self.get("name")
         print("Hello, I'm %s!" % name)
 
+    def calibratePacing(
+        self, gaps=(0.0, 0.001, 0.002, 0.005, 0.01, 0.02), trials=5, timeout=0.25
+    ):
+        """
+        Finds the smallest gap between packets that the robot keeps up with,
+        by timing a few GET_ALLs at each gap in turn, giving up on a reply
+        after timeout seconds. Returns the gap.
+        """
+        old = self.ser.timeout
+        self.ser.timeout = timeout
+        try:
+            for gap in gaps:
+                self._pacer.learned(gap)
+                overruns = self._pacer.overruns
+                for i in range(trials):
+                    self._get(Scribbler.GET_ALL, 11)
+                    if self._pacer.overruns != overruns:
+                        break
+                if self._pacer.overruns == overruns:
+                    break
+                self.drain()
+            else:
+                gap = self._pacer.maximum
+            self._pacer.learned(gap)
+        finally:
+            self.ser.timeout = old
+        return gap
+
     def beep(self, duration, frequency, frequency2=None):
 
         self.lock.acquire()  # print "locked acquired"
 
         old = self.ser.timeout
-        self.ser.timeout = duration + 2
+        try:
+            self.ser.timeout = duration + 2
+
+            if frequency2 is None:
+                self._set_speaker(int(frequency), int(duration * 1000))
+            else:
+                self._set_speaker_2(
+                    int(frequency), int(frequency2), int(duration * 1000)
+                )
+
+            v = self._receive(self._echoLength() + 11)
+
+            # if self.debug:
+            #     print(["0x%x" % ord(x) for x in v])
+        finally:
+            # a reconnect replaced self.ser with one that has our timeout
+            self.ser.timeout = old
+            self.lock.release()
 
-        if frequency2 is None:
-            self._set_speaker(int(frequency), int(duration * 1000))
+    @property
+    def _lastSensors(self):
+        """The 11 byte sensor trailer of the last set or GET_ALL."""
+        return self._sensors
+
+    @_lastSensors.setter
+    def _lastSensors(self, value):
+        self._sensors = value
+        self._sensorsTime = time.monotonic()
+
+    def setSensorCache(self, ttl):
+        """
+        Lets get() answer light, ir, line and stall (and "all" without a
+        fluke) from the sensors that came back with the last set or GET_ALL
+        if they are no more than ttl seconds old; 0 or None turns it off.
+        With the cache on, a miss fetches everything with GET_ALL so that
+        getLight(), getIR() and getLine() in a row cost one round trip.
+        """
+        self.cacheTTL = ttl or 0
+        self.cacheHits = 0
+        self.cacheMisses = 0
+
+    def getCacheStats(self):
+        return {
+            "ttl": self.cacheTTL,
+            "hits": self.cacheHits,
+            "misses": self.cacheMisses,
+        }
+
+    def _getAll(self):
+        """The GET_ALL reply, served from the cache when it is fresh."""
+        if self.cacheTTL:
+            retval = self._lastSensors
+            if (
+                retval is not None
+                and len(retval) == 11
+                and time.monotonic() - self._sensorsTime <= self.cacheTTL
+            ):
+                self.cacheHits += 1
+                return retval
+            self.cacheMisses += 1
+        retval = self._get(Scribbler.GET_ALL, 11)  # returned as bytes
+        self._lastSensors = retval  # single bit sensors
+        return retval
+
+    def _getSensor(self, sensor):
+        """Reads all of the light, ir or line sensors."""
+        if self.cacheTTL:
+            retval = self._getAll()
+            if sensor == "light":
+                return [
+                    retval[2] << 8 | retval[3],
+                    retval[4] << 8 | retval[5],
+                    retval[6] << 8 | retval[7],
+                ]
+            elif sensor == "ir":
+                return [retval[0], retval[1]]
+            else:
+                return [retval[8], retval[9]]
+        if sensor == "light":
+            return self._get(Scribbler.GET_LIGHT_ALL, 6, "word")
+        elif sensor == "ir":
+            return self._get(Scribbler.GET_IR_ALL, 2)
         else:
-            self._set_speaker_2(int(frequency), int(frequency2), int(duration * 1000))
+            return self._get(Scribbler.GET_LINE_ALL, 2)
 
-        v = self.ser.read(Scribbler.PACKET_LENGTH + 11)
+    # GET_ALL followed by the fluke's sensors, as get("all") returns them
+    # GET_INFO padded with spaces, as the robot has always been sent it
+    _INFO_REQUEST = bytes([GET_INFO]) + b" " * 8
 
-        # if self.debug:
-        #     print(["0x%x" % ord(x) for x in v])
+    _SNAPSHOT = bytes(
+        [GET_ALL, 0, 0, 0, 0, 0, 0, 0, 0]
+        + [GET_DONGLE_L_IR, GET_DONGLE_C_IR, GET_DONGLE_R_IR]
+        + [GET_WINDOW_LIGHT, 0, GET_WINDOW_LIGHT, 1, GET_WINDOW_LIGHT, 2]
+        + [GET_BLOB, GET_BATTERY]
+    )
+    # ir, light, line, stall; obstacle; bright (24 bits each); blob; battery
+    _SNAPSHOT_REPLY = Struct(">2B3H2BB" + "3H" + "BHBHBH" + "HBB" + "H")
 
-        self.ser.timeout = old
-        self.lock.release()
+    def _getSnapshot(self):
+        """
+        Reads every sensor of a robot with a fluke in one burst: the fluke
+        answers commands in order, so they all go out in a single write and
+        the replies come back in a single read.
+        """
+        echo = self._echoLength()
+        try:
+            self.lock.acquire()
+            self._pacer.wait()
+            self._stats.batch("snapshot", self.ser)
+            try:
+                self.ser.mark(Scribbler._SNAPSHOT[0])
+                self.ser.write(Scribbler._SNAPSHOT)
+            except (IOError, OSError) as e:
+                self._connectionLost(e)
+            self._pacer.done()
+            data = self._receive(echo + Scribbler._SNAPSHOT_REPLY.size)
+            if len(data) < echo + Scribbler._SNAPSHOT_REPLY.size:
+                raise IOError("timeout reading the sensors")
+            values = Scribbler._SNAPSHOT_REPLY.unpack_from(data, echo)
+            self._lastSensors = data[echo : echo + 11].tolist()
+        finally:
+            self._stats.end()
+            self.lock.release()
+        xloc, yloc = values[18], values[19]
+        # fluke2 image coordinates don't fit in 1 byte without shifting
+        if self.dongle_version >= [3, 0, 0]:
+            xloc <<= 3
+            yloc <<= 2
+        return {
+            "light": list(values[2:5]),
+            "ir": list(values[0:2]),
+            "line": list(values[5:7]),
+            "stall": values[7],
+            "obstacle": list(values[8:11]),
+            "bright": [
+                values[11] << 16 | values[12],
+                values[13] << 16 | values[14],
+                values[15] << 16 | values[16],
+            ],
+            "blob": (values[17], xloc, yloc),
+            "battery": values[20] / 20.9813,
+        }
 
     def get(self, sensor="all", *position):
         sensor = sensor.lower()
@@ -674,8 +1198,7 @@ class Scribbler(Robot):
                     "bright": 3,
                 }
         elif sensor == "stall":
-            retval = self._get(Scribbler.GET_ALL, 11)  # returned as bytes
-            self._lastSensors = retval  # single bit sensors
+            retval = self._getAll()
             return retval[10]
         elif sensor == "forwardness":
             if read_mem(self.ser, 0, 0) != 0xDF:
@@ -696,8 +1219,7 @@ class Scribbler(Robot):
         elif sensor == "name":
             c = self._get(Scribbler.GET_NAME1, 8)
             c += self._get(Scribbler.GET_NAME2, 8)
-            c = "".join([chr(x) for x in c if "0" <= chr(x) <= "z"]).strip()
-            return c
+            return Scribbler._cleanName("".join(map(chr, c)))
         elif sensor == "volume":
             return self._volume
         elif sensor == "battery":
@@ -705,11 +1227,11 @@ class Scribbler(Robot):
         else:
             if len(position) == 0:
                 if sensor == "light":
-                    return self._get(Scribbler.GET_LIGHT_ALL, 6, "word")
+                    return self._getSensor("light")
                 elif sensor == "line":
-                    return self._get(Scribbler.GET_LINE_ALL, 2)
+                    return self._getSensor("line")
                 elif sensor == "ir":
-                    return self._get(Scribbler.GET_IR_ALL, 2)
+                    return self._getSensor("ir")
                 elif sensor == "obstacle":
                     return [
                         self.getObstacle("left"),
@@ -725,9 +1247,8 @@ class Scribbler(Robot):
                         self.getBright("right"),
                     ]
                 elif sensor == "all":
-                    retval = self._get(Scribbler.GET_ALL, 11)  # returned as bytes
-                    self._lastSensors = retval  # single bit sensors
                     if self.dongle is None:
+                        retval = self._getAll()
                         return {
                             "light": [
                                 retval[2] << 8 | retval[3],
@@ -739,34 +1260,15 @@ class Scribbler(Robot):
                             "stall": retval[10],
                         }
                     else:
-                        return {
-                            "light": [
-                                retval[2] << 8 | retval[3],
-                                retval[4] << 8 | retval[5],
-                                retval[6] << 8 | retval[7],
-                            ],
-                            "ir": [retval[0], retval[1]],
-                            "line": [retval[8], retval[9]],
-                            "stall": retval[10],
-                            "obstacle": [
-                                self.getObstacle("left"),
-                                self.getObstacle("center"),
-                                self.getObstacle("right"),
-                            ],
-                            "bright": [
-                                self.getBright("left"),
-                                self.getBright("middle"),
-                                self.getBright("right"),
-                            ],
-                            "blob": self.getBlob(),
-                            "battery": self.getBattery(),
-                        }
+                        return self._getSnapshot()
                 else:
                     raise "invalid sensor name: '%s'"
             retvals = []
+            if sensor in ["light", "ir", "line"]:
+                # one read serves every position
+                values = self._getSensor(sensor)
             for pos in position:
                 if sensor == "light":
-                    values = self._get(Scribbler.GET_LIGHT_ALL, 6, "word")
                     if pos in [0, "left"]:
                         retvals.append(values[0])
                     elif pos in [1, "middle", "center"]:
@@ -776,7 +1278,6 @@ class Scribbler(Robot):
                     elif pos is None or pos == "all":
                         retvals.append(values)
                 elif sensor == "ir":
-                    values = self._get(Scribbler.GET_IR_ALL, 2)
                     if pos in [0, "left"]:
                         retvals.append(values[0])
                     elif pos in [1, "right"]:
@@ -784,7 +1285,6 @@ class Scribbler(Robot):
                     elif pos is None or pos == "all":
                         retvals.append(values)
                 elif sensor == "line":
-                    values = self._get(Scribbler.GET_LINE_ALL, 2)
                     if pos in [0, "left"]:
                         retvals.append(values[0])
                     elif pos in [1, "right"]:
@@ -805,12 +1305,13 @@ class Scribbler(Robot):
                 return retvals
 
     def getData(self, *position):
+        data = self._get(Scribbler.GET_DATA, 8)
         if len(position) == 0:
-            return self._get(Scribbler.GET_DATA, 8)
+            return data
         else:
             retval = []
             for p in position:
-                retval.append(self._get(Scribbler.GET_DATA, 8)[p])
+                retval.append(data[p])
             if len(retval) == 1:
                 return retval[0]
             else:
@@ -826,36 +1327,61 @@ class Scribbler(Robot):
         # self.ser.flushInput()
         # self.ser.flushOutput()
 
-        self.manual_flush()
+        self.drain()
         # have to do this twice since sometime the first echo isn't
         # echoed correctly (spaces) from the scribbler
 
         # self.ser.write(chr(Scribbler.GET_INFO) + (' ' * 8))
-        self.ser.write(bytes(chr(Scribbler.GET_INFO) + (" " * 8), "ISO-8859-1"))
+        self._stats.begin(Scribbler.GET_INFO, self.ser)
+        self.ser.mark(Scribbler.GET_INFO)
+        self.ser.write(Scribbler._INFO_REQUEST)
         retval = self.ser.readline()
         # print "Got", retval
 
         time.sleep(0.1)
 
         # self.ser.write(chr(Scribbler.GET_INFO) + (' ' * 8))
-        self.ser.write(bytes(chr(Scribbler.GET_INFO) + (" " * 8), "ISO-8859-1"))
+        self._stats.begin(Scribbler.GET_INFO, self.ser)
+        self.ser.mark(Scribbler.GET_INFO)
+        self.ser.write(Scribbler._INFO_REQUEST)
 
         retval = self.ser.readline().decode("ISO-8859-1")
         # print "Got", retval
 
+        # self.ser.setTimeout(oldtimeout)
+        self.ser.timeout = oldtimeout
+
         # remove echoes
         if retval is None or len(retval) == 0:
             return {}
 
-        if retval[0] == "P" or retval[0] == "p":
-            retval = retval[1:]
+        return self._parseInfo(self._stripInfoEcho(retval), *item)
+
+    @staticmethod
+    def _cleanName(name):
+        """
+        A robot name the way getName() reports it: only the characters from
+        "0" to "z", so names heard elsewhere (a broadcast, the cache) compare
+        equal to it.
+        """
+        return "".join([c for c in name if "0" <= c <= "z"]).strip()
 
-        if retval[0] == "P" or retval[0] == "p":
+    @staticmethod
+    def _stripInfoEcho(retval):
+        """
+        Drops the echo of _INFO_REQUEST from the front of a GET_INFO reply:
+        its "P" (twice, as the first echo is sometimes garbled); the spaces
+        that follow are stripped from the first key by _parseInfo().
+        """
+        if retval[:1] == "P" or retval[:1] == "p":
             retval = retval[1:]
 
-        # self.ser.setTimeout(oldtimeout)
-        self.ser.timeout = oldtimeout
+        if retval[:1] == "P" or retval[:1] == "p":
+            retval = retval[1:]
+        return retval
 
+    def _parseInfo(self, retval, *item):
+        """Turns a GET_INFO line into a dictionary (or the items asked for)."""
         retDict = {}
         # for pair in retval.split(","):
         for pair in retval.split(","):
@@ -876,8 +1402,8 @@ class Scribbler(Robot):
     def getBattery(self):
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.GET_BATTERY))
-            retval = read_2byte(self.ser) / 20.9813
+            self._sendFluke(Scribbler.GET_BATTERY)
+            retval = self._readValue(2) / 20.9813
         finally:
             self.lock.release()
         return retval
@@ -885,7 +1411,7 @@ class Scribbler(Robot):
     def identifyRobot(self):
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.GET_ROBOT_ID))
+            self._sendFluke(Scribbler.GET_ROBOT_ID)
             retval = self.ser.readline()
         finally:
             self.lock.release()
@@ -905,10 +1431,9 @@ class Scribbler(Robot):
 
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.GET_IR_MESSAGE))
-            size = read_2byte(self.ser)
-            while len(line) < size:
-                line += self.ser.read(size - len(line))
+            self._sendFluke(Scribbler.GET_IR_MESSAGE)
+            size = self._readValue(2)
+            line = bytes(self._receive(size)).decode("ISO-8859-1")
         finally:
             self.lock.release()
         return line
@@ -925,8 +1450,7 @@ class Scribbler(Robot):
 
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.SEND_IR_MESSAGE))
-            self.ser.write(chr(len(data)))
+            self._sendFluke(Scribbler.SEND_IR_MESSAGE, len(data))
             for i in data:
                 self.ser.write(i)
         finally:
@@ -964,8 +1488,7 @@ class Scribbler(Robot):
     def setCommunicate(self):
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.SET_IR_EMITTERS))
-            self.ser.write(chr(self.emitters))
+            self._writeFluke(Scribbler.SET_IR_EMITTERS, self.emitters)
         finally:
             self.lock.release()
         return
@@ -973,8 +1496,7 @@ class Scribbler(Robot):
     def setBrightPower(self, power):
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.SET_DONGLE_IR))
-            self.ser.write(chr(power))
+            self._writeFluke(Scribbler.SET_DONGLE_IR, power)
         finally:
             self.lock.release()
 
@@ -983,9 +1505,9 @@ class Scribbler(Robot):
         try:
             self.lock.acquire()
             if isTrue(value):
-                self.ser.write(chr(Scribbler.SET_DONGLE_LED_ON))
+                self._writeFluke(Scribbler.SET_DONGLE_LED_ON)
             else:
-                self.ser.write(chr(Scribbler.SET_DONGLE_LED_OFF))
+                self._writeFluke(Scribbler.SET_DONGLE_LED_OFF)
         finally:
             self.lock.release()
 
@@ -998,8 +1520,7 @@ class Scribbler(Robot):
             value = int(float(value) * (255 - 170) + 170)  # scale
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.SET_DIMMER_LED))
-            self.ser.write(chr(value))
+            self._writeFluke(Scribbler.SET_DIMMER_LED, value)
         finally:
             self.lock.release()
 
@@ -1009,12 +1530,12 @@ class Scribbler(Robot):
         try:
             self.lock.acquire()
             if value in ["left", 0]:
-                self.ser.write(chr(Scribbler.GET_DONGLE_L_IR))
+                self._sendFluke(Scribbler.GET_DONGLE_L_IR)
             elif value in ["middle", "center", 1]:
-                self.ser.write(chr(Scribbler.GET_DONGLE_C_IR))
+                self._sendFluke(Scribbler.GET_DONGLE_C_IR)
             elif value in ["right", 2]:
-                self.ser.write(chr(Scribbler.GET_DONGLE_R_IR))
-            retval = read_2byte(self.ser)
+                self._sendFluke(Scribbler.GET_DONGLE_R_IR)
+            retval = self._readValue(2)
         finally:
             self.lock.release()
         return retval
@@ -1029,8 +1550,8 @@ class Scribbler(Robot):
                     self._write([Scribbler.GET_DISTANCE, 0])
                 elif value in ["right", 1]:
                     self._write([Scribbler.GET_DISTANCE, 1])
-                self._read(Scribbler.PACKET_LENGTH)  # read echo
-                retval = ord(self.ser.read(1))
+                self._readEcho()
+                retval = self._readValue(1)
             finally:
                 self.lock.release()
             return retval
@@ -1054,13 +1575,97 @@ class Scribbler(Robot):
                 window = 2
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.GET_WINDOW_LIGHT))
-            self.ser.write(chr(window))
-            retval = read_3byte(self.ser)  # / (63.0 * 192.0 * 255.0)
+            self._sendFluke(Scribbler.GET_WINDOW_LIGHT, window)
+            retval = self._readValue(3)  # / (63.0 * 192.0 * 255.0)
         finally:
             self.lock.release()
         return retval
 
+    def getBlob(self):
+        try:
+            self.lock.acquire()
+            self._sendFluke(Scribbler.GET_BLOB)
+            numpixs = self._readValue(2)
+            xloc = self._readValue(1)
+            yloc = self._readValue(1)
+
+            # fluke2 image coordinates don't fit in 1 byte without shifting
+            if self.dongle_version >= [3, 0, 0]:
+                xloc <<= 3
+                yloc <<= 2
+
+        finally:
+            self.lock.release()
+        return (numpixs, xloc, yloc)
+
+    def takePicture(self, mode="color"):
+        """
+        Returns the camera image as an array.array of bytes, row by row,
+        imagewidth x imageheight: 3 bytes (RGB) per pixel for "color",
+        "color-bilinear-h" and "color-bilinear-v" (colour averaged with the
+        pixels to the right or above, see myro.robots.image), one (255
+        inside the blob, 0 outside) for "blob".
+        """
+        if self.dongle is None:
+            raise AttributeError("taking pictures needs a fluke")
+        width = self.imagewidth
+        height = self.imageheight
+        if mode in image.COLOR_MODES:
+            try:
+                self.lock.acquire()
+                self._sendFluke(Scribbler.GET_IMAGE)
+                data = self._readFrame(width * height)
+            finally:
+                self.lock.release()
+            return image.COLOR_MODES[mode](data, width, height)
+        elif mode == "blob":
+            data, counterBytes = self._grabRLE()
+            return image.decodeRLE(data, width, height, counterBytes)
+        raise AttributeError("unsupported picture mode: '%s'" % mode)
+
+    def getBlobStats(self):
+        """
+        Returns the area, centroid, bounding box and per row extents of the
+        blob, worked out from the run-length encoded picture without
+        decoding it; see myro.robots.image.blobStats.
+        """
+        if self.dongle is None:
+            raise AttributeError("blob statistics need a fluke")
+        data, counterBytes = self._grabRLE()
+        return image.blobStats(data, self.imagewidth, self.imageheight, counterBytes)
+
+    def _grabRLE(self):
+        """Returns the GET_RLE runs and the size of their counters."""
+        try:
+            self.lock.acquire()
+            self._sendFluke(Scribbler.GET_RLE)
+            data = self._readFrame(self._readValue(2))
+        finally:
+            self.lock.release()
+        if self.dongle_version >= [3, 0, 0]:
+            return data, 3
+        return data, 2
+
+    def _readFrame(self, size):
+        """
+        Reads size bytes of picture into a buffer of their own (in the
+        receive buffer they would keep it that big); the lock must be held.
+        """
+        frame = bytearray(size)
+        view = memoryview(frame)
+        count = 0
+        while count < size:
+            try:
+                more = self.ser.readinto(view[count:])
+            except (IOError, OSError) as e:
+                self._connectionLost(e)
+            if not more:
+                raise IOError(
+                    "timeout reading the picture (%d of %d bytes)" % (count, size)
+                )
+            count += more
+        return frame
+
     def setForwardness(self, direction):
         if direction in ["fluke-forward", 1]:
             direction = 1
@@ -1073,16 +1678,14 @@ class Scribbler(Robot):
             )
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.SET_FORWARDNESS))
-            self.ser.write(chr(direction))
+            self._sendFluke(Scribbler.SET_FORWARDNESS, direction)
         finally:
             self.lock.release()
 
     def setIRPower(self, power):
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.SET_DONGLE_IR))
-            self.ser.write(chr(power))
+            self._writeFluke(Scribbler.SET_DONGLE_IR, power)
         finally:
             self.lock.release()
 
@@ -1090,16 +1693,16 @@ class Scribbler(Robot):
         try:
             self.lock.acquire()
             if isTrue(value):
-                self.ser.write(chr(Scribbler.SET_WHITE_BALANCE))
+                self._writeFluke(Scribbler.SET_WHITE_BALANCE)
             else:
-                self.ser.write(chr(Scribbler.SET_NO_WHITE_BALANCE))
+                self._writeFluke(Scribbler.SET_NO_WHITE_BALANCE)
         finally:
             self.lock.release()
 
     def reboot(self):
         try:
             self.lock.acquire()
-            self.ser.write(chr(Scribbler.SET_RESET_SCRIBBLER))
+            self._sendFluke(Scribbler.SET_RESET_SCRIBBLER)
         finally:
             self.lock.release()
 
@@ -1109,8 +1712,16 @@ class Scribbler(Robot):
         self.setName("Scribby")
 
     def setData(self, position, value):
-        data = self._get(Scribbler.GET_DATA, 8)
-        data[position] = value
+        """
+        Sets one data byte, or several when position and value are lists,
+        with one read of the data area and one write back.
+        """
+        data = self.getData()
+        if type(position) in [list, tuple]:
+            for p, v in zip(position, value):
+                data[p] = v
+        else:
+            data[position] = value
         return self._set(*([Scribbler.SET_DATA] + data))
 
     def setSingleData(self, position, value):
@@ -1122,11 +1733,48 @@ class Scribbler(Robot):
             self._set(Scribbler.SET_ECHO_MODE, 1)
         else:
             self._set(Scribbler.SET_ECHO_MODE, 0)
+        self._echo = True  # any mode but quiet echoes packets
         time.sleep(0.25)
         self.ser.flushInput()
         self.ser.flushOutput()
         return
 
+    def setFastProtocol(self, value=True):
+        """
+        Turn the packet echo off (value True) or back on (value False).
+
+        Without the echo every get and set saves 9 of its 20 bytes or so. Only
+        firmware that understands ECHO_MODE_QUIET stops echoing; on anything
+        else this falls back to the normal protocol. Returns True if the
+        robot is now running without the echo.
+        """
+        if not isTrue(value):
+            if not self._echo:
+                self._set(Scribbler.SET_ECHO_MODE, 0)
+                self._echo = True
+            return False
+        if not self._echo:
+            return True
+        # the mode change applies from the next packet on
+        self._set(Scribbler.SET_ECHO_MODE, Scribbler.ECHO_MODE_QUIET)
+        try:
+            self.lock.acquire()
+            packet = self._packet([Scribbler.GET_ALL])
+            self._write([Scribbler.GET_ALL])
+            reply = self._read(11)
+            if bytes(reply[: Scribbler.PACKET_LENGTH]) == packet:
+                # still echoing; read the rest of the sensors to stay in sync
+                self._read(Scribbler.PACKET_LENGTH)
+                self._echo = True
+                # and put it back in the mode restart() leaves it in
+                self._exchange(Scribbler.SET_ECHO_MODE, 0)
+            else:
+                self._lastSensors = reply
+                self._echo = False
+        finally:
+            self.lock.release()
+        return not self._echo
+
     def set(self, item, position, value=None):
         item = item.lower()
         if item == "led":
@@ -1229,34 +1877,23 @@ class Scribbler(Robot):
         # But to make things quick, only save the ones that have changed!
         # 0..255 and save.
 
-        if self._oldFudge[0] != self._fudge[0]:
-            if self.dongle is None:
-                self.setSingleData(0, int(self._fudge[0] * 127.0))
-            else:
-                self.setSingleData(3, int(self._fudge[0] * 127.0))
-
-            self._oldFudge[0] = self._fudge[0]
-
-        if self._oldFudge[1] != self._fudge[1]:
-            if self.dongle is None:
-                self.setSingleData(1, int(self._fudge[1] * 127.0))
-            else:
-                self.setSingleData(2, int(self._fudge[1] * 127.0))
-            self._oldFudge[1] = self._fudge[1]
+        # the fluke reverses the order of the fudge values in the data area
+        if self.dongle is None:
+            positions = [0, 1, 2, 3]
+        else:
+            positions = [3, 2, 1, 0]
+        changed = []
+        values = []
+        for i in range(4):
+            if self._oldFudge[i] != self._fudge[i]:
+                changed.append(positions[i])
+                values.append(int(self._fudge[i] * 127.0))
+                self._oldFudge[i] = self._fudge[i]
 
-        if self._oldFudge[2] != self._fudge[2]:
-            if self.dongle is None:
-                self.setSingleData(2, int(self._fudge[2] * 127.0))
-            else:
-                self.setSingleData(1, int(self._fudge[2] * 127.0))
-            self._oldFudge[2] = self._fudge[2]
-
-        if self._oldFudge[3] != self._fudge[3]:
-            if self.dongle is None:
-                self.setSingleData(3, int(self._fudge[3] * 127.0))
-            else:
-                self.setSingleData(0, int(self._fudge[3] * 127.0))
-            self._oldFudge[3] = self._fudge[3]
+        if len(changed) == 1:
+            self.setSingleData(changed[0], values[0])
+        elif len(changed) > 1:
+            self.setData(changed, values)
 
     # Called when robot is initialized, after serial connection is established.
     # Checks to see if the robot has fudge factors saved in it's data area
@@ -1265,8 +1902,9 @@ class Scribbler(Robot):
     # a 127 is straight ahead (no fudging)
     def loadFudge(self):
 
+        data = self.getData(0, 1, 2, 3)
         for i in range(4):
-            self._fudge[i] = self.get("data", i)
+            self._fudge[i] = data[i]
             if self._fudge[i] == 0:
                 self._fudge[i] = 127
             self._fudge[i] = self._fudge[i] / 127.0  # convert back to floating point!
@@ -1285,17 +1923,35 @@ class Scribbler(Robot):
         return (self._fudge[0], self._fudge[1], self._fudge[2], self._fudge[3])
 
     def stop(self):
+        """
+        Stops the motors. The stop goes ahead of every other command
+        waiting for the robot, as soon as the one on the wire is done.
+        """
         self._lastTranslate = 0
         self._lastRotate = 0
-        return self._set(Scribbler.SET_MOTORS_OFF)
+        if self.motorChannel is not None:
+            self.motorChannel.cancel()
+        try:
+            self.lock.acquire(urgent=True)
+            self._exchange(Scribbler.SET_MOTORS_OFF)
+        finally:
+            self.lock.release()
 
     def hardStop(self):
-        values = [Scribbler.SET_MOTORS_OFF]
+        """
+        Like stop(), but also safe from a signal handler that interrupted a
+        command on this thread: that command's reply is thrown away and the
+        stop goes straight out.
+        """
         self._lastTranslate = 0
         self._lastRotate = 0
-        self._write(values)
-        self._read(Scribbler.PACKET_LENGTH)  # read echo
-        self._lastSensors = self._read(11)  # single bit sensors
+        if self.lock.heldByMe():
+            if self.motorChannel is not None:
+                self.motorChannel.cancel()
+            self.drain()
+            self._exchange(Scribbler.SET_MOTORS_OFF)
+        else:
+            self.stop()
 
     def translate(self, amount):
         self._lastTranslate = amount
@@ -1503,6 +2159,8 @@ class Scribbler(Robot):
 
     def getLastSensors(self):
         retval = self._lastSensors
+        if retval is None:
+            retval = self._getAll()
         return {
             "light": [
                 retval[2] << 8 | retval[3],
@@ -1514,6 +2172,57 @@ class Scribbler(Robot):
             "stall": retval[10],
         }
 
+    def startSampler(self, rate=20, size=256, extras=()):
+        """
+        Starts polling the sensors rate times a second in the background and
+        returns the SensorSampler holding the last size samples. extras can
+        name any of "obstacle", "bright" and "battery" (fluke only) to
+        sample along with GET_ALL.
+
+        >>> sampler = robot.startSampler(50, extras=["obstacle"])
+        >>> when, light = sampler.latest("light")
+        """
+        self.stopSampler()
+        if self.dongle is None and extras:
+            raise AttributeError("sampling %s needs a fluke" % ", ".join(extras))
+        self.sampler = SensorSampler(self, rate, size, extras)
+        self.sampler.start()
+        return self.sampler
+
+    def stopSampler(self):
+        if self.sampler is not None:
+            self.sampler.join()
+            self.sampler = None
+
+    def startMotorChannel(self):
+        """
+        Makes move(), motors(), translate() and rotate() return straight
+        away, leaving a MotorChannel thread to send the newest setpoint
+        whenever the link is free. Setpoints overtaken by a newer one, or
+        the same as the last one sent, are dropped and counted (see
+        getMotorChannelStats()). stop() still goes out at once.
+        """
+        if self.motorChannel is None:
+            self.motorChannel = MotorChannel(self)
+            self.motorChannel.start()
+        return self.motorChannel
+
+    def stopMotorChannel(self):
+        """Sends any pending setpoint and goes back to blocking moves."""
+        if self.motorChannel is not None:
+            self.motorChannel.join()
+            self.motorChannel = None
+
+    def getMotorChannelStats(self):
+        channel = self.motorChannel
+        if channel is None:
+            return None
+        return {
+            "sent": channel.sent,
+            "coalesced": channel.coalesced,
+            "suppressed": channel.suppressed,
+        }
+
     def update(self):
         pass
 
@@ -1569,88 +2278,202 @@ class Scribbler(Robot):
         # print "actual power: (",left,",",right,")"
 
         # end JWS additions for "calibration of motors.
-        leftPower = (left + 1.0) * 100.0
-        rightPower = (right + 1.0) * 100.0
+        leftPower = int((left + 1.0) * 100.0)
+        rightPower = int((right + 1.0) * 100.0)
 
-        self._set(Scribbler.SET_MOTORS, rightPower, leftPower)
+        if self.motorChannel is not None:
+            self.motorChannel.submit(rightPower, leftPower)
+        else:
+            self._set(Scribbler.SET_MOTORS, rightPower, leftPower)
 
-    def _read(self, bytes_=1):
+    def _receive(self, bytes_):
+        """
+        Reads up to bytes_ bytes into the receive buffer and returns a
+        memoryview of what arrived. The view is only good until the next
+        read, so callers must decode (or copy) it straight away.
+        """
+        view = self._rxviews.get(bytes_)
+        if view is None:
+            if bytes_ > len(self._rxbuf):
+                self._rxbuf = bytearray(bytes_)
+                self._rxviews = {}
+            view = memoryview(self._rxbuf)[:bytes_]
+            self._rxviews[bytes_] = view
 
         if self.debug:
             print("Trying to read", bytes_, "bytes_", "timeout =", self.ser.timeout)
 
-        c = self.ser.read(bytes_)
-        c = c.decode("ISO-8859-1")
+        try:
+            count = self.ser.readinto(view)
+        except (IOError, OSError) as e:
+            self._connectionLost(e)
 
         if self.debug:
-            print("Initially read", len(c), "bytes_:", end=" ")
-            print(["0x%x" % ord(x) for x in c])
+            print("Initially read", count, "bytes_:", end=" ")
+            print(["0x%x" % x for x in view[:count]])
 
         # .nah. bug fix
-        while bytes_ > 1 and len(c) < bytes_:
-            c = c + self.ser.read(bytes_ - len(c))
+        while count < bytes_:
+            try:
+                more = self.ser.readinto(view[count:])
+            except (IOError, OSError) as e:
+                self._connectionLost(e)
+            if not more:
+                break  # timed out
+            count += more
             if self.debug:
-                print(["0x%x" % ord(x) for x in c])
+                print(["0x%x" % x for x in view[:count]])
 
         # .nah. end bug fix
         if self.debug:
-            print("_read (%d)" % len(c))
-            print(["0x%x" % ord(x) for x in c])
+            print("_read (%d)" % count)
+            print(["0x%x" % x for x in view[:count]])
 
-        if self.dongle is None:
-            time.sleep(0.01)  # HACK! THIS SEEMS TO NEED TO BE HERE!
+        if count < bytes_:
+            self._pacer.overrun()
+            return view[:count]
+        self._pacer.done()
+        return view
+
+    def _readValue(self, bytes_):
+        """
+        Reads a bytes_ byte, most significant first, number that the fluke
+        sent back; the lock must be held.
+        """
+        data = self._receive(bytes_)
+        if len(data) < bytes_:
+            raise IOError("timeout waiting for the fluke")
+        return int.from_bytes(data, "big")
+
+    def _read(self, bytes_=1):
+        data = self._receive(bytes_)
         if bytes_ == 1:
-            x = -1
-            if c != "":
-                x = ord(c)
-            elif self.debug:
+            if len(data):
+                return data[0]
+            if self.debug:
                 print("timeout!")
-                return x
-        else:
-            return list(map(ord, c))
+            return -1
+        return data.tolist()
+
+    def _echoLength(self):
+        if self._echo:
+            return Scribbler.PACKET_LENGTH
+        return 0
+
+    def _readSensors(self):
+        """
+        Reads the 11 byte sensor trailer of a set. It is only ever indexed,
+        so it is kept as one bytes object rather than a list of ints.
+        """
+        return bytes(self._receive(11))
+
+    def _readEcho(self):
+        """Reads (and drops) the echo of the last packet, if there is one."""
+        if self._echo:
+            return self._receive(Scribbler.PACKET_LENGTH)
+
+    @staticmethod
+    def _packet(rawdata):
+        """
+        Encodes a command as a 9 byte packet. Every value has to fit in a
+        byte; floats are truncated the way chr(int(x)) used to.
+        """
+        if len(rawdata) == 1:
+            packet = Scribbler._TEMPLATES.get(rawdata[0])
+            if packet is not None:
+                return packet
+        try:
+            encoder = Scribbler._PACKETS[len(rawdata)]
+        except IndexError:
+            raise ValueError("packet has more than 9 values: %s" % (rawdata,))
+        try:
+            packet = encoder.pack(*rawdata)
+        except struct.error:
+            try:
+                packet = encoder.pack(*[int(x) for x in rawdata])
+            except struct.error:
+                raise ValueError("packet values must be 0-255: %s" % (rawdata,))
+        if len(rawdata) == 1:
+            Scribbler._TEMPLATES[rawdata[0]] = packet
+        return packet
 
     def _write(self, rawdata):
-        t = [chr(int(x)) for x in rawdata]
-        data = bytes(
-            "".join(t) + (chr(0) * (Scribbler.PACKET_LENGTH - len(t)))[:9], "UTF-8"
-        )
+        data = self._packet(rawdata)
         # if self.debug:
         #     print("_write:", data, len(data), end=' ')
         #     print("data:", end=' ')
         #     print(["0x%x" % ord(x) for x in data])
 
-        if self.dongle is None:
-            time.sleep(0.01)  # HACK! THIS SEEMS TO NEED TO BE HERE!
-        self.ser.write(data)  # write packets
+        self._pacer.wait()
+        self._stats.begin(rawdata[0], self.ser)
+        try:
+            self.ser.mark(data[0])
+            self.ser.write(data)  # write packets
+        except (IOError, OSError) as e:
+            self._connectionLost(e)
+        self._pacer.done()
+
+    def _exchange(self, *values):
+        """Sends a set packet and reads its answer; the lock must be held."""
+        self._write(values)
+        self._readEcho()
+        self._lastSensors = self._readSensors()
+
+    def _writeFluke(self, *values):
+        """
+        Sends a fluke command that has no reply, and remembers it for
+        _replay(); the lock must be held.
+        """
+        command = bytes(values)
+        self._remember(command)
+        self._sendFluke(*values)
+
+    def _sendFluke(self, *values):
+        """Writes a fluke command (opcode and arguments); the lock must be held."""
+        self._stats.begin(values[0], self.ser)
+        try:
+            self.ser.mark(values[0])
+            self.ser.write(bytes(values))
+        except (IOError, OSError) as e:
+            self._connectionLost(e)
 
     def _set(self, *values):
         try:
             self.lock.acquire()  # print "locked acquired"
-            self._write(values)
-            test = self._read(Scribbler.PACKET_LENGTH)  # read echo
-            self._lastSensors = self._read(11)  # single bit sensors
-            # self.ser.flushInput()
-            if self.requestStop:
-                self.requestStop = 0
-                self.stop()
-                self.lock.release()
-                raise KeyboardInterrupt
+            self._setLocked(*values)
         finally:
             self.lock.release()
 
+    def _setLocked(self, *values):
+        """_set() for a caller that already holds the lock."""
+        self._remember(values)
+        self._exchange(*values)
+        # self.ser.flushInput()
+        if self.requestStop:
+            self.requestStop = 0
+            self._lastTranslate = 0
+            self._lastRotate = 0
+            if self.motorChannel is not None:
+                self.motorChannel.cancel()
+            self._exchange(Scribbler.SET_MOTORS_OFF)
+            raise KeyboardInterrupt
+
     def _setWithTime(self, waitTime, *values):
         try:
             self.lock.acquire()  # print "locked acquired"
+            self._remember(values)
             self._write(values)
             time.sleep(waitTime)
-            # test = self._read(Scribbler.PACKET_LENGTH)  # read echo
-            self._read(Scribbler.PACKET_LENGTH)  # read echo
-            self._lastSensors = self._read(11)  # single bit sensors
+            self._readEcho()
+            self._lastSensors = self._readSensors()
             # self.ser.flushInput()
             if self.requestStop:
                 self.requestStop = 0
-                self.stop()
-                self.lock.release()
+                self._lastTranslate = 0
+                self._lastRotate = 0
+                if self.motorChannel is not None:
+                    self.motorChannel.cancel()
+                self._exchange(Scribbler.SET_MOTORS_OFF)
                 raise KeyboardInterrupt
         finally:
             self.lock.release()
@@ -1666,27 +2489,56 @@ class Scribbler(Robot):
                 self._write([value, setByte])
             else:
                 self._write([value])
-            self._read(Scribbler.PACKET_LENGTH)  # read the echo
-            if mode == "byte":
-                retval = self._read(bytes)
-            elif mode == "word":
-                retvalBytes = self._read(bytes)
-                retval = []
-                for p in range(0, len(retvalBytes), 2):
-                    retval.append(retvalBytes[p] << 8 | retvalBytes[p + 1])
-            elif mode == "long":
-                retvalBytes = self.ser.read(bytes)
-                retval = list(unpack(">" + "i" * (bytes / 4), retvalBytes))
-            elif mode == "line":  # until hit \n newline
-                retval = self.ser.readline()
-                if self.debug:
-                    print("_get(line)", retval)
+            self._readEcho()
+            retval = self._readReply(bytes, mode)
             # self.ser.flushInput()
         finally:
             self.lock.release()
 
         return retval
 
+    def _readReply(self, bytes=1, mode="byte"):
+        """Reads and decodes the data that follows the echo of a get."""
+        if mode == "byte":
+            retval = self._read(bytes)
+        elif mode == "word":
+            data = self._receive(bytes)
+            retval = list(self._struct(mode, len(data)).unpack(data))
+        elif mode == "long":
+            data = self._receive(bytes)
+            retval = list(self._struct(mode, len(data)).unpack(data))
+        elif mode == "line":  # until hit \n newline
+            try:
+                retval = self.ser.readline()
+            except (IOError, OSError) as e:
+                self._connectionLost(e)
+            if self.debug:
+                print("_get(line)", retval)
+        return retval
+
+    def _struct(self, mode, bytes):
+        """Returns the Struct that decodes a word or long reply of bytes."""
+        cache = self._structs[mode]
+        decoder = cache.get(bytes)
+        if decoder is None:
+            if mode == "word":
+                decoder = Struct(">%dH" % (bytes // 2))
+            else:
+                decoder = Struct(">%di" % (bytes // 4))
+            cache[bytes] = decoder
+        return decoder
+
+    def pipeline(self, depth=8):
+        """
+        Returns a CommandPipeline that keeps up to depth packets in flight.
+
+        >>> with robot.pipeline() as p:
+        ...     light = p.get(Scribbler.GET_LIGHT_ALL, 6, "word")
+        ...     p.set(Scribbler.SET_LED_ALL_ON)
+        >>> light.result()
+        """
+        return CommandPipeline(self, depth)
+
     def _set_speaker(self, frequency, duration):
         self._write(
             [
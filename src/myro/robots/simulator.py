@@ -0,0 +1,753 @@
+# -*- coding: utf-8 -*-
+"""
+In-process simulation of the Scribbler / Fluke serial firmware.
+
+ScribblerFirmware answers the same byte protocol as the real robot (9 byte
+packets, echoed back, followed by either the requested data or the 11 byte
+sensor trailer), and the Fluke's own variable length commands when a fluke
+version is given. SimulatedTransport puts it behind the Transport interface
+with an optional model of link speed and latency, so that
+
+    >>> robot = Scribbler(transport=SimulatedTransport())
+
+runs the real protocol code with no robot attached. openSimulatedConnection
+does the same for asyncio code.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+from myro.robots.transport import _asbytes
+from myro.robots.transport import Transport
+
+# Scribbler opcodes, duplicated here so the firmware does not depend on the
+# robot class it is used to test.
+GET_ALL = 65
+GET_LIGHT_LEFT = 67
+GET_LIGHT_CENTER = 68
+GET_LIGHT_RIGHT = 69
+GET_LIGHT_ALL = 70
+GET_IR_LEFT = 71
+GET_IR_RIGHT = 72
+GET_IR_ALL = 73
+GET_LINE_LEFT = 74
+GET_LINE_RIGHT = 75
+GET_LINE_ALL = 76
+GET_STATE = 77
+GET_NAME1 = 78
+GET_NAME2 = 64
+GET_STALL = 79
+GET_INFO = 80
+GET_DATA = 81
+GET_PASS1 = 50
+GET_PASS2 = 51
+
+SET_PASS1 = 55
+SET_PASS2 = 56
+SET_SINGLE_DATA = 96
+SET_DATA = 97
+SET_ECHO_MODE = 98
+SET_LED_LEFT_ON = 99
+SET_LED_LEFT_OFF = 100
+SET_LED_CENTER_ON = 101
+SET_LED_CENTER_OFF = 102
+SET_LED_RIGHT_ON = 103
+SET_LED_RIGHT_OFF = 104
+SET_LED_ALL_ON = 105
+SET_LED_ALL_OFF = 106
+SET_MOTORS_OFF = 108
+SET_MOTORS = 109
+SET_NAME1 = 110
+SET_NAME2 = 119
+SET_LOUD = 111
+SET_QUIET = 112
+SET_SPEAKER = 113
+SET_SPEAKER_2 = 114
+SET_VOLUME = 160
+
+GET_POSN = 165
+SET_POSN = 166
+GET_ANGLE = 167
+SET_ANGLE = 168
+GET_MIC_ENV = 169
+GET_MOTOR_STATS = 170
+GET_ENCODERS = 171
+GET_DISTANCE = 175
+
+# Fluke commands: opcode -> number of argument bytes that follow it
+GET_RLE = 82
+GET_IMAGE = 83
+GET_DONGLE_L_IR = 85
+GET_DONGLE_C_IR = 86
+GET_DONGLE_R_IR = 87
+GET_WINDOW_LIGHT = 88
+GET_BATTERY = 89
+GET_BLOB = 95
+GET_SERIAL_MEM = 90
+GET_CAM_PARAM = 92
+SET_DONGLE_LED_ON = 116
+SET_DONGLE_LED_OFF = 117
+SET_RLE = 118
+SET_DONGLE_IR = 120
+SET_DIMMER_LED = 126
+SET_FORWARDNESS = 128
+SET_WHITE_BALANCE = 129
+SET_NO_WHITE_BALANCE = 130
+SET_CAM_PARAM = 131
+SET_IR_EMITTERS = 152
+
+FLUKE_COMMANDS = {
+    GET_RLE: 0,
+    GET_IMAGE: 0,
+    GET_DONGLE_L_IR: 0,
+    GET_DONGLE_C_IR: 0,
+    GET_DONGLE_R_IR: 0,
+    GET_WINDOW_LIGHT: 1,
+    GET_BATTERY: 0,
+    GET_BLOB: 0,
+    GET_SERIAL_MEM: 4,
+    GET_CAM_PARAM: 1,
+    SET_DONGLE_LED_ON: 0,
+    SET_DONGLE_LED_OFF: 0,
+    SET_RLE: 8,
+    SET_DONGLE_IR: 1,
+    SET_DIMMER_LED: 1,
+    SET_FORWARDNESS: 1,
+    SET_WHITE_BALANCE: 0,
+    SET_NO_WHITE_BALANCE: 0,
+    SET_CAM_PARAM: 2,
+    SET_IR_EMITTERS: 1,
+}
+
+PACKET_LENGTH = 9
+ECHO_MODE_QUIET = 2
+
+
+def _word(value):
+    return bytes(((value >> 8) & 0xFF, value & 0xFF))
+
+
+def _long(value):
+    return (value & 0xFFFFFFFF).to_bytes(4, "big")
+
+
+class ScribblerFirmware(object):
+    """
+    Model of the robot end of the serial link.
+
+    name    - robot name, as returned by GET_NAME1/GET_NAME2
+    robot   - "Scribbler" or "Scribbler2"
+    version - scribbler firmware version reported by GET_INFO
+    fluke   - fluke firmware version ("2.9.1", "3.0.9", ...) or None for a
+              directly connected robot
+    quietEcho - whether SET_ECHO_MODE ECHO_MODE_QUIET turns the packet echo
+              off; released firmware keeps echoing
+    packetGap - without a fluke, how long (seconds) after finishing a reply
+              the robot needs before it hears the next packet; packets that
+              arrive sooner are lost and counted in dropped
+
+    The sensor values (light, ir, line, stall, battery, obstacle, bright)
+    are plain attributes and can be changed at any time. So is the camera:
+    image holds the GET_IMAGE bytes (a test pattern until it is set) and
+    blobBox the (x0, y0, x1, y1) pixel rectangle GET_RLE reports as blob.
+    """
+
+    def __init__(
+        self,
+        name="Scribby",
+        robot="Scribbler2",
+        version="1.1.0",
+        fluke=None,
+        quietEcho=False,
+        packetGap=0.0,
+    ):
+        self.name = name
+        self.password = ""
+        self.robot = robot
+        self.version = version
+        self.fluke = fluke
+        self.quietEcho = quietEcho
+        self.packetGap = packetGap
+        self.dropped = 0
+        self.light = [1200, 1300, 1400]
+        self.ir = [1, 1]
+        self.line = [0, 0]
+        self.stall = 0
+        self.battery = 7.5
+        self.obstacle = [0, 0, 0]
+        self.bright = [50000, 60000, 70000]
+        self.motors = [100, 100]  # left, right; 100 is stopped
+        self.leds = [0, 0, 0]
+        self.data = [127, 127, 127, 127, 0, 0, 0, 0]
+        self.echoMode = 0
+        self.loud = 1
+        self.volume = 100
+        self.position = [0, 0]
+        self.angle = 0
+        self.encoders = [0, 0]
+        self.fluke_state = {}
+        self.image = None
+        self.blobBox = None
+        self.commands = []  # opcodes in the order they were processed
+        self._pending = bytearray()
+
+    def powerCycle(self):
+        """Forgets what a reset robot forgets: motors, LEDs, volume, modes."""
+        self.motors = [100, 100]
+        self.leds = [0, 0, 0]
+        self.echoMode = 0
+        self.loud = 1
+        self.volume = 100
+        self.fluke_state = {}
+        self._pending = bytearray()
+
+    def broadcast(self):
+        """What the robot repeats after a reset until it hears a packet."""
+        return b"IPRE" + self.name.encode("ISO-8859-1")[:9].ljust(9, b"\x00")
+
+    def sensors(self):
+        """The 11 byte sensor trailer, also the GET_ALL payload."""
+        return (
+            bytes(self.ir)
+            + b"".join(_word(v) for v in self.light)
+            + bytes(self.line)
+            + bytes((self.stall,))
+        )
+
+    def info(self):
+        line = "Robot-Version:%s,Robot:%s,Mode:Serial" % (self.version, self.robot)
+        if self.fluke is not None:
+            line = "fluke:%s,%s" % (self.fluke, line)
+        return (line + "\n").encode("ISO-8859-1")
+
+    def cameraSize(self):
+        """(width, height) of the camera for this fluke version."""
+        if list(map(int, self.fluke.split("."))) >= [3, 0, 0]:
+            return 1280, 800
+        return 256, 192
+
+    def picture(self):
+        """The GET_IMAGE payload; one byte per pixel, V Y U Y."""
+        if self.image is None:
+            width, height = self.cameraSize()
+            image = bytearray(width * height)
+            for i in range(height):
+                row = i * width
+                u = 64 + (i * 128) // height
+                v = 192 - (i * 128) // height
+                for j in range(width):
+                    which = j % 4
+                    if which == 0:
+                        image[row + j] = v
+                    elif which == 2:
+                        image[row + j] = u
+                    else:
+                        image[row + j] = (j * 255) // width
+            self.image = bytes(image)
+        return self.image
+
+    def blob(self):
+        """The blob rectangle, (x0, y0, x1, y1) in pixels."""
+        if self.blobBox is None:
+            width, height = self.cameraSize()
+            return width // 3, height // 3, 2 * width // 3, 2 * height // 3
+        return self.blobBox
+
+    def rle(self):
+        """The GET_RLE payload, including its 2 byte size."""
+        width, height = self.cameraSize()
+        x0, y0, x1, y1 = self.blob()
+        if list(map(int, self.fluke.split("."))) >= [3, 0, 0]:
+            counterBytes = 3
+        else:
+            counterBytes = 2
+        runs = []
+        inside = False
+        count = 0
+        for i in range(height):
+            for j in range(0, width, 4):
+                cell = y0 <= i < y1 and x0 <= j < x1
+                if cell != inside:
+                    runs.append(count)
+                    inside = cell
+                    count = 0
+                count += 1
+        runs.append(count)
+        data = b"".join(run.to_bytes(counterBytes, "big") for run in runs)
+        return _word(len(data)) + data
+
+    def feed(self, data):
+        """
+        Give the firmware some bytes. Returns a list of replies, one for every
+        command completed by these bytes, as (offset, delay, reply) where
+        offset is the index into data of the last byte of the command and
+        delay is how long the robot takes before it answers.
+        """
+        replies = []
+        start = len(self._pending)
+        self._pending += data
+        while self._pending:
+            opcode = self._pending[0]
+            if self.fluke is not None and opcode in FLUKE_COMMANDS:
+                length = 1 + FLUKE_COMMANDS[opcode]
+                if len(self._pending) < length:
+                    break
+                command = bytes(self._pending[:length])
+                del self._pending[:length]
+                delay, reply = self.fluke_command(command)
+            else:
+                length = PACKET_LENGTH
+                if len(self._pending) < length:
+                    break
+                command = bytes(self._pending[:length])
+                del self._pending[:length]
+                delay, reply = self.packet(command)
+            self.commands.append(command[0])
+            offset = length - 1 - start
+            start -= length
+            replies.append((offset, delay, reply))
+        return replies
+
+    def packet(self, packet):
+        """Handle a 9 byte scribbler packet; returns (delay, reply)."""
+        # decided before the packet runs, so a mode change starts with the
+        # packet after it
+        if self.quietEcho and self.echoMode == ECHO_MODE_QUIET:
+            echo = b""
+        else:
+            echo = packet
+        reply = self.get(packet)
+        if reply is not None:
+            return 0.0, echo + reply
+        delay = self.set(packet)
+        return delay, echo + self.sensors()
+
+    def get(self, packet):
+        opcode = packet[0]
+        if opcode == GET_ALL:
+            return self.sensors()
+        elif opcode == GET_LIGHT_ALL:
+            return b"".join(_word(v) for v in self.light)
+        elif opcode in (GET_LIGHT_LEFT, GET_LIGHT_CENTER, GET_LIGHT_RIGHT):
+            return _word(self.light[opcode - GET_LIGHT_LEFT])
+        elif opcode == GET_IR_ALL:
+            return bytes(self.ir)
+        elif opcode in (GET_IR_LEFT, GET_IR_RIGHT):
+            return bytes((self.ir[opcode - GET_IR_LEFT],))
+        elif opcode == GET_LINE_ALL:
+            return bytes(self.line)
+        elif opcode in (GET_LINE_LEFT, GET_LINE_RIGHT):
+            return bytes((self.line[opcode - GET_LINE_LEFT],))
+        elif opcode == GET_STALL:
+            return bytes((self.stall,))
+        elif opcode == GET_STATE:
+            return bytes((0, 0))
+        elif opcode == GET_NAME1:
+            return self.name.encode("ISO-8859-1").ljust(16, b"\x00")[:8]
+        elif opcode == GET_NAME2:
+            return self.name.encode("ISO-8859-1").ljust(16, b"\x00")[8:16]
+        elif opcode == GET_PASS1:
+            return self.password.encode("ISO-8859-1").ljust(16, b"\x00")[:8]
+        elif opcode == GET_PASS2:
+            return self.password.encode("ISO-8859-1").ljust(16, b"\x00")[8:16]
+        elif opcode == GET_DATA:
+            return bytes(self.data)
+        elif opcode == GET_INFO:
+            return self.info()
+        elif self.robot == "Scribbler2":
+            if opcode == GET_POSN:
+                return _long(self.position[0]) + _long(self.position[1])
+            elif opcode == GET_ANGLE:
+                return _long(self.angle)
+            elif opcode == GET_MIC_ENV:
+                return _long(0)
+            elif opcode == GET_MOTOR_STATS:
+                return bytes((0, 0, 0, 0, 1))
+            elif opcode == GET_ENCODERS:
+                reply = _long(self.encoders[0]) + _long(self.encoders[1])
+                if packet[1] == 0:
+                    self.encoders = [0, 0]
+                return reply
+            elif opcode == GET_DISTANCE:
+                return bytes((0,))
+        return None
+
+    def set(self, packet):
+        """Apply a set packet, returns how long the robot is busy with it."""
+        opcode = packet[0]
+        if opcode == SET_MOTORS_OFF:
+            self.motors = [100, 100]
+        elif opcode == SET_MOTORS:
+            self.motors = [packet[2], packet[1]]
+        elif SET_LED_LEFT_ON <= opcode <= SET_LED_RIGHT_OFF:
+            which = (opcode - SET_LED_LEFT_ON) // 2
+            self.leds[which] = int((opcode - SET_LED_LEFT_ON) % 2 == 0)
+        elif opcode == SET_LED_ALL_ON:
+            self.leds = [1, 1, 1]
+        elif opcode == SET_LED_ALL_OFF:
+            self.leds = [0, 0, 0]
+        elif opcode in (SET_NAME1, SET_NAME2, SET_PASS1, SET_PASS2):
+            part = packet[1:].rstrip(b"\x00").decode("ISO-8859-1")
+            if opcode in (SET_NAME1, SET_NAME2):
+                old = self.name.ljust(16)
+            else:
+                old = self.password.ljust(16)
+            if opcode in (SET_NAME1, SET_PASS1):
+                new = (part.ljust(8) + old[8:]).strip()
+            else:
+                new = (old[:8] + part).strip()
+            if opcode in (SET_NAME1, SET_NAME2):
+                self.name = new
+            else:
+                self.password = new
+        elif opcode == SET_DATA:
+            self.data = list(packet[1:9])
+        elif opcode == SET_SINGLE_DATA:
+            self.data[packet[1] % 8] = packet[2]
+        elif opcode == SET_ECHO_MODE:
+            self.echoMode = packet[1]
+        elif opcode == SET_LOUD:
+            self.loud = 1
+        elif opcode == SET_QUIET:
+            self.loud = 0
+        elif opcode == SET_VOLUME:
+            self.volume = packet[1]
+        elif opcode in (SET_SPEAKER, SET_SPEAKER_2):
+            return ((packet[1] << 8) | packet[2]) / 1000.0
+        elif opcode == SET_POSN:
+            self.position = [
+                int.from_bytes(packet[1:5], "big", signed=True),
+                int.from_bytes(packet[5:9], "big", signed=True),
+            ]
+        elif opcode == SET_ANGLE:
+            self.angle = int.from_bytes(packet[1:5], "big", signed=True)
+        return 0.0
+
+    def fluke_command(self, command):
+        """Handle a fluke command; returns (delay, reply)."""
+        opcode = command[0]
+        if opcode in (GET_DONGLE_L_IR, GET_DONGLE_C_IR, GET_DONGLE_R_IR):
+            return 0.0, _word(self.obstacle[opcode - GET_DONGLE_L_IR])
+        elif opcode == GET_WINDOW_LIGHT:
+            value = self.bright[command[1] % 3]
+            return 0.0, bytes(((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF))
+        elif opcode == GET_BATTERY:
+            return 0.0, _word(int(self.battery * 20.9813))
+        elif opcode == GET_IMAGE:
+            return 0.0, self.picture()
+        elif opcode == GET_RLE:
+            return 0.0, self.rle()
+        elif opcode == GET_BLOB:
+            x0, y0, x1, y1 = self.blob()
+            count = min((x1 - x0) * (y1 - y0), 0xFFFF)
+            x, y = (x0 + x1) // 2, (y0 + y1) // 2
+            if list(map(int, self.fluke.split("."))) >= [3, 0, 0]:
+                x >>= 3
+                y >>= 2
+            return 0.0, _word(count) + bytes((x, y))
+        elif opcode == GET_SERIAL_MEM:
+            return 0.0, b"\xdf"
+        elif opcode == GET_CAM_PARAM:
+            return 0.0, bytes((self.fluke_state.get(("cam", command[1]), 0),))
+        elif opcode == SET_CAM_PARAM:
+            self.fluke_state[("cam", command[1])] = command[2]
+            return 0.0, b""
+        self.fluke_state[opcode] = bytes(command[1:])
+        return 0.0, b""
+
+
+class LinkModel(object):
+    """
+    Timing model of a serial link.
+
+    baudrate - bits per second on the wire (10 bits per byte), or None for
+               an infinitely fast link
+    latency  - one-way delay in seconds (Bluetooth is typically 10-40 ms)
+    """
+
+    def __init__(self, baudrate=None, latency=0.0):
+        self.baudrate = baudrate
+        self.latency = latency
+        self._upFree = 0.0
+        self._downFree = 0.0
+
+    def byteTime(self):
+        if not self.baudrate:
+            return 0.0
+        return 10.0 / self.baudrate
+
+    def send(self, now, count):
+        """Returns the time the first of count bytes written at now goes out."""
+        start = max(now, self._upFree)
+        self._upFree = start + count * self.byteTime()
+        return start
+
+    def receive(self, ready, count):
+        """Returns the time at which a reply produced at ready is readable."""
+        start = max(ready + self.latency, self._downFree)
+        self._downFree = start + count * self.byteTime()
+        return self._downFree
+
+
+class Wire(object):
+    """
+    A firmware at the far end of a LinkModel. exchange() works out when the
+    replies to some written bytes become readable; it does not care which
+    clock the times come from as long as it is always the same one.
+    """
+
+    CHUNK = 256  # replies longer than this become readable a chunk at a time
+
+    def __init__(self, firmware, link):
+        self.firmware = firmware
+        self.link = link
+        self._busyUntil = 0.0
+        self._listenAt = 0.0  # when the robot can hear the next packet
+
+    def exchange(self, now, data):
+        """Write data at now; returns a list of (readyTime, reply)."""
+        firmware = self.firmware
+        link = self.link
+        start = link.send(now, len(data))
+        byteTime = link.byteTime()
+        if (
+            firmware.fluke is None
+            and firmware.packetGap
+            and start + link.latency < self._listenAt
+        ):
+            firmware.dropped += 1
+            return []
+        replies = []
+        for offset, delay, reply in firmware.feed(data):
+            arrived = start + (offset + 1) * byteTime + link.latency
+            done = max(arrived, self._busyUntil) + delay
+            self._busyUntil = done
+            if reply:
+                ready = link.receive(done, len(reply))
+                # long replies (images) trickle in rather than all at once
+                for begin in range(0, len(reply), Wire.CHUNK):
+                    end = min(begin + Wire.CHUNK, len(reply))
+                    arrives = ready - (len(reply) - end) * byteTime
+                    replies.append((arrives, reply[begin:end]))
+                self._listenAt = ready - link.latency + firmware.packetGap
+        return replies
+
+
+class SimulatedTransport(Transport):
+    """
+    Transport connected to a ScribblerFirmware instead of a serial port.
+
+    Reads honour the timeout the same way a serial port does, and replies
+    only become readable once the link model says they would have arrived.
+    """
+
+    def __init__(self, firmware=None, baudrate=None, latency=0.0, timeout=10):
+        Transport.__init__(self)
+        if firmware is None:
+            firmware = ScribblerFirmware()
+        self.firmware = firmware
+        self.link = LinkModel(baudrate, latency)
+        self.wire = Wire(firmware, self.link)
+        self.portstr = "sim:" + firmware.name
+        self._timeout = timeout
+        self._replies = deque()  # [readyTime, bytes, offset]
+        self._cond = threading.Condition()
+        self._downUntil = None  # set by drop()
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._timeout = value
+
+    @property
+    def in_waiting(self):
+        now = time.perf_counter()
+        with self._cond:
+            count = 0
+            for ready, data, offset in self._replies:
+                if ready > now:
+                    break
+                count += len(data) - offset
+            return count
+
+    def write(self, data):
+        data = _asbytes(data)
+        now = time.perf_counter()
+        self._checkLink()
+        with self._cond:
+            self.bytesWritten += len(data)
+            for ready, reply in self.wire.exchange(now, data):
+                self._replies.append([ready, reply, 0])
+            self._cond.notify_all()
+        return len(data)
+
+    def _take(self, size, now):
+        """Take up to size bytes that have arrived by now."""
+        out = bytearray()
+        while self._replies and len(out) < size:
+            entry = self._replies[0]
+            if entry[0] > now:
+                break
+            ready, data, offset = entry
+            chunk = data[offset : offset + size - len(out)]
+            out += chunk
+            entry[2] = offset + len(chunk)
+            if entry[2] >= len(data):
+                self._replies.popleft()
+        return out
+
+    def read(self, size=1):
+        return bytes(self._collect(size))
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast("B")
+        data = self._collect(len(view))
+        view[: len(data)] = data
+        return len(data)
+
+    def _collect(self, size):
+        """Wait for size bytes or the timeout, whichever comes first."""
+        start = time.perf_counter()
+        if self._timeout is None:
+            deadline = None
+        else:
+            deadline = start + self._timeout
+        out = bytearray()
+        self._checkLink()
+        with self._cond:
+            while True:
+                now = time.perf_counter()
+                out += self._take(size - len(out), now)
+                if len(out) >= size:
+                    break
+                if deadline is not None and now >= deadline:
+                    break
+                if self._replies:
+                    wait = self._replies[0][0] - now
+                    if deadline is not None:
+                        wait = min(wait, deadline - now)
+                elif deadline is not None:
+                    wait = deadline - now
+                else:
+                    wait = None
+                self._cond.wait(wait)
+            self._readDone(len(out), size)
+        return out
+
+    def announce(self, delay=0.0):
+        """Has the robot's reset broadcast arrive delay seconds from now."""
+        now = time.perf_counter()
+        data = self.firmware.broadcast()
+        with self._cond:
+            ready = self.link.receive(now + delay, len(data))
+            self._replies.append([ready, data, 0])
+            self._cond.notify_all()
+
+    def drop(self, duration, reset=True):
+        """
+        Takes the link down: reads and writes fail until reopen() is called
+        at least duration seconds from now. With reset, the robot also
+        powers off and on, forgetting its state and broadcasting its name.
+        """
+        with self._cond:
+            self._downUntil = time.perf_counter() + duration
+            self._replies.clear()
+            self._cond.notify_all()
+        self._announce = reset
+        if reset:
+            self.firmware.powerCycle()
+
+    def _checkLink(self):
+        if self._downUntil is not None:
+            raise IOError("simulated link to %s is down" % self.firmware.name)
+
+    def reopen(self):
+        """Reconnects after drop(); fails while the link is still down."""
+        if self._downUntil is not None:
+            if time.perf_counter() < self._downUntil:
+                raise IOError("could not open port %s" % self.portstr)
+            self._downUntil = None
+            self.link = LinkModel(self.link.baudrate, self.link.latency)
+            self.wire = Wire(self.firmware, self.link)
+            if self._announce:
+                self.announce()
+        return self
+
+    def reset_input_buffer(self):
+        now = time.perf_counter()
+        with self._cond:
+            while self._replies and self._replies[0][0] <= now:
+                self._replies.popleft()
+
+    def close(self):
+        pass
+
+
+class SimulatedStreamWriter(object):
+    """
+    The writing half of openSimulatedConnection(), with the parts of the
+    asyncio.StreamWriter interface the robot classes use.
+    """
+
+    def __init__(self, wire, reader, loop):
+        self.wire = wire
+        self.firmware = wire.firmware
+        self.bytesWritten = 0
+        self._reader = reader
+        self._loop = loop
+        self._replies = deque()  # (readyTime, bytes)
+        self._handle = None
+        self._closing = False
+
+    def write(self, data):
+        data = _asbytes(data)
+        self.bytesWritten += len(data)
+        self._replies.extend(self.wire.exchange(self._loop.time(), data))
+        self._schedule()
+
+    def _schedule(self):
+        if self._replies and self._handle is None:
+            self._handle = self._loop.call_at(self._replies[0][0], self._deliver)
+
+    def _deliver(self):
+        self._handle = None
+        now = self._loop.time()
+        while self._replies and self._replies[0][0] <= now:
+            self._reader.feed_data(self._replies.popleft()[1])
+        self._schedule()
+
+    async def drain(self):
+        pass
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        if not self._closing:
+            self._closing = True
+            if self._handle is not None:
+                self._handle.cancel()
+            self._reader.feed_eof()
+
+    async def wait_closed(self):
+        pass
+
+
+async def openSimulatedConnection(firmware=None, baudrate=None, latency=0.0):
+    """
+    The asyncio counterpart of SimulatedTransport: returns a (reader,
+    writer) pair connected to firmware, like asyncio.open_connection().
+    """
+    if firmware is None:
+        firmware = ScribblerFirmware()
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(loop=loop)
+    wire = Wire(firmware, LinkModel(baudrate, latency))
+    return reader, SimulatedStreamWriter(wire, reader, loop)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Per-opcode protocol statistics.
+
+Every command a robot sends starts a transaction, keyed by its opcode, that
+lasts until the next one starts. For each opcode this keeps the number of
+transactions, the bytes written and read, the reads that timed out or came
+back short, and a histogram of the time from the write to the last byte
+read. The byte and timeout counts come from the transport's own counters,
+so reads that bypass the robot's read helpers are still counted. It all
+costs a couple of microseconds per transaction, which is nothing next to a
+serial round trip, so it is always on.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import time
+
+# histogram bucket n counts transactions that took less than 2 ** n
+# microseconds (and at least 2 ** (n - 1)); the last one takes the rest
+BUCKETS = 25
+
+COUNT, OUT, IN, TIMEOUTS, SHORT, TOTAL, MAX, HISTOGRAM = range(8)
+
+
+class ProtocolStats(object):
+    """
+    Counters and latency histograms by opcode.
+
+    names - {opcode: name} used to label opcodes in summary()
+    """
+
+    def __init__(self, names=None):
+        self.names = names or {}
+        self.reset()
+
+    def reset(self):
+        self._opcodes = {}  # opcode -> [count, out, in, timeouts, short, ...]
+        self._current = None
+        self._batch = False
+
+    def begin(self, opcode, transport):
+        """Starts the transaction for a command about to be written."""
+        if self._batch:
+            return
+        if self._current is not None:
+            self.end()
+        self._current = (
+            opcode,
+            time.perf_counter(),
+            transport,
+            transport.bytesWritten,
+            transport.bytesRead,
+            transport.timeouts,
+            transport.shortReads,
+        )
+
+    def batch(self, name, transport):
+        """
+        Starts a transaction, counted under name, that takes in every
+        command written until end() (a pipeline flush, for instance).
+        """
+        self._batch = False
+        self.begin(name, transport)
+        self._batch = True
+
+    def end(self):
+        """Ends the current transaction, if there is one."""
+        self._batch = False
+        current = self._current
+        if current is None:
+            return
+        self._current = None
+        opcode, start, transport, out, read, timeouts, short = current
+        entry = self._opcodes.get(opcode)
+        if entry is None:
+            entry = [0, 0, 0, 0, 0, 0.0, 0.0, [0] * BUCKETS]
+            self._opcodes[opcode] = entry
+        latency = max(transport.lastRead - start, 0.0)
+        entry[COUNT] += 1
+        entry[OUT] += transport.bytesWritten - out
+        entry[IN] += transport.bytesRead - read
+        entry[TIMEOUTS] += transport.timeouts - timeouts
+        entry[SHORT] += transport.shortReads - short
+        entry[TOTAL] += latency
+        if latency > entry[MAX]:
+            entry[MAX] = latency
+        entry[HISTOGRAM][min(int(latency * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def summary(self):
+        """
+        Returns {name: stats} for every opcode seen so far, where stats has
+        the count, bytes out and in, timeouts, short reads, mean and max
+        latency and the approximate median and 99th percentile (the upper
+        edge of the histogram bucket they fall in, or the max), all times in ms, and
+        the histogram itself as {upper edge in ms: count}.
+        """
+        result = {}
+        for opcode, entry in list(self._opcodes.items()):
+            count = entry[COUNT]
+            histogram = entry[HISTOGRAM]
+            result[self.names.get(opcode, opcode)] = {
+                "count": count,
+                "bytes out": entry[OUT],
+                "bytes in": entry[IN],
+                "timeouts": entry[TIMEOUTS],
+                "short reads": entry[SHORT],
+                "mean ms": entry[TOTAL] / count * 1000 if count else 0.0,
+                "max ms": entry[MAX] * 1000,
+                "p50 ms": min(_percentile(histogram, count, 0.5), entry[MAX] * 1000),
+                "p99 ms": min(_percentile(histogram, count, 0.99), entry[MAX] * 1000),
+                "histogram": {
+                    (2**n) / 1000.0: hits for n, hits in enumerate(histogram) if hits
+                },
+            }
+        return result
+
+
+def _percentile(histogram, count, fraction):
+    """The upper edge, in ms, of the bucket holding the fraction point."""
+    if not count:
+        return 0.0
+    wanted = fraction * count
+    seen = 0
+    for n, hits in enumerate(histogram):
+        seen += hits
+        if seen >= wanted:
+            return (2**n) / 1000.0
+    return (2 ** (len(histogram) - 1)) / 1000.0
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Byte transports used to talk to a robot.
+
+A transport is anything that looks enough like a serial.Serial for the
+robot classes to read and write packets through it. The serial port is the
+normal case; the simulator in myro.robots.simulator provides another one so
+that the protocol code can be exercised without a robot attached.
+"""
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+import time
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+
+def _asbytes(data):
+    """
+    Convert outgoing data to bytes. Strings are treated as one character per
+    byte (ISO-8859-1), which is what the older chr() based callers expect.
+    """
+    if isinstance(data, str):
+        return data.encode("ISO-8859-1")
+    return bytes(data)
+
+
+class Transport(object):
+    """
+    Base transport. Subclasses need to provide read(), write() and the
+    timeout property; everything else has a default built on top of those.
+    """
+
+    portstr = None
+
+    def __init__(self):
+        self.bytesWritten = 0
+        self.bytesRead = 0
+        self.timeouts = 0  # reads that got nothing
+        self.shortReads = 0  # reads that got less than they asked for
+        self.lastRead = 0.0  # time.perf_counter() of the last read
+
+    def _readDone(self, count, size):
+        """Subclasses call this after every read of size bytes."""
+        self.bytesRead += count
+        if count < size:
+            if count:
+                self.shortReads += 1
+            else:
+                self.timeouts += 1
+        self.lastRead = time.perf_counter()
+
+    @property
+    def timeout(self):
+        raise NotImplementedError("this method needs to be written")
+
+    @timeout.setter
+    def timeout(self, value):
+        raise NotImplementedError("this method needs to be written")
+
+    @property
+    def in_waiting(self):
+        """ Number of bytes that can be read without blocking. """
+        return 0
+
+    def read(self, size=1):
+        raise NotImplementedError("this method needs to be written")
+
+    def write(self, data):
+        raise NotImplementedError("this method needs to be written")
+
+    def readinto(self, buffer):
+        """ Read into a writable buffer, returns the number of bytes read. """
+        view = memoryview(buffer)
+        data = self.read(len(view))
+        view[: len(data)] = data
+        return len(data)
+
+    def readline(self):
+        """ Read up to and including a newline, or until a timeout. """
+        line = bytearray()
+        while True:
+            c = self.read(1)
+            if not c:
+                break
+            line += c
+            if c == b"\n":
+                break
+        return bytes(line)
+
+    def readlines(self):
+        lines = []
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            lines.append(line)
+        return lines
+
+    def inWaiting(self):
+        return self.in_waiting
+
+    def mark(self, opcode):
+        """ Called as each command starts; capturing transports log it. """
+        pass
+
+    def reset_input_buffer(self):
+        pass
+
+    def reset_output_buffer(self):
+        pass
+
+    def flushInput(self):
+        self.reset_input_buffer()
+
+    def flushOutput(self):
+        self.reset_output_buffer()
+
+    def setDTR(self, value=1):
+        pass
+
+    def close(self):
+        pass
+
+
+class SerialTransport(Transport):
+    """
+    Transport over a pyserial port.
+    """
+
+    def __init__(self, port, baudrate=38400, timeout=10):
+        Transport.__init__(self)
+        if serial is None:
+            raise ImportError("pyserial not loaded: scribbler won't work!")
+        self.ser = serial.Serial(port, timeout=timeout)
+        self.ser.baudrate = baudrate
+        self.portstr = self.ser.portstr
+
+    @property
+    def timeout(self):
+        return self.ser.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self.ser.timeout = value
+
+    @property
+    def baudrate(self):
+        return self.ser.baudrate
+
+    @baudrate.setter
+    def baudrate(self, value):
+        self.ser.baudrate = value
+
+    @property
+    def in_waiting(self):
+        return self.ser.in_waiting
+
+    def read(self, size=1):
+        data = self.ser.read(size)
+        self._readDone(len(data), size)
+        return data
+
+    def readinto(self, buffer):
+        # pyserial's own readinto() reads into a bytes object and copies it
+        # through an array.array, so this is one copy cheaper
+        size = len(buffer)
+        data = self.ser.read(size)
+        count = len(data)
+        buffer[:count] = data
+        self._readDone(count, size)
+        return count
+
+    def readline(self):
+        data = self.ser.readline()
+        # a line without its newline is one the timeout cut short
+        self._readDone(len(data), len(data) + (not data.endswith(b"\n")))
+        return data
+
+    def write(self, data):
+        data = _asbytes(data)
+        self.bytesWritten += len(data)
+        return self.ser.write(data)
+
+    def reset_input_buffer(self):
+        self.ser.reset_input_buffer()
+
+    def reset_output_buffer(self):
+        self.ser.reset_output_buffer()
+
+    def setDTR(self, value=1):
+        self.ser.dtr = value
+
+    def close(self):
+        self.ser.close()
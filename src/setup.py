@@ -14,7 +14,9 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/jarulsamy/scribbler-barebones",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(
+        exclude=["benchmarks", "benchmarks.*", "tests", "tests.*"]
+    ),
     classifiers=[
             "Programming Language :: Python :: 3.7",
             "Licence :: OSI Approved :: MIT License",
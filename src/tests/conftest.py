@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures for the tests: Scribblers talking to the simulated firmware, so
+the protocol can be checked without a robot on a serial port.
+"""
+
+import contextlib
+import io
+
+import pytest
+
+from myro.robots.scribbler import Scribbler
+from myro.robots.simulator import ScribblerFirmware, SimulatedTransport
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+
+def connect(**firmware):
+    """Returns (robot, transport, firmware) for a simulated robot."""
+    fw = ScribblerFirmware(**firmware)
+    transport = SimulatedTransport(fw)
+    # the banner and firmware versions go to stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        robot = Scribbler(transport=transport)
+    return robot, transport, fw
+
+
+@pytest.fixture
+def simulated():
+    """A directly connected robot on released firmware."""
+    robot, transport, fw = connect()
+    yield robot, transport, fw
+    robot.close()
+
+
+@pytest.fixture
+def quiet():
+    """A robot whose firmware can turn the packet echo off."""
+    robot, transport, fw = connect(quietEcho=True)
+    yield robot, transport, fw
+    robot.close()
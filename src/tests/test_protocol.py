@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+The serial protocol against the simulated firmware: how commands are
+encoded into packets, how the echo of each packet is handled (and dropped
+with the fast protocol), and gets and sets making the round trip.
+"""
+
+import pytest
+
+from myro.robots.scribbler import Scribbler
+
+__AUTHOR__ = "Joshua Arulsamy"
+
+
+def testPacketPadding():
+    packet = Scribbler._packet([Scribbler.SET_MOTORS, 200, 0])
+    assert packet == bytes([Scribbler.SET_MOTORS, 200, 0, 0, 0, 0, 0, 0, 0])
+    assert len(packet) == Scribbler.PACKET_LENGTH
+
+
+def testPacketSingleOpcode():
+    packet = Scribbler._packet([Scribbler.GET_ALL])
+    assert packet == bytes([Scribbler.GET_ALL]) + bytes(8)
+    assert Scribbler._packet([Scribbler.GET_ALL]) is packet
+
+
+def testPacketFullLength():
+    values = list(range(1, 10))
+    assert Scribbler._packet(values) == bytes(values)
+
+
+def testPacketTruncatesFloats():
+    packet = Scribbler._packet([Scribbler.SET_SPEAKER, 2.9, 255.0])
+    assert packet[:3] == bytes([Scribbler.SET_SPEAKER, 2, 255])
+
+
+@pytest.mark.parametrize("values", [[Scribbler.SET_LED_LEFT_ON, 256], [-1]])
+def testPacketValueRange(values):
+    with pytest.raises(ValueError):
+        Scribbler._packet(values)
+
+
+def testPacketTooLong():
+    with pytest.raises(ValueError):
+        Scribbler._packet([0] * 10)
+
+
+def testEchoRead(simulated):
+    robot, transport, fw = simulated
+    assert robot._echo
+    before = transport.bytesRead
+    robot.getLight()
+    # the echo of the GET_LIGHT_ALL packet, then three 2 byte words
+    assert transport.bytesRead - before == Scribbler.PACKET_LENGTH + 6
+
+
+def testFastProtocolWithoutQuietFirmware(simulated):
+    robot, transport, fw = simulated
+    assert not robot.setFastProtocol()
+    assert robot._echo
+    assert fw.echoMode == 0
+    assert robot.getLight() == [1200, 1300, 1400]
+
+
+def testFastProtocol(quiet):
+    robot, transport, fw = quiet
+    assert robot.setFastProtocol()
+    assert not robot._echo
+    assert fw.echoMode == Scribbler.ECHO_MODE_QUIET
+    before = transport.bytesRead
+    assert robot.getLight() == [1200, 1300, 1400]
+    assert transport.bytesRead - before == 6
+    assert not robot.setFastProtocol(False)
+    assert robot._echo
+    assert robot.getLight() == [1200, 1300, 1400]
+
+
+def testGetRoundTrip(simulated):
+    robot, transport, fw = simulated
+    assert robot.getName() == "Scribby"
+    assert robot.getLight() == [1200, 1300, 1400]
+    fw.light = [10, 20, 300]
+    assert robot.getLight() == [10, 20, 300]
+    assert robot.getLight(0) == 10
+
+
+def testSetRoundTrip(simulated):
+    robot, transport, fw = simulated
+    robot.setLED("left", "on")
+    assert fw.leds[0] == 1
+    robot.setLED("left", "off")
+    assert fw.leds[0] == 0
+
+
+@pytest.mark.parametrize("fixture", ["simulated", "quiet"])
+def testSetThenGet(request, fixture):
+    robot, transport, fw = request.getfixturevalue(fixture)
+    robot.setFastProtocol()
+    robot.setName("Robbie")
+    assert fw.name == "Robbie"
+    assert robot.getName() == "Robbie"
+    fw.ir = [0, 1]
+    assert robot.getIR() == [0, 1]